@@ -0,0 +1,327 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+# Above this many distinct (rate, term) pairs in one call, building every normalized table one by
+# one costs more than computing them all at once, so the memo is bypassed
+MEMO_PAIR_LIMIT = 256
+
+
+def pmt(rate, n_periods, present_value):
+    # numpy_financial.pmt with no future value and end-of-period payments, operation for operation so
+    # the results are bit-identical without making numpy_financial a dependency of the model
+    rate, n_periods, present_value = np.asarray(rate), np.asarray(n_periods), np.asarray(present_value)
+    growth = (1 + rate) ** n_periods
+    zero_rate = rate == 0
+    masked_rate = np.where(zero_rate, 1, rate)
+    factor = np.where(zero_rate, n_periods, (growth - 1) / masked_rate)
+    return -(present_value * growth) / factor
+
+
+def _unit_balances(monthly_rate: np.ndarray, term_years: np.ndarray, months: np.ndarray) -> np.ndarray:
+    # Remaining balance of a French-amortization loan of 1 after each of `months` (1-based), for every
+    # (rate, term) row. Closed form of b_k = b_(k-1) * (1 + r) - payment; zero from the last month on.
+    monthly_rate = monthly_rate[:, None]
+    n_months = term_years[:, None] * 12
+    payment = pmt(monthly_rate, n_months, -1.0)
+    growth = np.exp(months * np.log1p(monthly_rate))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        balance = np.where(
+            monthly_rate == 0,
+            1 - months * payment,
+            growth - payment * (growth - 1) / np.where(monthly_rate == 0, 1.0, monthly_rate),
+        )
+    return np.where(months >= n_months, 0.0, np.maximum(balance, 0.0))
+
+
+def _year_end_unit_balances(monthly_rate: np.ndarray, term_years: np.ndarray, n_years: int) -> np.ndarray:
+    # _unit_balances at every year end, shaped (loans, n_years). With b_k = level + (1 - level) * g^k
+    # the growth is carried from one year end to the next, one multiply per loan and year instead of
+    # an exp and a log.
+    n_months = term_years * 12
+    payment = pmt(monthly_rate, n_months, -1.0)
+    zero_rate = monthly_rate == 0
+    level = payment / np.where(zero_rate, 1.0, monthly_rate)
+    year_growth = np.exp(12 * np.log1p(monthly_rate))
+    balances = np.empty((n_years, len(monthly_rate)))
+    growth = np.ones(len(monthly_rate))
+    for year in range(n_years):
+        growth *= year_growth
+        np.multiply(1 - level, growth, out=balances[year])
+        balances[year] += level
+    balances = balances.T
+    if zero_rate.any():
+        balances[zero_rate] = 1 - 12 * np.arange(1, n_years + 1) * payment[zero_rate, None]
+    balances[12 * np.arange(1, n_years + 1) >= n_months[:, None]] = 0.0
+    return np.maximum(balances, 0.0, out=balances)
+
+
+@dataclass(frozen=True)
+class UnitSchedule:
+    # Monthly schedule of a loan of 1; arrays are read-only because they are shared through the memo
+    payment: float
+    balance: np.ndarray
+    interest: np.ndarray
+    principal: np.ndarray
+
+
+@lru_cache(maxsize=4096)
+def unit_schedule(monthly_rate: float, term_years: float) -> UnitSchedule:
+    months = np.arange(1, int(np.ceil(term_years * 12)) + 1)
+    balance = _unit_balances(np.array([monthly_rate]), np.array([term_years]), months)[0]
+    opening = np.concatenate(([1.0], balance[:-1]))
+    interest = opening * monthly_rate
+    principal = opening - balance
+    for array in (balance, interest, principal):
+        array.flags.writeable = False
+    return UnitSchedule(float(pmt(monthly_rate, term_years * 12, -1.0)), balance, interest, principal)
+
+
+def _pairs(monthly_rate: np.ndarray, term_years: np.ndarray):
+    # Distinct (rate, term) pairs, packed into complex numbers because a 1-D unique is much faster
+    # than np.unique(..., axis=1)
+    keys, inverse = np.unique(monthly_rate + 1j * term_years, return_inverse=True)
+    return np.stack([keys.real, keys.imag]), inverse.reshape(-1)
+
+
+def year_end_balances(
+    loan_amount: np.ndarray, annual_rate: np.ndarray, term_years: np.ndarray, n_years: int
+) -> np.ndarray:
+    """Outstanding principal at the end of each year, shaped (loans, n_years).
+
+    Loans sharing a rate and term reuse one memoized normalized schedule scaled by their amount.
+    """
+    year_ends = 12 * np.arange(1, n_years + 1)
+    if np.ndim(loan_amount) == np.ndim(annual_rate) == np.ndim(term_years) == 0:
+        # A single loan, as HouseInvestment evaluates it: straight to its memoized schedule
+        balance = unit_schedule(float(annual_rate) / 12, float(term_years)).balance
+        balances = np.zeros((1, n_years))
+        within_term = year_ends <= len(balance)
+        balances[0, within_term] = float(loan_amount) * balance[year_ends[within_term] - 1]
+        return balances
+    loan_amount, monthly_rate, term_years = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(loan_amount, dtype=np.float64)),
+        np.atleast_1d(np.asarray(annual_rate, dtype=np.float64)) / 12,
+        np.atleast_1d(np.asarray(term_years, dtype=np.float64)),
+    )
+    pairs, inverse = _pairs(monthly_rate, term_years)
+    if pairs.shape[1] > MEMO_PAIR_LIMIT:
+        return loan_amount[:, None] * _year_end_unit_balances(monthly_rate, term_years, n_years)
+    tables = np.zeros((pairs.shape[1], n_years))
+    for k, (rate, term) in enumerate(pairs.T):
+        balance = unit_schedule(float(rate), float(term)).balance
+        within_term = year_ends <= len(balance)
+        tables[k, within_term] = balance[year_ends[within_term] - 1]
+    return loan_amount[:, None] * tables[inverse]
+
+
+@dataclass
+class AmortizationSchedule:
+    # All arrays are shaped (loans, months); month k holds the flows of month k + 1
+    payment: np.ndarray
+    interest: np.ndarray
+    principal: np.ndarray
+    prepayment: np.ndarray
+    balance: np.ndarray
+
+    @property
+    def total_interest(self) -> np.ndarray:
+        return self.interest.sum(axis=1)
+
+    def balance_after(self, months: int) -> np.ndarray:
+        if months <= 0:
+            return self.balance[:, 0] + self.principal[:, 0] + self.prepayment[:, 0]
+        return self.balance[:, min(months, self.balance.shape[1]) - 1]
+
+
+def amortization_schedule(
+    principal: Union[float, np.ndarray],
+    annual_rate: Union[float, np.ndarray],
+    term_years: Union[float, np.ndarray],
+    prepayments: Optional[Union[Mapping[int, float], np.ndarray]] = None,
+    reduce_payment: Union[bool, np.ndarray] = False,
+) -> AmortizationSchedule:
+    """Monthly payment, interest, principal and balance for many fixed-rate loans at once.
+
+    `prepayments` is either {month: amount} applied to every loan or an array shaped (loans, months);
+    amounts are paid on top of the regular payment at the end of that (1-based) month. By default the
+    payment stays the same and the loan finishes early; where `reduce_payment` holds, the payment is
+    recalculated over the remaining term after every prepayment (see ResettingLoan.prepay).
+    """
+    principal, annual_rate, term_years = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(principal, dtype=np.float64)),
+        np.atleast_1d(np.asarray(annual_rate, dtype=np.float64)),
+        np.atleast_1d(np.asarray(term_years, dtype=np.float64)),
+    )
+    monthly_rate = annual_rate / 12
+    n_loans = len(principal)
+    n_months = int(np.ceil(term_years.max() * 12))
+    shape = (n_loans, n_months)
+
+    if prepayments is None:
+        # Every loan is a scaled copy of the memoized unit schedule for its (rate, term)
+        pairs, inverse = _pairs(monthly_rate, term_years)
+        schedule = AmortizationSchedule(*(np.zeros(shape) for _ in range(5)))
+        for k, (rate, term) in enumerate(pairs.T):
+            unit = unit_schedule(float(rate), float(term))
+            rows = np.flatnonzero(inverse == k)
+            scale = principal[rows, None]
+            months = len(unit.balance)
+            schedule.balance[rows, :months] = scale * unit.balance
+            schedule.interest[rows, :months] = scale * unit.interest
+            schedule.principal[rows, :months] = scale * unit.principal
+        schedule.payment = schedule.interest + schedule.principal
+        return schedule
+
+    extra = np.zeros(shape)
+    if isinstance(prepayments, Mapping):
+        for month, amount in prepayments.items():
+            if not 1 <= month <= n_months:
+                raise ValueError(f"Prepayment month {month} is outside 1..{n_months}")
+            extra[:, month - 1] = amount
+    else:
+        given = np.asarray(prepayments, dtype=np.float64)
+        extra[:, : given.shape[-1]] = given
+
+    # Stepped from one prepayment to the next, the same way the model steps its loans
+    loan = ResettingLoan.fixed(principal, annual_rate, term_years)
+    parts = []
+    for month in np.flatnonzero(extra.any(axis=0)):
+        part = loan.advance(month + 1 - loan.month)
+        part.prepayment[:, -1] = loan.prepay(extra[:, month], reduce_payment)
+        part.balance[:, -1] = loan.balance
+        parts.append(part)
+    if loan.month < n_months:
+        parts.append(loan.advance(n_months - loan.month))
+    return _join(parts)
+
+
+def _join(parts: Sequence[AmortizationSchedule]) -> AmortizationSchedule:
+    # Consecutive schedules of the same loans as one
+    return AmortizationSchedule(
+        *(
+            np.concatenate([getattr(part, name) for part in parts], axis=1)
+            for name in AmortizationSchedule.__dataclass_fields__
+        )
+    )
+
+
+class ResettingLoan:
+    """Many loans whose rate changes every `reset_months` and whose payment is recalculated at each reset.
+
+    `annual_rates` holds one rate per reset period, shaped (periods,) for all loans or (loans, periods);
+    the last rate is held if the term outlasts it. The loans are advanced block by block with
+    `advance`, so a yearly model can step them alongside its own loop; every month is one vectorized
+    step over all loans, never a Python loop per loan.
+    """
+
+    def __init__(
+        self,
+        principal: Union[float, np.ndarray],
+        annual_rates: np.ndarray,
+        term_years: Union[float, np.ndarray],
+        reset_months: int = 12,
+    ):
+        if reset_months < 1:
+            raise ValueError("reset_months must be at least 1")
+        annual_rates = np.atleast_1d(np.asarray(annual_rates, dtype=np.float64))
+        n_loans = max(np.size(principal), np.size(term_years), len(annual_rates) if annual_rates.ndim == 2 else 1)
+        self.balance = np.broadcast_to(np.asarray(principal, dtype=np.float64), (n_loans,)).copy()
+        self.term_months = np.broadcast_to(np.ceil(np.asarray(term_years, dtype=np.float64) * 12), (n_loans,))
+        self.monthly_rates = np.broadcast_to(annual_rates / 12, (n_loans, annual_rates.shape[-1]))
+        self.reset_months = reset_months
+        self.month = 0
+        self.payment = np.zeros(n_loans)
+        self.monthly_rate = np.zeros(n_loans)
+
+    @classmethod
+    def fixed(
+        cls,
+        principal: Union[float, np.ndarray],
+        annual_rate: Union[float, np.ndarray],
+        term_years: Union[float, np.ndarray],
+    ) -> "ResettingLoan":
+        # A fixed-rate loan: the payment is set once and only changes through prepay(reduce_payment=True)
+        annual_rate = np.asarray(annual_rate, dtype=np.float64)
+        rates = annual_rate[:, None] if annual_rate.ndim == 1 else annual_rate.reshape(1)
+        return cls(principal, rates, term_years, reset_months=max(int(np.ceil(np.max(term_years) * 12)), 1))
+
+    def __len__(self) -> int:
+        return len(self.balance)
+
+    def prepay(self, amount: Union[float, np.ndarray], reduce_payment: Union[bool, np.ndarray] = False) -> np.ndarray:
+        """Repay up to `amount` of principal after the last advanced month; returns what was repaid.
+
+        Where `reduce_payment` holds, the payment is recalculated over the remaining term; elsewhere
+        it is kept (until the next reset), so the loan finishes early.
+        """
+        repaid = np.minimum(np.maximum(amount, 0.0), self.balance)
+        self.balance = self.balance - repaid
+        remaining = self.term_months - self.month
+        recalculate = np.asarray(reduce_payment, dtype=bool) & (repaid > 0) & (remaining > 0)
+        if recalculate.any():
+            self.payment = np.where(
+                recalculate, pmt(self.monthly_rate, np.maximum(remaining, 1), -self.balance), self.payment
+            )
+        return repaid
+
+    def _reset(self):
+        period = min(self.month // self.reset_months, self.monthly_rates.shape[1] - 1)
+        self.monthly_rate = self.monthly_rates[:, period]
+        remaining = self.term_months - self.month
+        self.payment = np.where(remaining > 0, pmt(self.monthly_rate, np.maximum(remaining, 1), -self.balance), 0.0)
+
+    def advance(self, months: int) -> AmortizationSchedule:
+        # Schedule of the next `months` months; no prepayments, so its prepayment array is zero
+        # Filled month-major so every step writes one contiguous row, returned as (loans, months) views
+        schedule = AmortizationSchedule(*(np.zeros((months, len(self))).T for _ in range(5)))
+        for k in range(months):
+            if self.month % self.reset_months == 0:
+                self._reset()
+            interest = self.balance * self.monthly_rate
+            # The last month of the term settles whatever rounding has left
+            last = self.month + 1 >= self.term_months
+            principal = np.where(last, self.balance, np.minimum(self.payment - interest, self.balance))
+            self.balance = self.balance - principal
+            schedule.interest[:, k] = interest
+            schedule.principal[:, k] = principal
+            schedule.balance[:, k] = self.balance
+            self.month += 1
+        schedule.payment = schedule.interest + schedule.principal
+        return schedule
+
+
+def prepayment_schedule(
+    principal: Union[float, np.ndarray],
+    annual_rate: Union[float, np.ndarray],
+    term_years: Union[float, np.ndarray],
+    annual_prepayment: Union[float, np.ndarray],
+    reduce_payment: Union[bool, np.ndarray],
+    n_years: int,
+) -> AmortizationSchedule:
+    """Monthly schedule over `n_years` of fixed-rate loans repaying `annual_prepayment` at every year end.
+
+    The same steps the batch engine takes year by year, for callers that need the whole schedule up
+    front; a year-end prepayment is recorded in the year's last month, whose balance is net of it.
+    """
+    loan = ResettingLoan.fixed(principal, annual_rate, term_years)
+    years = []
+    for _ in range(n_years):
+        year = loan.advance(12)
+        year.prepayment[:, -1] = loan.prepay(annual_prepayment, reduce_payment)
+        year.balance[:, -1] = loan.balance
+        years.append(year)
+    return _join(years)
+
+
+def reset_schedule(
+    principal: Union[float, np.ndarray],
+    annual_rates: np.ndarray,
+    term_years: Union[float, np.ndarray],
+    reset_months: int = 12,
+) -> AmortizationSchedule:
+    """Full monthly schedule of variable-rate loans, see ResettingLoan."""
+    loan = ResettingLoan(principal, annual_rates, term_years, reset_months)
+    return loan.advance(int(loan.term_months.max()))
@@ -0,0 +1,175 @@
+import math
+from functools import lru_cache
+from importlib.util import find_spec
+from typing import Dict
+
+import numpy as np
+
+from house_investment import (
+    CONFIG_FIELDS,
+    PARAM_FIELDS,
+    SERIES_NAMES,
+    AnalysisParams,
+    HouseInvestment,
+    InvestmentConfig,
+)
+
+# Kernels other than batch.evolve_arrays (the NumPy backend). Each one takes the column dicts of a
+# batch and returns its (series, scenarios, years) block in SERIES_NAMES order, NaN after each
+# scenario's last year; batch.evolve turns that into BatchResults.
+
+
+def python_kernel(p: Dict[str, np.ndarray], c: Dict[str, np.ndarray], closed_form: bool = True) -> np.ndarray:
+    # Reference semantics: HouseInvestment itself, one scenario at a time
+    years_of_study = p["years_of_study"].astype(np.int64)
+    data = np.full((len(SERIES_NAMES), len(years_of_study), int(years_of_study.max())), np.nan)
+    for s, n_years in enumerate(years_of_study):
+        params = AnalysisParams(
+            **{name: float(p[name][s]) for name in PARAM_FIELDS if name != "years_of_study"},
+            years_of_study=int(n_years),
+        )
+        config = InvestmentConfig(**{name: float(c[name][s]) for name in CONFIG_FIELDS})
+        data[:, s, :n_years] = HouseInvestment(params, config).calculate_value_evolution(closed_form=closed_form).data
+    return data
+
+
+def numba_available() -> bool:
+    return find_spec("numba") is not None
+
+
+def numba_compiled() -> bool:
+    # Whether this process already holds the machine code, compiled or loaded from numba's disk cache
+    return _compiled.cache_info().currsize > 0 and bool(_compiled().signatures)
+
+
+# Row of every field in the (fields, scenarios) matrices the compiled kernel takes; plain module
+# constants so that numba freezes them into the machine code
+_HOUSE_PRICE = PARAM_FIELDS.index("house_price")
+_MORTGAGE_INTEREST = PARAM_FIELDS.index("mortgage_interest")
+_MORTGAGE_TERM = PARAM_FIELDS.index("mortgage_term")
+_STOCK_MARKET_RETURN = PARAM_FIELDS.index("stock_market_return")
+_INITIAL_RENT_PRICE = PARAM_FIELDS.index("initial_rent_price")
+_MONTHLY_NET_INCOME = PARAM_FIELDS.index("monthly_net_income")
+_YEARS_OF_STUDY = PARAM_FIELDS.index("years_of_study")
+_INCOME_INCREASE = PARAM_FIELDS.index("annual_income_increase_percentage")
+_INITIAL_EXPENSES = PARAM_FIELDS.index("initial_monthly_expenses")
+_EXPENSES_INCREASE = PARAM_FIELDS.index("annual_expenses_increase_percentage")
+_CATASTRAL = CONFIG_FIELDS.index("catastral_value_percentage")
+_IBI = CONFIG_FIELDS.index("ibi_percentage")
+_MAINTENANCE = CONFIG_FIELDS.index("maintenance_cost_percentage")
+_APPRAISAL_NOTARY = CONFIG_FIELDS.index("appraisal_notary_percentage")
+_COMMUNITY_FEES = CONFIG_FIELDS.index("monthly_community_fees")
+_INSURANCE = CONFIG_FIELDS.index("annual_home_insurance_percentage")
+_GARBAGE_TAX = CONFIG_FIELDS.index("annual_garbage_tax")
+_DOWN_PAYMENT = CONFIG_FIELDS.index("down_payment_percentage")
+_HOUSE_APPRECIATION = CONFIG_FIELDS.index("annual_house_appreciation")
+_RENT_INCREASE = CONFIG_FIELDS.index("annual_rent_increase")
+
+
+def _simulate_scenarios(params: np.ndarray, config: np.ndarray, closed_form: bool, data: np.ndarray):
+    # Scalar loops only, so that numba can compile it as is; run uncompiled it is the slowest backend
+    for s in range(params.shape[1]):
+        house_price = params[_HOUSE_PRICE, s]
+        down_payment = house_price * config[_DOWN_PAYMENT, s]
+        initial_payment_total = down_payment + house_price * config[_APPRAISAL_NOTARY, s]
+        monthly_ownership_costs = (
+            (config[_MAINTENANCE, s] * house_price) / 12
+            + (config[_IBI, s] * (house_price * config[_CATASTRAL, s])) / 12
+            + config[_COMMUNITY_FEES, s]
+            + (config[_INSURANCE, s] * house_price) / 12
+            + config[_GARBAGE_TAX, s] / 12
+        )
+
+        # Fixed-rate annuity, as amortization.pmt computes it
+        loan = house_price - down_payment
+        mortgage_term = params[_MORTGAGE_TERM, s]
+        loan_rate = params[_MORTGAGE_INTEREST, s] / 12
+        loan_months = mortgage_term * 12
+        if loan_rate == 0:
+            annuity_factor = loan_months
+            loan_growth = 1.0
+        else:
+            loan_growth = (1 + loan_rate) ** loan_months
+            annuity_factor = (loan_growth - 1) / loan_rate
+        monthly_morgage_payment = loan * loan_growth / annuity_factor
+        unit_payment = loan_growth / annuity_factor
+
+        monthly_return = params[_STOCK_MARKET_RETURN, s] / 12
+        year_growth_m1 = math.expm1(12 * math.log1p(monthly_return))
+        annuity = 12.0 if monthly_return == 0 else (1 + monthly_return) * year_growth_m1 / monthly_return
+        year_growth = 1 + year_growth_m1
+
+        monthly_income = params[_MONTHLY_NET_INCOME, s]
+        monthly_expenses = params[_INITIAL_EXPENSES, s]
+        house_value = house_price
+        rent_price = params[_INITIAL_RENT_PRICE, s]
+        house_stock_portfolio = 0.0
+        rent_stock_portfolio = initial_payment_total
+
+        for i in range(int(params[_YEARS_OF_STUDY, s])):
+            disposable_income = monthly_income - monthly_expenses
+            if i < mortgage_term:
+                house_monthly_costs = monthly_morgage_payment + monthly_ownership_costs
+            else:
+                house_monthly_costs = monthly_ownership_costs
+            house_savings = disposable_income - house_monthly_costs
+            rent_savings = disposable_income - rent_price
+            data[4, s, i] = house_savings
+            data[5, s, i] = rent_savings
+            data[6, s, i] = house_monthly_costs + monthly_expenses
+            data[7, s, i] = rent_price + monthly_expenses
+
+            if closed_form:
+                house_stock_portfolio = house_stock_portfolio * year_growth + house_savings * annuity
+                rent_stock_portfolio = rent_stock_portfolio * year_growth + rent_savings * annuity
+            else:
+                for _ in range(12):
+                    house_stock_portfolio = (house_stock_portfolio + house_savings) * (1 + monthly_return)
+                    rent_stock_portfolio = (rent_stock_portfolio + rent_savings) * (1 + monthly_return)
+
+            monthly_income *= 1 + params[_INCOME_INCREASE, s]
+            monthly_expenses *= 1 + params[_EXPENSES_INCREASE, s]
+            monthly_ownership_costs *= 1 + params[_EXPENSES_INCREASE, s]
+            house_value *= 1 + config[_HOUSE_APPRECIATION, s]
+            rent_price *= 1 + config[_RENT_INCREASE, s]
+
+            # Outstanding principal after 12 * (i + 1) payments, closed form of the amortization schedule
+            paid_months = 12 * (i + 1)
+            if paid_months >= loan_months:
+                balance = 0.0
+            elif loan_rate == 0:
+                balance = loan * max(1 - paid_months * unit_payment, 0.0)
+            else:
+                growth = math.exp(paid_months * math.log1p(loan_rate))
+                balance = loan * max(growth - unit_payment * (growth - 1) / loan_rate, 0.0)
+
+            data[0, s, i] = house_value
+            data[1, s, i] = house_stock_portfolio
+            data[2, s, i] = house_value - balance + house_stock_portfolio
+            data[3, s, i] = rent_stock_portfolio
+            data[8, s, i] = balance
+
+
+@lru_cache(maxsize=None)
+def _compiled():
+    # Compiled on first use; cache=True keeps the machine code on disk for later processes
+    import numba
+
+    return numba.njit(cache=True)(_simulate_scenarios)
+
+
+def _run(kernel, p: Dict[str, np.ndarray], c: Dict[str, np.ndarray], closed_form: bool) -> np.ndarray:
+    params = np.array([p[name] for name in PARAM_FIELDS], dtype=np.float64)
+    config = np.array([c[name] for name in CONFIG_FIELDS], dtype=np.float64)
+    data = np.full((len(SERIES_NAMES), params.shape[1], int(params[_YEARS_OF_STUDY].max())), np.nan)
+    kernel(params, config, closed_form, data)
+    return data
+
+
+def loop_kernel(p: Dict[str, np.ndarray], c: Dict[str, np.ndarray], closed_form: bool = True) -> np.ndarray:
+    # The numba kernel's source run by the interpreter, to check it where numba is not installed
+    return _run(_simulate_scenarios, p, c, closed_form)
+
+
+def numba_kernel(p: Dict[str, np.ndarray], c: Dict[str, np.ndarray], closed_form: bool = True) -> np.ndarray:
+    return _run(_compiled(), p, c, closed_form)
@@ -0,0 +1,279 @@
+import argparse
+import csv
+import sys
+from dataclasses import dataclass
+from typing import IO, Optional, Sequence, Tuple
+
+import numpy as np
+
+from batch import BatchResults, MarketPath, batch_results
+from house_investment import SERIES_NAMES, AnalysisParams, HouseInvestment, InvestmentConfig
+from instrumentation import count, timed
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+@dataclass
+class MonthlySeries:
+    # Month-end index levels (e.g. a total-return stock index, a house price index, CPI or a rent index)
+    dates: np.ndarray  # datetime64[M], consecutive months
+    levels: np.ndarray
+
+    def __post_init__(self):
+        self.dates = np.asarray(self.dates, dtype="datetime64[M]")
+        self.levels = np.asarray(self.levels, dtype=np.float64)
+        if self.dates.shape != self.levels.shape or self.dates.ndim != 1:
+            raise ValueError("dates and levels must be 1-D and of the same length")
+        if len(self.dates) > 1 and (np.diff(self.dates) != np.timedelta64(1, "M")).any():
+            raise ValueError("Series must hold consecutive months without gaps")
+        if (self.levels <= 0).any() or not np.isfinite(self.levels).all():
+            raise ValueError("Index levels must be positive")
+
+    @classmethod
+    def from_returns(cls, dates, returns) -> "MonthlySeries":
+        # Simple monthly returns, the one dated M being earned during month M; the level before the
+        # first return is dated the month before and set to 1
+        returns = np.asarray(returns, dtype=np.float64)
+        dates = np.asarray(dates, dtype="datetime64[M]")
+        levels = np.concatenate(([1.0], np.cumprod(1 + returns)))
+        return cls(np.concatenate(([dates[0] - 1], dates)) if len(dates) else dates, levels)
+
+    def between(self, first, last) -> "MonthlySeries":
+        keep = (self.dates >= np.datetime64(first, "M")) & (self.dates <= np.datetime64(last, "M"))
+        return MonthlySeries(self.dates[keep], self.levels[keep])
+
+
+def read_series(
+    source: IO[str], value_column: Optional[str] = None, date_column: str = "date", kind: str = "level"
+) -> MonthlySeries:
+    """Monthly series from a CSV with a date column ("YYYY-MM" or "YYYY-MM-DD") and a value column.
+
+    `value_column` defaults to the first column other than the date. `kind="return"` reads simple
+    monthly returns (0.01 for 1%) instead of index levels. Rows may be in any order.
+    """
+    if kind not in ("level", "return"):
+        raise ValueError(f"Unknown series kind '{kind}', expected 'level' or 'return'")
+    reader = csv.DictReader(source)
+    if value_column is None:
+        value_column = next((name for name in reader.fieldnames or () if name != date_column), None)
+    if value_column is None or date_column not in (reader.fieldnames or ()):
+        raise ValueError(f"Expected a '{date_column}' column and a value column")
+    dates, values = [], []
+    for number, row in enumerate(reader, 2):
+        try:
+            dates.append(np.datetime64(row[date_column].strip()[:7], "M"))
+            values.append(float(row[value_column]))
+        except (TypeError, ValueError):
+            raise ValueError(f"line {number}: cannot read {row[date_column]!r}, {row[value_column]!r}") from None
+    order = np.argsort(np.array(dates, dtype="datetime64[M]"), kind="stable")
+    dates, values = np.array(dates, dtype="datetime64[M]")[order], np.array(values)[order]
+    return MonthlySeries.from_returns(dates, values) if kind == "return" else MonthlySeries(dates, values)
+
+
+@dataclass
+class HistoricalMarket:
+    # Stock returns drive both portfolios, the house index the house value and the rent index (or CPI)
+    # the rent; all three are cut to the months they have in common
+    stock: MonthlySeries
+    house: MonthlySeries
+    rent: MonthlySeries
+
+    def __post_init__(self):
+        first = max(series.dates[0] for series in (self.stock, self.house, self.rent))
+        last = min(series.dates[-1] for series in (self.stock, self.house, self.rent))
+        if first > last:
+            raise ValueError("The stock, house and rent series do not overlap")
+        self.stock, self.house, self.rent = (
+            series.between(first, last) for series in (self.stock, self.house, self.rent)
+        )
+
+    @property
+    def dates(self) -> np.ndarray:
+        return self.stock.dates
+
+    @classmethod
+    def from_csv(cls, stock_path: str, house_path: str, rent_path: str, stock_kind: str = "level"):
+        series = []
+        for path, kind in ((stock_path, stock_kind), (house_path, "level"), (rent_path, "level")):
+            with open(path, newline="") as file:
+                series.append(read_series(file, kind=kind))
+        return cls(*series)
+
+    def window_path(self, n_years: int) -> MarketPath:
+        # The rolling windows as a market path for batch.evolve_arrays, scenario w starting at month w
+        n_windows = len(self.dates) - 12 * n_years
+        stock_returns = self.stock.levels[1:] / self.stock.levels[:-1] - 1
+        starts = np.arange(n_windows)
+
+        def market(year: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+            a = starts + 12 * year
+            house = self.house.levels[a + 12] / self.house.levels[a] - 1
+            rent = self.rent.levels[a + 12] / self.rent.levels[a] - 1
+            return stock_returns[a[:, None] + np.arange(12)], house, rent
+
+        return market
+
+
+@dataclass
+class BacktestResult:
+    # Scenario w of `results` is the window starting at start_dates[w]
+    start_dates: np.ndarray
+    results: BatchResults
+
+    @property
+    def difference(self) -> np.ndarray:
+        # (windows, years) buy minus rent net worth
+        return self.results.combined_values - self.results.rent_stock_values
+
+    @property
+    def probability_buy_wins(self) -> np.ndarray:
+        # Share of start dates where buying is ahead, per year
+        return (self.difference > 0).mean(axis=0)
+
+    def percentiles(self, q: Sequence[float] = DEFAULT_PERCENTILES) -> np.ndarray:
+        # (len(q), years) percentiles of the difference across start dates
+        return np.percentile(self.difference, q, axis=0)
+
+    def by_start_date(self) -> np.ndarray:
+        # End-of-horizon outcome of every window, as a record array ordered by start date
+        details = self.results.financial_details
+        records = np.empty(
+            len(self.start_dates),
+            dtype=[("start", "datetime64[M]"), ("buy", "f8"), ("rent", "f8"), ("difference", "f8")],
+        )
+        records["start"] = self.start_dates
+        records["buy"] = details["house_scenario_net_worth"]
+        records["rent"] = details["rent_scenario_net_worth"]
+        records["difference"] = records["buy"] - records["rent"]
+        return records
+
+
+def _year_blocks(levels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # For the 12 months starting at every month a: the growth of a balance over them, and what 1
+    # contributed at the start of each of them is worth at their end, weights[a, k] = L[a + 12] / L[a + k].
+    # Built from the monthly growth factors the monthly loop applies, on all blocks at once, because
+    # ratios of far-apart index levels lose precision over long histories
+    monthly_growth = 1 + (levels[1:] / levels[:-1] - 1)
+    n_blocks = len(monthly_growth) - 11
+    weights = np.empty((n_blocks, 12))
+    weights[:, 11] = monthly_growth[11 : 11 + n_blocks]
+    for k in range(10, -1, -1):
+        weights[:, k] = weights[:, k + 1] * monthly_growth[k : k + n_blocks]
+    return weights[:, 0].copy(), weights
+
+
+@timed("backtest")
+def backtest(
+    params: AnalysisParams, market: HistoricalMarket, config: InvestmentConfig = InvestmentConfig()
+) -> BacktestResult:
+    """Run `params` once per start month of `market`, over rolling windows of years_of_study years.
+
+    Same model as batch.evolve_arrays with `market.window_path()`: stock returns arrive monthly,
+    house and rent growth once a year, everything else follows `params` and `config`. Overlapping
+    windows share their calendar years, so the stock growth and contribution weights of every
+    12-month block are computed once (see _year_blocks) and each window year is a lookup into them;
+    house values and rents are ratios of the index levels. The cost is O(months + windows * years)
+    instead of O(windows * months).
+    """
+    n_years = params.years_of_study
+    n_windows = len(market.dates) - 12 * n_years
+    if n_windows < 1:
+        raise ValueError(
+            f"{len(market.dates)} common months cannot hold a {n_years}-year window (needs {12 * n_years + 1})"
+        )
+    count("scenarios_evaluated", n_windows)
+    count("months_simulated", 12 * n_years * n_windows)
+
+    block_growth, block_weights = _year_blocks(market.stock.levels)
+    block_annuity = block_weights.sum(axis=1)
+    house_index, rent_index = market.house.levels, market.rent.levels
+    starts = np.arange(n_windows)
+
+    # The purchase, the loan and every cost but rent are the same in all windows: take them from the
+    # scalar model, so that the backtest can never drift from it
+    analysis = HouseInvestment(params, config)
+    state = analysis.initial_state(params)
+    loan = analysis.mortgage_schedule(params)
+    monthly_payments = loan.payment[0].reshape(n_years, 12)
+    monthly_income = state.monthly_income
+    monthly_expenses = state.monthly_expenses
+    monthly_ownership_costs = state.monthly_ownership_costs
+
+    house_stock_portfolio = np.full(n_windows, float(state.house_stock_portfolio))
+    rent_stock_portfolio = np.full(n_windows, float(state.rent_stock_portfolio))
+    data = np.empty((len(SERIES_NAMES), n_windows, n_years))
+    out = dict(zip(SERIES_NAMES, data))
+
+    for i in range(n_years):
+        a = starts + 12 * i
+        e = a + 12
+        disposable_income = monthly_income - monthly_expenses
+        house_monthly_costs = monthly_payments[i].mean() + monthly_ownership_costs
+        rent_price = state.rent_price * rent_index[a] / rent_index[starts]
+        house_savings = disposable_income - house_monthly_costs
+        rent_savings = disposable_income - rent_price
+
+        out["house_savings"][:, i] = house_savings
+        out["rent_savings"][:, i] = rent_savings
+        out["house_expenses"][:, i] = house_monthly_costs + monthly_expenses
+        out["rent_expenses"][:, i] = rent_price + monthly_expenses
+
+        # The payment is constant within a year except when the loan ends or a prepayment shortens it
+        house_contributions = (disposable_income - monthly_ownership_costs) - monthly_payments[i]
+        growth = block_growth[a]
+        house_stock_portfolio = house_stock_portfolio * growth + block_weights[a] @ house_contributions
+        house_stock_portfolio -= loan.prepayment[0, 12 * i + 11]
+        rent_stock_portfolio = rent_stock_portfolio * growth + rent_savings * block_annuity[a]
+
+        monthly_income *= 1 + params.annual_income_increase_percentage
+        monthly_expenses *= 1 + params.annual_expenses_increase_percentage
+        monthly_ownership_costs *= 1 + params.annual_expenses_increase_percentage
+
+        out["house_values"][:, i] = state.house_value * house_index[e] / house_index[starts]
+        out["house_stock_values"][:, i] = house_stock_portfolio
+        out["rent_stock_values"][:, i] = rent_stock_portfolio
+
+    out["mortgage_balances"][:] = loan.balance[0, 11::12]
+    np.subtract(out["house_values"], out["mortgage_balances"], out=out["combined_values"])
+    np.add(out["combined_values"], out["house_stock_values"], out=out["combined_values"])
+    return BacktestResult(market.dates[:n_windows], batch_results(data, np.full(n_windows, n_years)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest buy vs rent over every start month of historical data")
+    parser.add_argument("stock", help="CSV of a monthly total-return stock index (date,value)")
+    parser.add_argument("house", help="CSV of a monthly house price index")
+    parser.add_argument("rent", help="CSV of a monthly rent index or CPI")
+    parser.add_argument("--stock-returns", action="store_true", help="The stock CSV holds monthly returns")
+    parser.add_argument("--years", type=int, default=30, help="Window length in years")
+    parser.add_argument("--house-price", type=float, default=300000)
+    parser.add_argument("--mortgage-interest", type=float, default=0.02)
+    parser.add_argument("--mortgage-term", type=int, default=30)
+    parser.add_argument("--rent-price", type=float, default=1100)
+    parser.add_argument("--income", type=float, default=2600, help="Monthly net income")
+    args = parser.parse_args(argv)
+
+    market = HistoricalMarket.from_csv(args.stock, args.house, args.rent, "return" if args.stock_returns else "level")
+    params = AnalysisParams(
+        house_price=args.house_price,
+        mortgage_interest=args.mortgage_interest,
+        mortgage_term=args.mortgage_term,
+        stock_market_return=0.0,  # unused: returns come from the stock series
+        initial_rent_price=args.rent_price,
+        monthly_net_income=args.income,
+        years_of_study=args.years,
+    )
+    result = backtest(params, market)
+    writer = csv.writer(sys.stdout, lineterminator="\n")
+    writer.writerow(["start", "buy", "rent", "difference"])
+    for record in result.by_start_date():
+        writer.writerow([str(record["start"]), *(repr(float(record[name])) for name in ("buy", "rent", "difference"))])
+    print(
+        f"{len(result.start_dates)} windows, buying ahead after {args.years} years in "
+        f"{result.probability_buy_wins[-1]:.0%} of them",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
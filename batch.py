@@ -0,0 +1,360 @@
+from dataclasses import MISSING, dataclass
+from typing import Callable, Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from amortization import ResettingLoan, pmt, year_end_balances
+from backends import numba_available, numba_compiled, numba_kernel, python_kernel
+from house_investment import (
+    CONFIG_FIELDS,
+    PARAM_FIELDS,
+    SERIES_NAMES,
+    AnalysisParams,
+    InvestmentConfig,
+    ValueEvolution,
+    annual_compounding_factors,
+    compound_year,
+)
+from instrumentation import count, observe, timed
+
+ParamsBatch = Union[Sequence[AnalysisParams], np.ndarray]
+ConfigBatch = Union[InvestmentConfig, Sequence[InvestmentConfig], np.ndarray]
+# market(year) -> (monthly stock returns shaped (scenarios, 12), house appreciation, rent increase)
+# for that year. Replaces the constant stock_market_return / annual_* rates when given.
+MarketPath = Callable[[int], Tuple[np.ndarray, np.ndarray, np.ndarray]]
+
+
+def _batch_series_view(index: int) -> property:
+    return property(lambda self: self.data[index], doc=f"(scenarios, years) view of {SERIES_NAMES[index]}")
+
+
+@dataclass
+class BatchResults:
+    # One (series, scenarios, years) float64 block in SERIES_NAMES order. Scenarios shorter than the
+    # longest years_of_study in the batch are padded with NaN after their last year.
+    data: np.ndarray
+    financial_details: Dict[str, np.ndarray]
+    years_of_study: np.ndarray
+
+    house_values = _batch_series_view(0)
+    house_stock_values = _batch_series_view(1)
+    combined_values = _batch_series_view(2)
+    rent_stock_values = _batch_series_view(3)
+    house_savings = _batch_series_view(4)
+    rent_savings = _batch_series_view(5)
+    house_expenses = _batch_series_view(6)
+    rent_expenses = _batch_series_view(7)
+    mortgage_balances = _batch_series_view(8)
+
+    def __len__(self) -> int:
+        return len(self.years_of_study)
+
+    def scenario(self, index: int) -> ValueEvolution:
+        # Same result type as HouseInvestment.calculate_value_evolution for a single scenario
+        n_years = int(self.years_of_study[index])
+        details = {key: values[index] for key, values in self.financial_details.items()}
+        return ValueEvolution(np.ascontiguousarray(self.data[:, index, :n_years]), details)
+
+
+def _column(records, name: str) -> np.ndarray:
+    return np.array([getattr(record, name) for record in records], dtype=np.float64)
+
+
+def params_to_arrays(params: ParamsBatch) -> Dict[str, np.ndarray]:
+    if isinstance(params, np.ndarray):
+        defaults = AnalysisParams.__dataclass_fields__
+        columns = {}
+        for name in PARAM_FIELDS:
+            if name in (params.dtype.names or ()):
+                columns[name] = np.asarray(params[name], dtype=np.float64)
+            elif defaults[name].default is not MISSING:
+                columns[name] = np.full(len(params), defaults[name].default, dtype=np.float64)
+            else:
+                raise ValueError(f"Structured params array is missing required field '{name}'")
+        return columns
+    return {name: _column(params, name) for name in PARAM_FIELDS}
+
+
+def config_to_arrays(config: ConfigBatch, n_scenarios: int) -> Dict[str, np.ndarray]:
+    if isinstance(config, InvestmentConfig):
+        return {name: np.full(n_scenarios, getattr(config, name), dtype=np.float64) for name in CONFIG_FIELDS}
+    if isinstance(config, np.ndarray):
+        defaults = InvestmentConfig()
+        return {
+            name: (
+                np.asarray(config[name], dtype=np.float64)
+                if name in (config.dtype.names or ())
+                else np.full(n_scenarios, getattr(defaults, name), dtype=np.float64)
+            )
+            for name in CONFIG_FIELDS
+        }
+    if len(config) != n_scenarios:
+        raise ValueError(f"Got {len(config)} configs for {n_scenarios} scenarios")
+    return {name: _column(config, name) for name in CONFIG_FIELDS}
+
+
+def broadcast_columns(
+    base_params: dict, base_config: dict, overrides: Dict[str, np.ndarray], n_scenarios: int
+) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    # Column dicts for evolve_arrays with every field at its base value (as given by dataclasses.asdict)
+    # except the overridden ones, which may be any AnalysisParams or InvestmentConfig field
+    p = {name: overrides.get(name, np.full(n_scenarios, base_params[name], dtype=np.float64)) for name in PARAM_FIELDS}
+    c = {name: overrides.get(name, np.full(n_scenarios, base_config[name], dtype=np.float64)) for name in CONFIG_FIELDS}
+    return p, c
+
+
+def calculate_value_evolution_batch(
+    params: ParamsBatch, config: ConfigBatch = InvestmentConfig(), closed_form: bool = True, backend: str = "auto"
+) -> BatchResults:
+    """Vectorized HouseInvestment.calculate_value_evolution over a batch of scenarios.
+
+    `params` is a sequence of AnalysisParams or a structured array with the same field names,
+    `config` a single InvestmentConfig shared by the batch or one per scenario. `closed_form` selects
+    the same yearly compounding kernel as the scalar path. See `evolve` for `backend`.
+    """
+    p = params_to_arrays(params)
+    n_scenarios = len(p["house_price"])
+    c = config_to_arrays(config, n_scenarios)
+    return evolve(p, c, closed_form, backend)
+
+
+BACKENDS = ("auto", "python", "numpy", "numba")
+# "auto" evaluates batches up to this size one scenario at a time, where the batch kernel's fixed
+# per-call cost is larger than the work it saves
+PYTHON_MAX_BATCH = 3
+# ... and only picks numba for batches of at least this size, unless the kernel is already compiled
+# in this process: the first call pays numba's import and compilation (or cache load), which costs
+# about as much as the numpy kernel spends on this many scenarios
+NUMBA_MIN_BATCH = 100_000
+
+
+def select_backend(n_scenarios: int, backend: str = "auto") -> str:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+    if backend == "numba" and not numba_available():
+        raise ValueError("The numba backend needs the numba package")
+    if backend != "auto":
+        return backend
+    if n_scenarios <= PYTHON_MAX_BATCH:
+        return "python"
+    if numba_available() and (n_scenarios >= NUMBA_MIN_BATCH or numba_compiled()):
+        return "numba"
+    return "numpy"
+
+
+def evolve(
+    p: Dict[str, np.ndarray], c: Dict[str, np.ndarray], closed_form: bool = True, backend: str = "auto"
+) -> BatchResults:
+    """evolve_arrays on a chosen compute backend; all of them return the same results.
+
+    "python" runs HouseInvestment per scenario (the reference), "numpy" the vectorized kernel and
+    "numba" a compiled per-scenario loop, available when numba is installed. "auto" picks by batch
+    size: python for tiny batches, numba for very large ones (or any size once it is compiled) when
+    installed, numpy otherwise.
+    """
+    years_of_study = p["years_of_study"].astype(np.int64)
+    if len(years_of_study) == 0:
+        raise ValueError("Cannot evaluate an empty batch")
+    if years_of_study.min() < 1:
+        raise ValueError("years_of_study must be at least 1 for every scenario")
+    if (p["annual_prepayment"] > 0).any():
+        # Only the numpy kernel (and the reference) step the loan month by month
+        if backend == "numba":
+            raise ValueError("The numba backend does not model prepayments")
+        backend = "numpy" if backend == "auto" and len(years_of_study) > PYTHON_MAX_BATCH else backend
+    backend = select_backend(len(years_of_study), backend)
+    if backend == "numpy":
+        return evolve_arrays(p, c, closed_form)
+    if backend == "python":
+        # Instrumented by HouseInvestment itself
+        return batch_results(python_kernel(p, c, closed_form), years_of_study)
+    count("scenarios_evaluated", len(years_of_study))
+    count("months_simulated", 12 * int(years_of_study.sum()))
+    observe("batch_size", len(years_of_study))
+    return batch_results(numba_kernel(p, c, closed_form), years_of_study)
+
+
+@timed("batch_evolve")
+def evolve_arrays(
+    p: Dict[str, np.ndarray],
+    c: Dict[str, np.ndarray],
+    closed_form: bool = True,
+    market: Optional[MarketPath] = None,
+    mortgage: Optional[ResettingLoan] = None,
+) -> BatchResults:
+    # Kernel on column dicts as returned by params_to_arrays/config_to_arrays, for callers that
+    # build their scenario columns directly instead of going through dataclass instances.
+    # `mortgage` replaces the fixed-rate loan (mortgage_interest is then ignored); it is advanced
+    # year by year, so pass a fresh one per call.
+    years_of_study = p["years_of_study"].astype(np.int64)
+    if len(years_of_study) == 0:
+        raise ValueError("Cannot evaluate an empty batch")
+    if years_of_study.min() < 1:
+        raise ValueError("years_of_study must be at least 1 for every scenario")
+    n_scenarios = len(years_of_study)
+    n_years = int(years_of_study.max())
+    if mortgage is not None and len(mortgage) != n_scenarios:
+        raise ValueError(f"Got a mortgage for {len(mortgage)} loans and {n_scenarios} scenarios")
+    count("scenarios_evaluated", n_scenarios)
+    count("months_simulated", 12 * int(years_of_study.sum()))
+    observe("batch_size", n_scenarios)
+
+    house_price = p["house_price"]
+    down_payment = house_price * c["down_payment_percentage"]
+    appraisal_notary = house_price * c["appraisal_notary_percentage"]
+    initial_payment_total = down_payment + appraisal_notary
+
+    # Mirrors HouseInvestment._calculate_monthly_costs operation by operation
+    catastral_value = house_price * c["catastral_value_percentage"]
+    monthly_ownership_costs = (
+        (c["maintenance_cost_percentage"] * house_price) / 12
+        + (c["ibi_percentage"] * catastral_value) / 12
+        + c["monthly_community_fees"]
+        + (c["annual_home_insurance_percentage"] * house_price) / 12
+        + c["annual_garbage_tax"] / 12
+    )
+    principal = house_price - down_payment
+    monthly_morgage_payment = pmt(p["mortgage_interest"] / 12, p["mortgage_term"] * 12, -principal)
+    prepayment = p["annual_prepayment"]
+    prepaying = bool((prepayment > 0).any())
+    # Scenarios whose loan is stepped month by month: all of them with a given mortgage, else only
+    # those with prepayments (which make the payment vary), so the rest keep the exact closed form
+    loan_rows, fixed_rows = slice(None), None
+    if mortgage is None and prepaying:
+        rows = np.flatnonzero(prepayment > 0)
+        if len(rows) < n_scenarios:
+            loan_rows, fixed_rows = rows, np.flatnonzero(prepayment <= 0)
+        mortgage = ResettingLoan.fixed(
+            principal[loan_rows], p["mortgage_interest"][loan_rows], p["mortgage_term"][loan_rows]
+        )
+
+    monthly_income = p["monthly_net_income"].copy()
+    monthly_expenses = p["initial_monthly_expenses"].copy()
+    house_value = house_price.copy()
+    rent_price = p["initial_rent_price"].copy()
+
+    house_stock_portfolio = np.zeros(n_scenarios)
+    rent_stock_portfolio = initial_payment_total.copy()
+
+    monthly_return = p["stock_market_return"] / 12
+    compounding_factors = annual_compounding_factors(monthly_return)
+    income_growth = 1 + p["annual_income_increase_percentage"]
+    expenses_growth = 1 + p["annual_expenses_increase_percentage"]
+    house_growth = 1 + c["annual_house_appreciation"]
+    rent_growth = 1 + c["annual_rent_increase"]
+    mortgage_term = p["mortgage_term"]
+
+    data = np.empty((len(SERIES_NAMES), n_scenarios, n_years))
+    out = dict(zip(SERIES_NAMES, data))
+
+    for i in range(n_years):
+        disposable_income = monthly_income - monthly_expenses
+        house_monthly_costs = np.where(
+            i < mortgage_term, monthly_morgage_payment + monthly_ownership_costs, monthly_ownership_costs
+        )
+        if mortgage is not None:
+            # The payment can change at any reset within the year; the series record its yearly mean
+            year = mortgage.advance(12)
+            loan_costs = monthly_ownership_costs[loan_rows]
+            # Month-major (12, loans), matching the layout ResettingLoan fills
+            monthly_house_savings = (disposable_income[loan_rows] - loan_costs) - year.payment.T
+            house_monthly_costs[loan_rows] = year.payment.mean(axis=1) + loan_costs
+            out["mortgage_balances"][loan_rows, i] = year.balance[:, -1]
+        house_savings = disposable_income - house_monthly_costs
+        rent_savings = disposable_income - rent_price
+
+        out["house_savings"][:, i] = house_savings
+        out["rent_savings"][:, i] = rent_savings
+        out["house_expenses"][:, i] = house_monthly_costs + monthly_expenses
+        out["rent_expenses"][:, i] = rent_price + monthly_expenses
+
+        if market is None:
+            next_house_portfolio = compound_year(
+                house_stock_portfolio, house_savings, monthly_return, compounding_factors, closed_form
+            )
+            next_rent_portfolio = compound_year(
+                rent_stock_portfolio, rent_savings, monthly_return, compounding_factors, closed_form
+            )
+            if mortgage is not None:
+                # Loans stepped month by month invest a different amount every month
+                monthly_growth = 1 + monthly_return[loan_rows]
+                house_part, rent_part = house_stock_portfolio[loan_rows], rent_stock_portfolio[loan_rows]
+                for j in range(12):
+                    house_part = (house_part + monthly_house_savings[j]) * monthly_growth
+                    rent_part = (rent_part + rent_savings[loan_rows]) * monthly_growth
+                next_house_portfolio[loan_rows] = house_part
+                next_rent_portfolio[loan_rows] = rent_part
+            house_stock_portfolio, rent_stock_portfolio = next_house_portfolio, next_rent_portfolio
+        else:
+            monthly_returns, house_appreciation, rent_increase = market(i)
+            house_growth = 1 + house_appreciation
+            rent_growth = 1 + rent_increase
+            if mortgage is None:
+                contributions = np.broadcast_to(house_savings, (12, n_scenarios))
+            elif fixed_rows is None:
+                contributions = monthly_house_savings
+            else:
+                contributions = np.repeat(house_savings[np.newaxis], 12, axis=0)
+                contributions[:, loan_rows] = monthly_house_savings
+            for j in range(12):
+                monthly_growth = 1 + monthly_returns[:, j]
+                house_stock_portfolio = (house_stock_portfolio + contributions[j]) * monthly_growth
+                rent_stock_portfolio = (rent_stock_portfolio + rent_savings) * monthly_growth
+
+        if prepaying:
+            # Year-end prepayment out of the house scenario's portfolio
+            repaid = mortgage.prepay(prepayment[loan_rows], p["prepayment_reduces_payment"][loan_rows] > 0)
+            house_stock_portfolio[loan_rows] -= repaid
+            out["mortgage_balances"][loan_rows, i] = mortgage.balance
+
+        monthly_income *= income_growth
+        monthly_expenses *= expenses_growth
+        monthly_ownership_costs *= expenses_growth
+        house_value *= house_growth
+        rent_price *= rent_growth
+
+        out["house_values"][:, i] = house_value
+        out["house_stock_values"][:, i] = house_stock_portfolio
+        out["rent_stock_values"][:, i] = rent_stock_portfolio
+
+    if mortgage is None:
+        out["mortgage_balances"][:] = year_end_balances(principal, p["mortgage_interest"], p["mortgage_term"], n_years)
+    elif fixed_rows is not None:
+        out["mortgage_balances"][fixed_rows] = year_end_balances(
+            principal[fixed_rows], p["mortgage_interest"][fixed_rows], p["mortgage_term"][fixed_rows], n_years
+        )
+    np.subtract(out["house_values"], out["mortgage_balances"], out=out["combined_values"])
+    np.add(out["combined_values"], out["house_stock_values"], out=out["combined_values"])
+
+    return batch_results(data, years_of_study)
+
+
+def batch_results(data: np.ndarray, years_of_study: np.ndarray) -> BatchResults:
+    # financial_details of a filled (series, scenarios, years) block; blanks the years past each horizon
+    out = dict(zip(SERIES_NAMES, data))
+    rows = np.arange(len(years_of_study))
+    last = years_of_study - 1
+    final_house_value = out["house_values"][rows, last]
+    final_mortgage_balance = out["mortgage_balances"][rows, last]
+    final_house_stock = out["house_stock_values"][rows, last]
+    final_rent_stock = out["rent_stock_values"][rows, last]
+    home_equity = final_house_value - final_mortgage_balance
+    financial_details = {
+        "house_scenario_net_worth": home_equity + final_house_stock,
+        "rent_scenario_net_worth": final_rent_stock,
+        "final_house_value": final_house_value,
+        "remaining_mortgage_balance": final_mortgage_balance,
+        "home_equity": home_equity,
+        "house_stock_portfolio": final_house_stock,
+        "rent_stock_portfolio": final_rent_stock,
+        "initial_house_savings": out["house_savings"][:, 0].copy(),
+        "initial_rent_savings": out["rent_savings"][:, 0].copy(),
+        "final_house_savings": out["house_savings"][rows, last],
+        "final_rent_savings": out["rent_savings"][rows, last],
+    }
+
+    if (years_of_study < data.shape[2]).any():
+        padding = np.arange(data.shape[2])[None, :] >= years_of_study[:, None]
+        data[:, padding] = np.nan
+
+    return BatchResults(data, financial_details, years_of_study)
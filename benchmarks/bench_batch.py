@@ -0,0 +1,86 @@
+"""Time the batch engine on 10k scenarios against evaluating them one at a time.
+
+After `pip install -e .`, run:  python benchmarks/bench_batch.py [--scenarios N] [--sample N]
+
+The 100x target of the batch engine is measured against the per-scenario monthly double loop
+(`calculate_value_evolution(closed_form=False)`), which is how every scenario used to be evaluated.
+The scalar path has since become faster itself (closed-form years, shared amortization tables), so
+the speed-up over today's default `calculate_value_evolution()` is reported as well. The printing
+loop of the original code is slower still (see bench_value_evolution.py). Scalar paths are timed on
+`--sample` scenarios and scaled up to the batch size. The batch is timed both on a list of
+AnalysisParams and on a structured array, which skips reading every field of every instance.
+"""
+
+import argparse
+import time
+import timeit
+from dataclasses import replace
+
+import numpy as np
+
+from batch import calculate_value_evolution_batch, params_to_arrays
+from house_investment import HouseInvestment
+from scenarios import BASE_PARAMS
+
+
+def scenarios(n: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    return [
+        replace(
+            BASE_PARAMS,
+            house_price=float(rng.uniform(150_000, 600_000)),
+            initial_rent_price=float(rng.uniform(600, 2000)),
+            mortgage_interest=float(rng.uniform(0.01, 0.05)),
+            stock_market_return=float(rng.uniform(0.02, 0.09)),
+        )
+        for _ in range(n)
+    ]
+
+
+def structured(params: list) -> np.ndarray:
+    columns = params_to_arrays(params)
+    table = np.empty(len(params), dtype=[(name, np.float64) for name in columns])
+    for name, values in columns.items():
+        table[name] = values
+    return table
+
+
+def _best_batch(scenarios, backend: str) -> float:
+    return min(timeit.repeat(lambda: calculate_value_evolution_batch(scenarios, backend=backend), number=1, repeat=3))
+
+
+def _per_scenario(params: list, closed_form: bool) -> float:
+    start = time.perf_counter()
+    for scenario in params:
+        HouseInvestment(scenario).calculate_value_evolution(closed_form=closed_form)
+    return (time.perf_counter() - start) / len(params)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch engine against the per-scenario loop")
+    parser.add_argument("--scenarios", type=int, default=10_000)
+    parser.add_argument("--sample", type=int, default=1_000, help="Scenarios timed on each scalar path")
+    parser.add_argument("--backend", default="numpy", help="Batch backend (default: numpy)")
+    args = parser.parse_args(argv)
+
+    params = scenarios(args.scenarios)
+    sample = params[: args.sample]
+    calculate_value_evolution_batch(params[:100], backend=args.backend)  # Warm-up (and numba compilation)
+    batch = _best_batch(params, args.backend)
+    batch_table = _best_batch(structured(params), args.backend)
+    monthly = _per_scenario(sample, closed_form=False) * args.scenarios
+    closed_form = _per_scenario(sample, closed_form=True) * args.scenarios
+
+    print(f"{args.scenarios} scenarios, {BASE_PARAMS.years_of_study} years, batch backend {args.backend}")
+    print(f"{'path':<40} {'seconds':>9} {'list batch':>11} {'array batch':>12}")
+    print(f"{'batch, list of AnalysisParams':<40} {batch:>9.3f}")
+    print(f"{'batch, structured array':<40} {batch_table:>9.3f}")
+    for name, seconds in (
+        ("scalar monthly loop (the 100x baseline)", monthly),
+        ("scalar calculate_value_evolution()", closed_form),
+    ):
+        print(f"{name:<40} {seconds:>9.3f} {seconds / batch:>10.1f}x {seconds / batch_table:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Time HouseInvestment.calculate_value_evolution against the original printing loop.
+
+After `pip install -e .`, run:  python benchmarks/bench_value_evolution.py
+"""
+
+import contextlib
+import os
+import timeit
+from dataclasses import replace
+
+from house_investment import AnalysisParams, HouseInvestment
+from scenarios import BASE_PARAMS
+
+HORIZONS = (40, 100, 500)
+
+
+def legacy_calculate_value_evolution(analysis: HouseInvestment, params: AnalysisParams) -> dict:
+    # The loop as it was before the quiet mode: two prints per simulated month and
+    # combined_values rebuilt from scratch every year.
+    down_payment, appraisal_notary = analysis._calculate_initial_payments(params.house_price)
+    initial_payment_total = down_payment + appraisal_notary
+    monthly_ownership_costs = analysis._calculate_monthly_costs(params.house_price)
+    monthly_morgage_payment = analysis._calculate_monthly_payment(
+        params.house_price, down_payment, params.mortgage_term, params.mortgage_interest
+    )
+    monthly_income = params.monthly_net_income
+    monthly_expenses = params.initial_monthly_expenses
+    house_value = params.house_price
+    rent_price = params.initial_rent_price
+    house_stock_portfolio = 0
+    rent_stock_portfolio = initial_payment_total
+    rent_stock_portfolio_initial = initial_payment_total
+    house_values, house_stock_values, rent_stock_values = [], [], []
+    house_savings_values, rent_savings_values, house_expenses, rent_expenses = [], [], [], []
+    for i in range(params.years_of_study):
+        disposable_income = monthly_income - monthly_expenses
+        if i < params.mortgage_term:
+            house_monthly_costs = monthly_morgage_payment + monthly_ownership_costs
+        else:
+            house_monthly_costs = monthly_ownership_costs
+        house_savings = disposable_income - house_monthly_costs
+        house_savings_values.append(house_savings)
+        rent_savings = disposable_income - rent_price
+        rent_savings_values.append(rent_savings)
+        house_expenses.append(house_monthly_costs + monthly_expenses)
+        rent_expenses.append(rent_price + monthly_expenses)
+        for j in range(12):
+            print(f"House year {i} - month {j} - savings: {house_savings}")
+            print(f"Rent year {i} - month {j} - savings: {rent_savings}")
+            house_stock_portfolio += house_savings
+            rent_stock_portfolio += rent_savings
+            house_stock_portfolio *= 1 + params.stock_market_return / 12
+            rent_stock_portfolio *= 1 + params.stock_market_return / 12
+            rent_stock_portfolio_initial *= 1 + params.stock_market_return / 12
+        monthly_income *= 1 + params.annual_income_increase_percentage
+        monthly_expenses *= 1 + params.annual_expenses_increase_percentage
+        monthly_ownership_costs *= 1 + params.annual_expenses_increase_percentage
+        house_value *= 1 + analysis.config.annual_house_appreciation
+        rent_price *= 1 + analysis.config.annual_rent_increase
+        house_values.append(house_value)
+        house_stock_values.append(house_stock_portfolio)
+        rent_stock_values.append(rent_stock_portfolio)
+        combined_values = [h + s for h, s in zip(house_values, house_stock_values)]
+    print(f"Rent stock portfolio initial investment final value: {rent_stock_portfolio_initial}")
+    return {"house_scenario_net_worth": combined_values[-1], "rent_scenario_net_worth": rent_stock_values[-1]}
+
+
+def _best_of(func, repeat: int = 5) -> float:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main():
+    print(f"{'years':>6} {'legacy (ms)':>12} {'monthly (ms)':>13} {'closed form (ms)':>17} {'speed-up':>9}")
+    for years in HORIZONS:
+        params = replace(BASE_PARAMS, years_of_study=years)
+        analysis = HouseInvestment(params)
+        # Legacy output goes to /dev/null, which is the cheapest it can ever be; a terminal is far slower
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            legacy = _best_of(lambda: legacy_calculate_value_evolution(analysis, params))
+        monthly = _best_of(lambda: analysis.calculate_value_evolution(closed_form=False))
+        closed_form = _best_of(lambda: analysis.calculate_value_evolution())
+        print(
+            f"{years:>6} {legacy * 1e3:>12.3f} {monthly * 1e3:>13.3f} {closed_form * 1e3:>17.3f} "
+            f"{legacy / closed_form:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
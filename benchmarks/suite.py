@@ -0,0 +1,228 @@
+"""Benchmark suite for the model, its batch engine, sweeps and Monte Carlo, with stored baselines.
+
+After `pip install -e .`, run:
+    python benchmarks/suite.py run                # print the current numbers
+    python benchmarks/suite.py save --label ...   # append them to baselines.json
+    python benchmarks/suite.py check              # exit 1 if anything regressed past the threshold
+
+Every benchmark reports one number where lower is better: seconds per call for timings, bytes for
+memory. Baselines are only comparable on the machine that recorded them, so `check` compares
+against the latest run saved on a machine with the same description and otherwise the latest run.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import timeit
+import tracemalloc
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from batch import calculate_value_evolution_batch, params_to_arrays
+from house_investment import HouseInvestment
+from monte_carlo import ParametricMarket, simulate
+from scenarios import BASE_PARAMS as BASE
+from sweep import Axis, sweep
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+DEFAULT_THRESHOLD = 0.25
+
+
+@dataclass
+class Benchmark:
+    name: str
+    unit: str  # "s" or "B"
+    measure: Callable[[], float]
+    description: str = ""
+
+
+def _best_of(func, repeat: int = 5) -> float:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def _once(func, repeat: int = 3) -> float:
+    # For calls that take seconds, where autorange would run them many times over
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def _scenarios(n: int, seed: int = 0) -> np.ndarray:
+    # n distinct scenarios around BASE, as the structured array the batch engine takes directly
+    rng = np.random.default_rng(seed)
+    columns = params_to_arrays([BASE])
+    table = np.empty(n, dtype=[(name, np.float64) for name in columns])
+    for name, value in columns.items():
+        table[name] = value[0]
+    table["house_price"] = rng.uniform(150_000, 600_000, n)
+    table["initial_rent_price"] = rng.uniform(600, 2000, n)
+    table["mortgage_interest"] = rng.uniform(0.01, 0.05, n)
+    table["stock_market_return"] = rng.uniform(0.02, 0.09, n)
+    return table
+
+
+def _scenario_latency(years: int) -> Callable[[], float]:
+    def measure():
+        analysis = HouseInvestment(replace(BASE, years_of_study=years))
+        return _best_of(analysis.calculate_value_evolution)
+
+    return measure
+
+
+def _batch_throughput(n: int, chunk_size: int = 10_000) -> Callable[[], float]:
+    # Large runs go through the engine in chunks, as sweeps and the streaming CLI do; one 1M batch
+    # would hold every per-year series at once (gigabytes) and mostly measure paging
+    def measure():
+        table = _scenarios(n)
+        if n <= chunk_size:
+            return _best_of(lambda: calculate_value_evolution_batch(table))
+
+        def evaluate():
+            for start in range(0, n, chunk_size):
+                calculate_value_evolution_batch(table[start : start + chunk_size])
+
+        return _once(evaluate)
+
+    return measure
+
+
+def _sweep_grid(years: int) -> Callable[[], float]:
+    axes = [
+        Axis("house_price", np.linspace(150_000, 600_000, 25)),
+        Axis("initial_rent_price", np.linspace(600, 2000, 20)),
+        Axis("mortgage_interest", np.linspace(0.01, 0.05, 10)),
+        Axis("stock_market_return", np.linspace(0.02, 0.09, 10)),
+    ]
+    params = replace(BASE, years_of_study=years)
+    return lambda: _once(lambda: sweep(params, axes))
+
+
+def _monte_carlo() -> float:
+    market = ParametricMarket.from_params(BASE)
+    return _once(lambda: simulate(BASE, market, n_paths=20_000, seed=0))
+
+
+def _peak_bytes_per_scenario(n: int = 10_000) -> float:
+    # Peak traced allocation (numpy reports its buffers to tracemalloc) of one batch, per scenario
+    table = _scenarios(n)
+    tracemalloc.start()
+    try:
+        calculate_value_evolution_batch(table)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / n
+
+
+BENCHMARKS: List[Benchmark] = [
+    Benchmark("scenario_40y", "s", _scenario_latency(40), "one calculate_value_evolution, 40 years"),
+    Benchmark("scenario_100y", "s", _scenario_latency(100), "one calculate_value_evolution, 100 years"),
+    Benchmark("batch_10k", "s", _batch_throughput(10_000), "10k distinct scenarios in one batch"),
+    Benchmark("batch_1m", "s", _batch_throughput(1_000_000), "1M distinct scenarios in 10k batches"),
+    Benchmark("sweep_grid_50k_40y", "s", _sweep_grid(40), "25x20x10x10 grid, 40 years"),
+    Benchmark("sweep_grid_50k_100y", "s", _sweep_grid(100), "25x20x10x10 grid, 100 years"),
+    Benchmark("monte_carlo_20k", "s", _monte_carlo, "20k parametric market paths, 40 years"),
+    Benchmark("batch_peak_bytes_per_scenario", "B", _peak_bytes_per_scenario, "traced peak of a 10k batch"),
+]
+
+
+def run(names: Optional[List[str]] = None) -> Dict[str, float]:
+    results = {}
+    for benchmark in BENCHMARKS:
+        if names and benchmark.name not in names:
+            continue
+        results[benchmark.name] = benchmark.measure()
+        print(f"{benchmark.name:<32} {_format(results[benchmark.name], benchmark.unit):>12}", flush=True)
+    return results
+
+
+def _format(value: float, unit: str) -> str:
+    if unit == "B":
+        return f"{value / 1024:.1f} KiB"
+    if value < 1e-3:
+        return f"{value * 1e6:.1f} us"
+    if value < 1:
+        return f"{value * 1e3:.2f} ms"
+    return f"{value:.3f} s"
+
+
+def machine() -> str:
+    return f"{platform.machine()} {platform.processor() or platform.system()}, {os.cpu_count()} CPUs, " + (
+        f"Python {platform.python_version()}, numpy {np.__version__}"
+    )
+
+
+def _commit() -> Optional[str]:
+    try:
+        output = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip()
+
+
+def load_baselines(path: str = BASELINES) -> dict:
+    if not os.path.exists(path):
+        return {"threshold": DEFAULT_THRESHOLD, "runs": []}
+    with open(path) as file:
+        return json.load(file)
+
+
+def latest_baseline(baselines: dict, machine_description: str) -> Optional[dict]:
+    runs = baselines["runs"]
+    same_machine = [entry for entry in runs if entry.get("machine") == machine_description]
+    return (same_machine or runs or [None])[-1]
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    """Regressions of `results` over `baseline`: entries more than `threshold` (0.25 = 25%) worse."""
+    regressions = []
+    for name, value in results.items():
+        reference = baseline.get(name)
+        if reference and value > reference * (1 + threshold):
+            regressions.append(f"{name}: {value / reference - 1:+.0%} ({value:.4g} vs baseline {reference:.4g})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Model benchmarks with regression tracking")
+    parser.add_argument("command", choices=["run", "save", "check"])
+    parser.add_argument("--only", action="append", choices=[b.name for b in BENCHMARKS], help="Benchmark to run")
+    parser.add_argument("--label", default="", help="Note stored with a saved run")
+    parser.add_argument("--threshold", type=float, help="Allowed slowdown for check, e.g. 0.25 (default: stored)")
+    parser.add_argument("--baselines", default=BASELINES)
+    args = parser.parse_args(argv)
+
+    baselines = load_baselines(args.baselines)
+    results = run(args.only)
+    if args.command == "save":
+        baselines["runs"].append(
+            {
+                "date": datetime.date.today().isoformat(),
+                "commit": _commit(),
+                "label": args.label,
+                "machine": machine(),
+                "results": results,
+            }
+        )
+        with open(args.baselines, "w") as file:
+            json.dump(baselines, file, indent=2)
+            file.write("\n")
+    elif args.command == "check":
+        baseline = latest_baseline(baselines, machine())
+        if baseline is None:
+            raise SystemExit(f"No baseline in {args.baselines}, record one with 'save' first")
+        threshold = args.threshold if args.threshold is not None else baselines.get("threshold", DEFAULT_THRESHOLD)
+        regressions = compare(results, baseline["results"], threshold)
+        if regressions:
+            print(f"Regressions over the {baseline['date']} baseline ({baseline['commit']}):", *regressions, sep="\n  ")
+            raise SystemExit(1)
+        print(f"No regressions over the {baseline['date']} baseline ({baseline['commit']}) at {threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from batch import CONFIG_FIELDS, PARAM_FIELDS, broadcast_columns, evolve
+from house_investment import AnalysisParams, InvestmentConfig
+from sweep import Axis, SweepResult, axis_columns, grid_size
+
+
+@dataclass
+class BreakEven:
+    field: str
+    value: float
+    # Buy minus rent net worth at the solution, in euros
+    gap: float
+    iterations: int
+
+
+def _net_worth_gap(
+    base_params: dict, base_config: dict, columns: Dict[str, np.ndarray], year: Optional[int]
+) -> np.ndarray:
+    n_points = len(next(iter(columns.values())))
+    results = evolve(*broadcast_columns(base_params, base_config, columns, n_points))
+    if year is None:
+        details = results.financial_details
+        return details["house_scenario_net_worth"] - details["rent_scenario_net_worth"]
+    return results.combined_values[:, year - 1] - results.rent_stock_values[:, year - 1]
+
+
+def _solve(
+    base_params: dict,
+    base_config: dict,
+    field: str,
+    bracket: Tuple[float, float],
+    fixed: Dict[str, np.ndarray],
+    n_points: int,
+    year: Optional[int],
+    xtol: Optional[float],
+    ftol: float,
+    max_iterations: int,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    # Vectorized Illinois (modified regula falsi): every point keeps its own bracket, and each
+    # iteration evaluates the still-active points in a single batch call
+    if field not in PARAM_FIELDS and field not in CONFIG_FIELDS:
+        raise ValueError(f"Unknown field '{field}'")
+    if field == "years_of_study":
+        raise ValueError("years_of_study sets the result length and cannot be solved for")
+    lo, hi = float(bracket[0]), float(bracket[1])
+    if not lo < hi:
+        raise ValueError(f"Invalid bracket {bracket}, expected (low, high) with low < high")
+    if year is not None and not 1 <= year <= base_params["years_of_study"]:
+        raise ValueError(f"year must be between 1 and years_of_study ({base_params['years_of_study']})")
+    if xtol is None:
+        xtol = 1e-9 * max(abs(lo), abs(hi), 1.0)
+
+    def gap(x: np.ndarray, index: np.ndarray) -> np.ndarray:
+        columns = {name: values[index] for name, values in fixed.items()}
+        columns[field] = x
+        return _net_worth_gap(base_params, base_config, columns, year)
+
+    everything = np.arange(n_points)
+    a, b = np.full(n_points, lo), np.full(n_points, hi)
+    fa, fb = gap(a, everything), gap(b, everything)
+    root = np.where(fa == 0, a, np.where(fb == 0, b, np.nan))
+    residual = np.where(fa == 0, fa, np.where(fb == 0, fb, np.nan))
+    active = np.isnan(root) & (np.sign(fa) != np.sign(fb))
+    side = np.zeros(n_points, dtype=np.int8)
+
+    iterations = 0
+    while active.any() and iterations < max_iterations:
+        iterations += 1
+        index = np.flatnonzero(active)
+        ai, bi, fai, fbi = a[index], b[index], fa[index], fb[index]
+        c = bi - fbi * (bi - ai) / (fbi - fai)
+        # Fall back to bisection whenever the secant step leaves the bracket
+        outside = ~((c > ai) & (c < bi))
+        c[outside] = (ai[outside] + bi[outside]) / 2
+        fc = gap(c, index)
+
+        keep_a = np.sign(fc) == np.sign(fbi)
+        keep_b = ~keep_a & (fc != 0)
+        side_i = side[index]
+        # Illinois step: halve the value at the endpoint that was retained twice in a row
+        fa[index] = np.where(keep_a & (side_i == -1), fai / 2, fai)
+        fb[index] = np.where(keep_b & (side_i == 1), fbi / 2, fbi)
+        b[index] = np.where(keep_a, c, bi)
+        fb[index] = np.where(keep_a, fc, fb[index])
+        a[index] = np.where(keep_b, c, ai)
+        fa[index] = np.where(keep_b, fc, fa[index])
+        side[index] = np.where(keep_a, -1, np.where(keep_b, 1, 0))
+
+        done = (fc == 0) | (np.abs(fc) <= ftol) | (b[index] - a[index] <= xtol)
+        root[index[done]] = c[done]
+        residual[index[done]] = fc[done]
+        active[index[done]] = False
+
+    converged = ~np.isnan(root)
+    return root, residual, converged, iterations
+
+
+def break_even(
+    params: AnalysisParams,
+    field: str,
+    bracket: Tuple[float, float],
+    config: InvestmentConfig = InvestmentConfig(),
+    year: Optional[int] = None,
+    xtol: Optional[float] = None,
+    ftol: float = 1e-6,
+    max_iterations: int = 100,
+) -> BreakEven:
+    """Value of `field` within `bracket` at which buying and renting end with the same net worth.
+
+    `field` is any numeric AnalysisParams or InvestmentConfig field except years_of_study. The gap is
+    taken at the end of the horizon, or at the end of `year` (1-based) when given.
+    """
+    root, residual, converged, iterations = _solve(
+        asdict(params), asdict(config), field, bracket, {}, 1, year, xtol, ftol, max_iterations
+    )
+    if not converged[0]:
+        raise ValueError(
+            f"No break-even for '{field}' in {bracket}: buying wins or loses across the whole bracket"
+            if iterations == 0
+            else f"Break-even search for '{field}' did not converge in {max_iterations} iterations"
+        )
+    return BreakEven(field, float(root[0]), float(residual[0]), iterations)
+
+
+def break_even_frontier(
+    params: AnalysisParams,
+    field: str,
+    bracket: Tuple[float, float],
+    axes: Sequence[Axis],
+    config: InvestmentConfig = InvestmentConfig(),
+    mode: str = "grid",
+    year: Optional[int] = None,
+    xtol: Optional[float] = None,
+    ftol: float = 1e-6,
+    max_iterations: int = 100,
+) -> SweepResult:
+    """Break-even value of `field` at every point of a grid over other fields.
+
+    Returns a SweepResult with the axis values, the break-even `field` (NaN where the bracket holds
+    no sign change) and a `converged` column of 0/1.
+    """
+    if any(axis.name == field for axis in axes):
+        raise ValueError(f"'{field}' cannot be both the solved field and a frontier axis")
+    n_points = grid_size(axes, mode)
+    fixed = axis_columns(axes, mode, 0, n_points)
+    root, _, converged, _ = _solve(
+        asdict(params), asdict(config), field, bracket, fixed, n_points, year, xtol, ftol, max_iterations
+    )
+    return SweepResult({**fixed, field: root, "converged": converged.astype(np.float64)})
@@ -0,0 +1,182 @@
+import copy
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, List, Optional, Tuple
+
+from instrumentation import count
+from house_investment import MODEL_VERSION, AnalysisParams, HouseInvestment, InvestmentConfig
+
+
+def canonical_key(params: AnalysisParams, config: InvestmentConfig = InvestmentConfig(), **options) -> str:
+    # Stable across processes and restarts: every number is normalized to a float (so 30 and 30.0
+    # hit the same entry) and the model version is part of the key
+    payload = {
+        "model_version": MODEL_VERSION,
+        "params": {name: float(value) for name, value in asdict(params).items()},
+        "config": {name: float(value) for name, value in asdict(config).items()},
+        "options": options,
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    disk_evictions: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ResultCache:
+    """LRU cache of calculate_value_evolution results.
+
+    The in-memory tier is bounded by both `max_entries` and `max_bytes` (pickled size). When
+    `directory` is given, results are also written there and survive restarts. That tier is bounded
+    by `max_disk_bytes`, evicting the least recently used files, and opening it deletes the entries
+    of other model versions, which could never match again.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 64 * 2**20,
+        directory: Optional[str] = None,
+        max_disk_bytes: int = 2**30,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._entries: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = CacheStats()
+        self._disk_bytes = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            for path, size, _ in self._disk_entries(current=False):
+                os.remove(path)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"v{MODEL_VERSION}-{key}.pkl")
+
+    def _disk_entries(self, current: bool = True) -> List[Tuple[str, int, float]]:
+        # (path, size, last use) of the current model version's files, or of every other .pkl file
+        prefix, entries = f"v{MODEL_VERSION}-", []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith(".pkl") and entry.name.startswith(prefix) == current:
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue  # Evicted by another process sharing the directory
+                    entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _prune_disk(self):
+        # Rescanned rather than tracked per file, since other processes may share the directory;
+        # evicts down to three quarters of the cap so that the scan runs once per many writes
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[2])
+        self._disk_bytes = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self._disk_bytes <= 0.75 * self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._disk_bytes -= size
+            self.stats.disk_evictions += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                count("cache_hits")
+                return copy.deepcopy(self._entries[key][0])
+        if self.directory is not None:
+            try:
+                with open(self._path(key), "rb") as file:
+                    blob = file.read()
+                # The modification time doubles as the last use for disk evictions
+                os.utime(self._path(key))
+            except FileNotFoundError:
+                pass
+            else:
+                value = pickle.loads(blob)
+                count("cache_hits")
+                count("cache_disk_hits")
+                with self._lock:
+                    self.stats.hits += 1
+                    self.stats.disk_hits += 1
+                    self._remember(key, value, len(blob))
+                return copy.deepcopy(value)
+        count("cache_misses")
+        with self._lock:
+            self.stats.misses += 1
+        return None
+
+    def put(self, key: str, value: Any):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._remember(key, copy.deepcopy(value), len(blob))
+        if self.directory is not None:
+            # Write to a temporary file first so a crash never leaves a truncated entry behind
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as file:
+                file.write(blob)
+            os.replace(tmp_path, self._path(key))
+            with self._lock:
+                self._disk_bytes += len(blob)
+                if self._disk_bytes > self.max_disk_bytes:
+                    self._prune_disk()
+
+    def _remember(self, key: str, value: Any, size: int):
+        if key in self._entries:
+            self.stats.bytes -= self._entries.pop(key)[1]
+        if size > self.max_bytes:
+            self.stats.entries = len(self._entries)
+            return
+        self._entries[key] = (value, size)
+        self.stats.bytes += size
+        while len(self._entries) > self.max_entries or self.stats.bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.stats.bytes -= evicted_size
+            self.stats.evictions += 1
+        self.stats.entries = len(self._entries)
+
+    def clear(self, disk: bool = False):
+        with self._lock:
+            self._entries.clear()
+            self.stats = CacheStats()
+        if disk and self.directory is not None:
+            for name in os.listdir(self.directory):
+                if name.endswith(".pkl"):
+                    os.remove(os.path.join(self.directory, name))
+            self._disk_bytes = 0
+
+    def calculate_value_evolution(
+        self, params: AnalysisParams, config: InvestmentConfig = InvestmentConfig(), closed_form: bool = True
+    ):
+        key = canonical_key(params, config, closed_form=closed_form)
+        result = self.get(key)
+        if result is None:
+            result = HouseInvestment(params, config).calculate_value_evolution(closed_form=closed_form)
+            self.put(key, result)
+        return result
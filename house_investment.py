@@ -1,9 +1,20 @@
 from dataclasses import dataclass
-import numpy_financial as npf
+import logging
+import numpy as np
 from typing import Tuple, List
 
+from amortization import AmortizationSchedule, pmt, prepayment_schedule, year_end_balances
+from instrumentation import count, phase, timed
 
-@dataclass
+# Per-year diagnostics are emitted at DEBUG level and skipped entirely unless this logger is enabled
+logger = logging.getLogger(__name__)
+
+# Bump whenever a change alters the numbers calculate_value_evolution produces, so that cached
+# results computed by an older model are never served
+MODEL_VERSION = 2
+
+
+@dataclass(frozen=True)
 class AnalysisParams:
     house_price: float
     mortgage_interest: float
@@ -15,9 +26,13 @@ class AnalysisParams:
     annual_income_increase_percentage: float = 0.03
     initial_monthly_expenses: float = 1200
     annual_expenses_increase_percentage: float = 0.025
+    # Extra principal repaid at the end of every year while the loan lasts, out of the house scenario's
+    # portfolio; the payment then stays and the loan finishes early, or is lowered over the remaining term
+    annual_prepayment: float = 0
+    prepayment_reduces_payment: bool = False
 
 
-@dataclass
+@dataclass(frozen=True)
 class InvestmentConfig:
     # Spanish property-specific parameters
     catastral_value_percentage: float = 0.5  # % of house price that represents the official tax value
@@ -33,6 +48,135 @@ class InvestmentConfig:
     annual_rent_increase: float = 0.02
 
 
+def annual_compounding_factors(monthly_rate):
+    # Growth of a balance over 12 months and the annuity-due factor sum(g**k for k in 1..12), so that
+    # one year of "add contribution, then apply the monthly return" collapses to
+    #   portfolio * year_growth + contribution * annuity
+    # expm1/log1p keep the factors accurate for rates close to zero. Works on floats and arrays.
+    monthly_rate = np.asarray(monthly_rate, dtype=np.float64)
+    year_growth_m1 = np.expm1(12 * np.log1p(monthly_rate))
+    zero_rate = monthly_rate == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annuity = np.where(
+            zero_rate, 12.0, (1 + monthly_rate) * year_growth_m1 / np.where(zero_rate, 1.0, monthly_rate)
+        )
+    year_growth = 1 + year_growth_m1
+    if year_growth.ndim == 0:
+        return float(year_growth), float(annuity)
+    return year_growth, annuity
+
+
+def compound_year(portfolio, monthly_contribution, monthly_rate, factors=None, closed_form: bool = True):
+    # Twelve months of contributing monthly_contribution and then growing by monthly_rate.
+    # closed_form=False keeps the original month-by-month recurrence for cross-checking.
+    if not closed_form:
+        growth = 1 + monthly_rate
+        for _ in range(12):
+            portfolio = portfolio + monthly_contribution
+            portfolio = portfolio * growth
+        return portfolio
+    year_growth, annuity = factors if factors is not None else annual_compounding_factors(monthly_rate)
+    return portfolio * year_growth + monthly_contribution * annuity
+
+
+SERIES_NAMES = (
+    "house_values",
+    "house_stock_values",
+    "combined_values",
+    "rent_stock_values",
+    "house_savings",
+    "rent_savings",
+    "house_expenses",
+    "rent_expenses",
+    "mortgage_balances",
+)
+# The first eight series are the ones the legacy 9-tuple return value carried
+LEGACY_SERIES = 8
+
+
+def _series_view(index: int) -> property:
+    return property(lambda self: self.data[index], doc=f"View of the {SERIES_NAMES[index]} row")
+
+
+class ValueEvolution:
+    """Yearly series of one scenario, stored as one contiguous (series, years) float64 block.
+
+    Each series attribute is a zero-copy view of a row of `data`. For older callers the object also
+    behaves like the 9-tuple calculate_value_evolution used to return: it unpacks into the eight
+    series plus financial_details, and `results[2][-1]` still works.
+    """
+
+    __slots__ = ("data", "financial_details")
+
+    house_values = _series_view(0)
+    house_stock_values = _series_view(1)
+    combined_values = _series_view(2)
+    rent_stock_values = _series_view(3)
+    house_savings = _series_view(4)
+    rent_savings = _series_view(5)
+    house_expenses = _series_view(6)
+    rent_expenses = _series_view(7)
+    mortgage_balances = _series_view(8)
+
+    def __init__(self, data: np.ndarray, financial_details: dict = None):
+        self.data = data
+        self.financial_details = financial_details if financial_details is not None else {}
+
+    @classmethod
+    def empty(cls, years: int) -> "ValueEvolution":
+        return cls(np.empty((len(SERIES_NAMES), years)))
+
+    @property
+    def years(self) -> int:
+        return self.data.shape[1]
+
+    # Tuple compatibility
+    def __len__(self) -> int:
+        return LEGACY_SERIES + 1
+
+    def __iter__(self):
+        yield from self.data[:LEGACY_SERIES]
+        yield self.financial_details
+
+    def __getitem__(self, index):
+        return self.as_tuple(copy=False)[index]
+
+    def as_tuple(
+        self, copy: bool = True
+    ) -> Tuple[
+        List[float], List[float], List[float], List[float], List[float], List[float], List[float], List[float], dict
+    ]:
+        # With copy=True this is exactly the legacy return value: Python lists and a dict
+        if copy:
+            return tuple(row.tolist() for row in self.data[:LEGACY_SERIES]) + (dict(self.financial_details),)
+        return tuple(self.data[:LEGACY_SERIES]) + (self.financial_details,)
+
+    # Export
+    def to_records(self) -> np.ndarray:
+        records = np.empty(self.years, dtype=[("year", np.int64)] + [(name, np.float64) for name in SERIES_NAMES])
+        records["year"] = np.arange(1, self.years + 1)
+        for name, row in zip(SERIES_NAMES, self.data):
+            records[name] = row
+        return records
+
+    def to_csv(self, path):
+        header = ",".join(("year",) + SERIES_NAMES)
+        table = np.column_stack((np.arange(1, self.years + 1), self.data.T))
+        np.savetxt(path, table, delimiter=",", header=header, comments="", fmt=["%d"] + ["%.17g"] * len(SERIES_NAMES))
+
+    def to_arrow(self):
+        import pyarrow as pa
+
+        columns = {"year": pa.array(np.arange(1, self.years + 1))}
+        columns.update({name: pa.array(row) for name, row in zip(SERIES_NAMES, self.data)})
+        return pa.table(columns)
+
+    def to_parquet(self, path):
+        import pyarrow.parquet as pq
+
+        pq.write_table(self.to_arrow(), path)
+
+
 class HouseInvestment:
     def __init__(
         self,
@@ -42,11 +186,13 @@ class HouseInvestment:
         self.params = params
         self.config = config
 
+    @timed("initial_payments")
     def _calculate_initial_payments(self, house_price: float) -> tuple[float, float]:
         down_payment = house_price * self.config.down_payment_percentage
         appraisal_notary = house_price * self.config.appraisal_notary_percentage
         return down_payment, appraisal_notary
 
+    @timed("monthly_costs")
     def _calculate_monthly_costs(self, house_price: float) -> float:
         catastral_value = house_price * self.config.catastral_value_percentage
 
@@ -64,82 +210,146 @@ class HouseInvestment:
         )
         return monthly_ownership_costs
 
-    def _calculate_monthly_payment(self, house_price: float, down_payment: float, mortgage_term: int) -> float:
+    def _calculate_monthly_payment(
+        self, house_price: float, down_payment: float, mortgage_term: int, mortgage_interest: float
+    ) -> float:
         loan_amount = house_price - down_payment
         n_months = mortgage_term * 12
-        # print(f"Monthly payment: {npf.pmt(self.params.mortgage_interest / 12, n_months, -loan_amount)}")
-        return npf.pmt(self.params.mortgage_interest / 12, n_months, -loan_amount)
+        return pmt(mortgage_interest / 12, n_months, -loan_amount)
 
-    def calculate_value_evolution(
-        self, params: AnalysisParams = None
-    ) -> Tuple[
-        List[float], List[float], List[float], List[float], List[float], List[float], List[float], List[float], dict
-    ]:
+    def mortgage_schedule(self, params: AnalysisParams = None) -> AmortizationSchedule:
+        # Monthly loan schedule over the whole horizon, year-end prepayments included
         if params is None:
             params = self.params
+        down_payment, _ = self._calculate_initial_payments(params.house_price)
+        return prepayment_schedule(
+            params.house_price - down_payment,
+            params.mortgage_interest,
+            params.mortgage_term,
+            params.annual_prepayment,
+            params.prepayment_reduces_payment,
+            params.years_of_study,
+        )
 
+    def initial_state(self, params: AnalysisParams = None) -> "SimulationState":
+        # Everything the purchase fixes at year 0: costs, loan payment, opening portfolios
+        if params is None:
+            params = self.params
         down_payment, appraisal_notary = self._calculate_initial_payments(params.house_price)
         initial_payment_total = down_payment + appraisal_notary
-        monthly_ownership_costs = self._calculate_monthly_costs(params.house_price)
-        monthly_morgage_payment = self._calculate_monthly_payment(
-            params.house_price, down_payment, params.mortgage_term
+        return SimulationState(
+            year=0,
+            monthly_income=params.monthly_net_income,
+            monthly_expenses=params.initial_monthly_expenses,
+            monthly_ownership_costs=self._calculate_monthly_costs(params.house_price),
+            monthly_morgage_payment=self._calculate_monthly_payment(
+                params.house_price, down_payment, params.mortgage_term, params.mortgage_interest
+            ),
+            house_value=params.house_price,
+            rent_price=params.initial_rent_price,
+            # Scenario 1: House purchase
+            house_stock_portfolio=0,
+            # Scenario 2: Rent only
+            rent_stock_portfolio=initial_payment_total,
+            rent_stock_portfolio_initial=initial_payment_total,
         )
 
-        # Initialize tracking variables
-        monthly_income = params.monthly_net_income
-        monthly_expenses = params.initial_monthly_expenses
-        house_value = params.house_price
-        rent_price = params.initial_rent_price
-
-        # Scenario 1: House purchase
-        house_stock_portfolio = 0
-        # Scenario 2: Rent only
-        rent_stock_portfolio = initial_payment_total
-
-        rent_stock_portfolio_initial = initial_payment_total
+    def _simulate(
+        self,
+        params: AnalysisParams,
+        state: "SimulationState",
+        evolution: ValueEvolution,
+        closed_form: bool = True,
+        states: List["SimulationState"] = None,
+    ) -> "SimulationState":
+        # Runs years state.year .. years_of_study - 1, writing each year into the preallocated series.
+        # When `states` is given, the state at the end of every year is appended to it.
+        (
+            house_values,
+            house_stock_values,
+            _,
+            rent_stock_values,
+            year_month_house_savings,
+            year_month_rent_savings,
+            year_month_house_expenses,
+            year_month_rent_expenses,
+        ) = evolution.data[:LEGACY_SERIES]
 
-        house_values = []
-        house_stock_values = []
-        rent_stock_values = []
+        # Initialize tracking variables
+        monthly_income = state.monthly_income
+        monthly_expenses = state.monthly_expenses
+        monthly_ownership_costs = state.monthly_ownership_costs
+        monthly_morgage_payment = state.monthly_morgage_payment
+        house_value = state.house_value
+        rent_price = state.rent_price
+        house_stock_portfolio = state.house_stock_portfolio
+        rent_stock_portfolio = state.rent_stock_portfolio
+        rent_stock_portfolio_initial = state.rent_stock_portfolio_initial
 
-        # Lists to track yearly values
-        year_month_house_savings = []
-        year_month_rent_savings = []
-        year_month_house_expenses = []
-        year_month_rent_expenses = []
+        monthly_return = params.stock_market_return / 12
+        compounding_factors = annual_compounding_factors(monthly_return)
+        trace = logger.isEnabledFor(logging.DEBUG)
+        # With prepayments the payment can change within a year, so the year is simulated month by
+        # month, the same way the batch engine does it
+        loan = self.mortgage_schedule(params) if params.annual_prepayment > 0 else None
 
-        for i in range(params.years_of_study):
+        for i in range(state.year, params.years_of_study):
             # Calculate monthly values once per year since they stay constant
             disposable_income = monthly_income - monthly_expenses
 
             # Calculate yearly savings for house scenario
-            if i < params.mortgage_term:
+            if loan is not None:
+                monthly_payments = loan.payment[0, 12 * i : 12 * (i + 1)]
+                house_monthly_costs = monthly_payments.mean() + monthly_ownership_costs
+            elif i < params.mortgage_term:
                 house_monthly_costs = monthly_morgage_payment + monthly_ownership_costs
             else:
                 house_monthly_costs = monthly_ownership_costs
             house_savings = disposable_income - house_monthly_costs
-            year_month_house_savings.append(house_savings)
+            year_month_house_savings[i] = house_savings
 
             # Calculate yearly savings for rent scenario
             rent_savings = disposable_income - rent_price
-            year_month_rent_savings.append(rent_savings)
+            year_month_rent_savings[i] = rent_savings
 
-            year_month_house_expenses.append(house_monthly_costs + monthly_expenses)
-            year_month_rent_expenses.append(rent_price + monthly_expenses)
+            year_month_house_expenses[i] = house_monthly_costs + monthly_expenses
+            year_month_rent_expenses[i] = rent_price + monthly_expenses
 
-            for j in range(12):
-                print(f"House year {i} - month {j} - savings: {house_savings}")
-                print(f"Rent year {i} - month {j} - savings: {rent_savings}")
+            if trace:
+                logger.debug("House year %d - monthly savings: %s", i, house_savings)
+                logger.debug("Rent year %d - monthly savings: %s", i, rent_savings)
 
-                # Update stock portfolios using pre-calculated values
-                house_stock_portfolio += house_savings
-                rent_stock_portfolio += rent_savings
+            if loan is not None:
+                for payment in monthly_payments:
+                    house_stock_portfolio = (
+                        house_stock_portfolio + ((disposable_income - monthly_ownership_costs) - payment)
+                    ) * (1 + monthly_return)
+                    rent_stock_portfolio = (rent_stock_portfolio + rent_savings) * (1 + monthly_return)
+                    rent_stock_portfolio_initial *= 1 + monthly_return
+                house_stock_portfolio -= loan.prepayment[0, 12 * i + 11]
+                evolution.mortgage_balances[i] = loan.balance[0, 12 * i + 11]
+            elif closed_form:
+                # Invest the monthly savings and apply twelve monthly returns in one step
+                house_stock_portfolio = compound_year(
+                    house_stock_portfolio, house_savings, monthly_return, compounding_factors
+                )
+                rent_stock_portfolio = compound_year(
+                    rent_stock_portfolio, rent_savings, monthly_return, compounding_factors
+                )
+                rent_stock_portfolio_initial = compound_year(
+                    rent_stock_portfolio_initial, 0, monthly_return, compounding_factors
+                )
+            else:
+                for _ in range(12):
+                    # Update stock portfolios using pre-calculated values
+                    house_stock_portfolio += house_savings
+                    rent_stock_portfolio += rent_savings
 
-                # Apply monthly stock market returns
-                house_stock_portfolio *= 1 + params.stock_market_return / 12
-                rent_stock_portfolio *= 1 + params.stock_market_return / 12
+                    # Apply monthly stock market returns
+                    house_stock_portfolio *= 1 + params.stock_market_return / 12
+                    rent_stock_portfolio *= 1 + params.stock_market_return / 12
 
-                rent_stock_portfolio_initial *= 1 + params.stock_market_return / 12
+                    rent_stock_portfolio_initial *= 1 + params.stock_market_return / 12
             # Yearly updates
             monthly_income *= 1 + params.annual_income_increase_percentage
             monthly_expenses *= 1 + params.annual_expenses_increase_percentage
@@ -147,38 +357,185 @@ class HouseInvestment:
             house_value *= 1 + self.config.annual_house_appreciation
             rent_price *= 1 + self.config.annual_rent_increase
 
-            house_values.append(house_value)
-            house_stock_values.append(house_stock_portfolio)
-            rent_stock_values.append(rent_stock_portfolio)
+            house_values[i] = house_value
+            house_stock_values[i] = house_stock_portfolio
+            rent_stock_values[i] = rent_stock_portfolio
 
-            # Calculate combined values (house + stock portfolio)
-            combined_values = [h + s for h, s in zip(house_values, house_stock_values)]
+            if states is not None:
+                states.append(
+                    SimulationState(
+                        i + 1,
+                        monthly_income,
+                        monthly_expenses,
+                        monthly_ownership_costs,
+                        monthly_morgage_payment,
+                        house_value,
+                        rent_price,
+                        house_stock_portfolio,
+                        rent_stock_portfolio,
+                        rent_stock_portfolio_initial,
+                    )
+                )
+
+        if trace:
+            logger.debug("Rent stock portfolio initial investment final value: %s", rent_stock_portfolio_initial)
+
+        return SimulationState(
+            params.years_of_study,
+            monthly_income,
+            monthly_expenses,
+            monthly_ownership_costs,
+            monthly_morgage_payment,
+            house_value,
+            rent_price,
+            house_stock_portfolio,
+            rent_stock_portfolio,
+            rent_stock_portfolio_initial,
+        )
+
+    def _finish(self, params: AnalysisParams, evolution: ValueEvolution) -> ValueEvolution:
+        # Outstanding principal at every year end; it only depends on the loan terms, so it is filled
+        # for the whole horizon at once from the memoized amortization schedule. With prepayments,
+        # _simulate has already filled it in from its own schedule.
+        if params.annual_prepayment <= 0:
+            down_payment, _ = self._calculate_initial_payments(params.house_price)
+            evolution.mortgage_balances[:] = year_end_balances(
+                params.house_price - down_payment, params.mortgage_interest, params.mortgage_term, params.years_of_study
+            )[0]
+
+        # Calculate combined values (home equity + stock portfolio)
+        np.subtract(evolution.house_values, evolution.mortgage_balances, out=evolution.combined_values)
+        np.add(evolution.combined_values, evolution.house_stock_values, out=evolution.combined_values)
 
         # Calculate final net worth for both scenarios
-        house_final_worth = house_values[-1] + house_stock_portfolio
-        rent_final_worth = rent_stock_values[-1]
-        print(f"Rent stock portfolio initial investment final value: {rent_stock_portfolio_initial}")
-
-        financial_details = {
-            "house_scenario_net_worth": house_final_worth,
-            "rent_scenario_net_worth": rent_final_worth,
-            "final_house_value": house_values[-1],
-            "house_stock_portfolio": house_stock_values[-1],
-            "rent_stock_portfolio": rent_stock_values[-1],
-            "initial_house_savings": year_month_house_savings[0],
-            "initial_rent_savings": year_month_rent_savings[0],
-            "final_house_savings": year_month_house_savings[-1],
-            "final_rent_savings": year_month_rent_savings[-1],
+        home_equity = evolution.house_values[-1] - evolution.mortgage_balances[-1]
+        evolution.financial_details = {
+            "house_scenario_net_worth": home_equity + evolution.house_stock_values[-1],
+            "rent_scenario_net_worth": evolution.rent_stock_values[-1],
+            "final_house_value": evolution.house_values[-1],
+            "remaining_mortgage_balance": evolution.mortgage_balances[-1],
+            "home_equity": home_equity,
+            "house_stock_portfolio": evolution.house_stock_values[-1],
+            "rent_stock_portfolio": evolution.rent_stock_values[-1],
+            "initial_house_savings": evolution.house_savings[0],
+            "initial_rent_savings": evolution.rent_savings[0],
+            "final_house_savings": evolution.house_savings[-1],
+            "final_rent_savings": evolution.rent_savings[-1],
         }
+        return evolution
 
-        return (
-            house_values,
-            house_stock_values,
-            combined_values,
-            rent_stock_values,
-            year_month_house_savings,
-            year_month_rent_savings,
-            year_month_house_expenses,
-            year_month_rent_expenses,
-            financial_details,
-        )
+    def calculate_value_evolution(self, params: AnalysisParams = None, closed_form: bool = True) -> ValueEvolution:
+        if params is None:
+            params = self.params
+
+        evolution = ValueEvolution.empty(params.years_of_study)
+        with phase("simulate"):
+            self._simulate(params, self.initial_state(params), evolution, closed_form)
+        count("scenarios_evaluated")
+        count("months_simulated", 12 * params.years_of_study)
+        with phase("finish"):
+            return self._finish(params, evolution)
+
+    def evaluate(self, params: AnalysisParams = None, closed_form: bool = True) -> "Evaluation":
+        # Same as calculate_value_evolution, but also keeps a resumable snapshot at every year boundary
+        if params is None:
+            params = self.params
+
+        evolution = ValueEvolution.empty(params.years_of_study)
+        states = [self.initial_state(params)]
+        with phase("simulate"):
+            self._simulate(params, states[0], evolution, closed_form, states)
+        count("scenarios_evaluated")
+        count("months_simulated", 12 * params.years_of_study)
+        return Evaluation(params, self.config, closed_form, self._finish(params, evolution), states)
+
+    def reevaluate(self, previous: "Evaluation", params: AnalysisParams = None, from_year: int = None) -> "Evaluation":
+        """Re-run `previous` with new `params` (and this instance's config), recomputing only the suffix.
+
+        Years before `from_year` are reused from `previous`. When `from_year` is omitted it is inferred:
+        a change of years_of_study alone resumes where the shorter horizon ends, anything else
+        restarts from year 0. Changing a field that only shapes the initial state (prices, income,
+        loan terms, purchase costs) always requires from_year=0.
+        """
+        if params is None:
+            params = self.params
+
+        changed = [name for name in PARAM_FIELDS if getattr(params, name) != getattr(previous.params, name)] + [
+            name for name in CONFIG_FIELDS if getattr(self.config, name) != getattr(previous.config, name)
+        ]
+        if from_year is None:
+            from_year = (
+                min(params.years_of_study, previous.params.years_of_study) if changed == ["years_of_study"] else 0
+            )
+        if from_year > 0:
+            initial_fields = [name for name in changed if name in INITIAL_STATE_FIELDS]
+            if initial_fields:
+                raise ValueError(f"{initial_fields} shape the initial state; re-evaluate from year 0")
+        from_year = min(from_year, params.years_of_study, previous.params.years_of_study)
+        if from_year == 0:
+            return self.evaluate(params, previous.closed_form)
+
+        evolution = ValueEvolution.empty(params.years_of_study)
+        evolution.data[:, :from_year] = previous.results.data[:, :from_year]
+        states = previous.states[: from_year + 1]
+        with phase("simulate"):
+            self._simulate(params, states[-1], evolution, previous.closed_form, states)
+        count("scenarios_evaluated")
+        count("months_simulated", 12 * (params.years_of_study - from_year))
+        return Evaluation(params, self.config, previous.closed_form, self._finish(params, evolution), states)
+
+
+@dataclass(frozen=True)
+class SimulationState:
+    # Everything the yearly loop carries from one year to the next, taken at a year boundary
+    year: int
+    monthly_income: float
+    monthly_expenses: float
+    monthly_ownership_costs: float
+    monthly_morgage_payment: float
+    house_value: float
+    rent_price: float
+    house_stock_portfolio: float
+    rent_stock_portfolio: float
+    rent_stock_portfolio_initial: float
+
+
+@dataclass
+class Evaluation:
+    params: AnalysisParams
+    config: InvestmentConfig
+    closed_form: bool
+    results: ValueEvolution
+    # states[i] is the state at the start of year i; the last one is the state after the final year
+    states: List[SimulationState]
+
+
+# Field names in declaration order; the batch engine's column dicts and matrices follow this order
+PARAM_FIELDS = tuple(AnalysisParams.__dataclass_fields__)
+CONFIG_FIELDS = tuple(InvestmentConfig.__dataclass_fields__)
+# Switches such as prepayment_reduces_payment, held as 0/1 in the batch engine's columns; every
+# other field is a number
+FLAG_FIELDS = tuple(
+    name
+    for name, field in {**AnalysisParams.__dataclass_fields__, **InvestmentConfig.__dataclass_fields__}.items()
+    if field.type in (bool, "bool")
+)
+# Fields that are only read when building the year-0 state; they cannot change part-way through
+INITIAL_STATE_FIELDS = (
+    "house_price",
+    "mortgage_interest",
+    "mortgage_term",
+    "annual_prepayment",
+    "prepayment_reduces_payment",
+    "initial_rent_price",
+    "monthly_net_income",
+    "initial_monthly_expenses",
+    "catastral_value_percentage",
+    "ibi_percentage",
+    "maintenance_cost_percentage",
+    "appraisal_notary_percentage",
+    "monthly_community_fees",
+    "annual_home_insurance_percentage",
+    "annual_garbage_tax",
+    "down_payment_percentage",
+)
@@ -0,0 +1,197 @@
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+# Counters, value summaries (e.g. batch sizes) and per-phase timers for the model. Collection is off
+# by default; while off every hook is a single attribute check, so the hooks stay in the hot paths.
+# Metrics are per process: worker pools start their processes with `enable` as initializer, run
+# tasks through `collect` and `merge` the returned snapshots into the submitting process.
+
+
+@dataclass
+class Summary:
+    count: int = 0
+    total: float = 0.0
+    min: float = math.inf
+    max: float = -math.inf
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: dict):
+        # `other` is an exported (asdict) summary
+        self.count += other["count"]
+        self.total += other["total"]
+        self.min = min(self.min, other["min"])
+        self.max = max(self.max, other["max"])
+
+
+class Registry:
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = {}
+        self.summaries: Dict[str, Summary] = {}
+        self.timers: Dict[str, Summary] = {}
+
+    def count(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            self.summaries.setdefault(name, Summary()).add(value)
+
+    def record_time(self, name: str, seconds: float):
+        with self._lock:
+            self.timers.setdefault(name, Summary()).add(seconds)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.summaries.clear()
+            self.timers.clear()
+
+    def _snapshot(self) -> dict:
+        return {
+            "counters": dict(self.counters),
+            "summaries": {name: asdict(summary) for name, summary in self.summaries.items()},
+            "timers": {name: asdict(summary) for name, summary in self.timers.items()},
+        }
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return self._snapshot()
+
+    def drain(self) -> dict:
+        # Snapshot and reset in one step, so no update is lost between the two
+        with self._lock:
+            snapshot = self._snapshot()
+            self.counters.clear()
+            self.summaries.clear()
+            self.timers.clear()
+        return snapshot
+
+    def merge(self, snapshot: dict):
+        """Add a snapshot, e.g. one taken in a worker process, to this registry's metrics."""
+        with self._lock:
+            for name, value in snapshot["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for kind, summaries in (("summaries", self.summaries), ("timers", self.timers)):
+                for name, summary in snapshot[kind].items():
+                    summaries.setdefault(name, Summary()).merge(summary)
+
+    def to_json(self, indent: Optional[int] = None) -> str:
+        # Empty summaries have infinite min/max, which JSON cannot hold; they are never exported
+        return json.dumps(self.snapshot(), indent=indent, sort_keys=True)
+
+    def to_prometheus(self, prefix: str = "buy_vs_rent") -> str:
+        """Text exposition format: counters as `_total`, summaries and timers as `_count`/`_sum`/`_max`."""
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot["counters"].items()):
+            metric = f"{prefix}_{name}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value:g}"]
+        for kind, unit in (("summaries", ""), ("timers", "_seconds")):
+            for name, summary in sorted(snapshot[kind].items()):
+                metric = f"{prefix}_{name}{unit}"
+                lines += [
+                    f"# TYPE {metric} summary",
+                    f"{metric}_count {summary['count']}",
+                    f"{metric}_sum {summary['total']:.9g}",
+                    f"# TYPE {metric}_max gauge",
+                    f"{metric}_max {summary['max']:.9g}",
+                ]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def count(name: str, value: float = 1):
+    if REGISTRY.enabled:
+        REGISTRY.count(name, value)
+
+
+def observe(name: str, value: float):
+    if REGISTRY.enabled:
+        REGISTRY.observe(name, value)
+
+
+class _Phase:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        REGISTRY.record_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+_NULL_PHASE = nullcontext()
+
+
+def phase(name: str):
+    # Times the enclosed block as `name`; a shared no-op context while collection is off
+    return _Phase(name) if REGISTRY.enabled else _NULL_PHASE
+
+
+def timed(name: Optional[str] = None) -> Callable:
+    """Decorator timing every call of a function as phase `name` (default: its qualified name)."""
+
+    def decorate(function: Callable) -> Callable:
+        phase_name = name or function.__qualname__.replace(".", "_").lower()
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not REGISTRY.enabled:
+                return function(*args, **kwargs)
+            with _Phase(phase_name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def enable(reset: bool = False):
+    if reset:
+        REGISTRY.reset()
+    REGISTRY.enabled = True
+
+
+def disable():
+    REGISTRY.enabled = False
+
+
+def collect(function: Callable, *args, **kwargs) -> Tuple[Any, dict]:
+    """Worker pool task: `function(*args, **kwargs)` and the metrics drained from this process.
+
+    The submitting process passes the snapshot to `REGISTRY.merge`. In a thread pool the drained
+    metrics are the shared registry's own, so the merge puts them straight back.
+    """
+    return function(*args, **kwargs), REGISTRY.drain()
+
+
+@contextmanager
+def instrumented(reset: bool = True) -> Iterator[Registry]:
+    """Collect metrics inside the block, e.g. `with instrumented() as metrics: ...; metrics.to_json()`."""
+    previous = REGISTRY.enabled
+    enable(reset)
+    try:
+        yield REGISTRY
+    finally:
+        REGISTRY.enabled = previous
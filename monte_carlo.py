@@ -0,0 +1,257 @@
+from dataclasses import asdict, dataclass
+from typing import Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from batch import MarketPath, broadcast_columns, evolve_arrays
+from house_investment import AnalysisParams, InvestmentConfig
+from variable_rate import VariableRateMortgage
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+DEFAULT_MEMORY_BUDGET = 64 * 2**20  # bytes of working memory per chunk
+DEFAULT_RELATIVE_ACCURACY = 0.005
+
+
+@dataclass
+class ReturnDistribution:
+    # Annual mean and volatility of one factor. "normal" draws simple returns, "lognormal" draws
+    # log-returns whose simple-return mean and volatility match `mean` and `volatility`.
+    mean: float
+    volatility: float = 0.0
+    kind: str = "normal"
+
+    def __post_init__(self):
+        if self.kind not in ("normal", "lognormal"):
+            raise ValueError(f"Unknown distribution '{self.kind}', expected 'normal' or 'lognormal'")
+        if self.volatility < 0:
+            raise ValueError("volatility must be non-negative")
+
+    def _log_moments(self) -> Tuple[float, float]:
+        sigma = np.sqrt(np.log1p(self.volatility**2 / (1 + self.mean) ** 2))
+        return np.log1p(self.mean) - sigma**2 / 2, sigma
+
+    def monthly(self, z: np.ndarray) -> np.ndarray:
+        # With zero volatility this is exactly the deterministic model's mean / 12
+        if self.kind == "normal":
+            return self.mean / 12 + self.volatility / np.sqrt(12) * z
+        mu, sigma = self._log_moments()
+        return np.expm1(mu / 12 + sigma / np.sqrt(12) * z)
+
+    def annual(self, z: np.ndarray) -> np.ndarray:
+        if self.kind == "normal":
+            return self.mean + self.volatility * z
+        mu, sigma = self._log_moments()
+        return np.expm1(mu + sigma * z)
+
+
+@dataclass
+class ParametricMarket:
+    stock: ReturnDistribution
+    house: ReturnDistribution
+    rent: ReturnDistribution
+    # 3x3 correlation between the (stock, house, rent) shocks; independent when None
+    correlation: Optional[Sequence[Sequence[float]]] = None
+
+    @classmethod
+    def from_params(
+        cls,
+        params: AnalysisParams,
+        config: InvestmentConfig = InvestmentConfig(),
+        stock_volatility: float = 0.15,
+        house_volatility: float = 0.05,
+        rent_volatility: float = 0.01,
+        kind: str = "normal",
+        correlation: Optional[Sequence[Sequence[float]]] = None,
+    ) -> "ParametricMarket":
+        # Centre every factor on the deterministic rates of an existing scenario
+        return cls(
+            ReturnDistribution(params.stock_market_return, stock_volatility, kind),
+            ReturnDistribution(config.annual_house_appreciation, house_volatility, kind),
+            ReturnDistribution(config.annual_rent_increase, rent_volatility, kind),
+            correlation,
+        )
+
+    def _cholesky(self) -> np.ndarray:
+        if self.correlation is None:
+            return np.eye(3)
+        correlation = np.asarray(self.correlation, dtype=np.float64)
+        if correlation.shape != (3, 3) or not np.allclose(correlation, correlation.T):
+            raise ValueError("correlation must be a symmetric 3x3 matrix for (stock, house, rent)")
+        try:
+            return np.linalg.cholesky(correlation)
+        except np.linalg.LinAlgError:
+            raise ValueError("correlation matrix must be positive definite") from None
+
+    def paths(self, rng: np.random.Generator, n_paths: int) -> MarketPath:
+        cholesky = self._cholesky()
+
+        def market(year: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+            # Correlated monthly shocks; house and rent move once a year, driven by the
+            # aggregate of that year's monthly shocks so they stay correlated with the stock path
+            z = rng.standard_normal((n_paths, 12, 3)) @ cholesky.T
+            annual_z = z[:, :, 1:].sum(axis=1) / np.sqrt(12)
+            return self.stock.monthly(z[:, :, 0]), self.house.annual(annual_z[:, 0]), self.rent.annual(annual_z[:, 1])
+
+        return market
+
+
+@dataclass
+class BootstrapMarket:
+    # Historical monthly returns, one row per month and columns (stock, house, rent).
+    # Each simulated year is stitched together from random blocks of consecutive months, which keeps
+    # the cross-asset correlation and short-term autocorrelation of the history.
+    history: np.ndarray
+    block_months: int = 12
+
+    def __post_init__(self):
+        self.history = np.asarray(self.history, dtype=np.float64)
+        if self.history.ndim != 2 or self.history.shape[1] != 3 or len(self.history) == 0:
+            raise ValueError("history must be shaped (months, 3) with stock, house and rent monthly returns")
+        if self.block_months < 1 or 12 % self.block_months:
+            raise ValueError("block_months must divide 12")
+
+    def paths(self, rng: np.random.Generator, n_paths: int) -> MarketPath:
+        n_months = len(self.history)
+        offsets = np.arange(self.block_months)
+
+        def market(year: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+            starts = rng.integers(0, n_months, size=(n_paths, 12 // self.block_months))
+            months = ((starts[:, :, None] + offsets) % n_months).reshape(n_paths, 12)
+            rows = self.history[months]
+            house = np.prod(1 + rows[:, :, 1], axis=1) - 1
+            rent = np.prod(1 + rows[:, :, 2], axis=1) - 1
+            return rows[:, :, 0], house, rent
+
+        return market
+
+
+Market = Union[ParametricMarket, BootstrapMarket]
+
+
+class QuantileSketch:
+    """Per-year percentiles of a stream of (paths, years) blocks, in memory independent of the paths.
+
+    Values are counted in logarithmic buckets, separately by sign (as in DDSketch), so every
+    percentile is within `relative_accuracy` of an exact order statistic. Magnitudes up to 1 share a
+    zero bucket (estimates there are off by at most 1) and magnitudes above `max_magnitude` share the
+    last one. Estimates are clamped to the
+    exact per-year minimum and maximum, so a column of equal values comes out exact.
+    """
+
+    def __init__(self, n_years: int, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY, max_magnitude=1e12):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.n_buckets = int(np.ceil(np.log(max_magnitude) / np.log(self.gamma)))
+        # Columns run from the largest negative magnitude through the zero bucket to the largest positive
+        self.counts = np.zeros((n_years, 2 * self.n_buckets + 1), dtype=np.int64)
+        self.min = np.full(n_years, np.inf)
+        self.max = np.full(n_years, -np.inf)
+
+    def add(self, values: np.ndarray):
+        n_years, width = self.counts.shape
+        index = np.ceil(np.log(np.maximum(np.abs(values), 1.0)) / np.log(self.gamma))
+        np.minimum(index, self.n_buckets, out=index)
+        column = (self.n_buckets + np.copysign(index, values)).astype(np.int64)
+        column += np.arange(n_years) * width
+        self.counts += np.bincount(column.ravel(), minlength=self.counts.size).reshape(n_years, width)
+        np.minimum(self.min, values.min(axis=0), out=self.min)
+        np.maximum(self.max, values.max(axis=0), out=self.max)
+
+    def percentiles(self, q: Sequence[float]) -> np.ndarray:
+        # Shaped (len(q), years) like np.percentile(values, q, axis=0), estimating its lower order
+        # statistic (method="lower"); the 0th and 100th percentiles are the exact extremes
+        cumulative = np.cumsum(self.counts, axis=1)
+        last = cumulative[:, -1] - 1
+        ranks = np.floor(np.asarray(q, dtype=np.float64)[:, None] / 100 * last)
+        columns = np.stack([np.searchsorted(row, rank, side="right") for row, rank in zip(cumulative, ranks.T)], 1)
+        k = columns - self.n_buckets
+        estimates = np.clip(np.sign(k) * 2 * self.gamma ** np.abs(k) / (self.gamma + 1), self.min, self.max)
+        return np.where(ranks == 0, self.min, np.where(ranks == last, self.max, estimates))
+
+
+@dataclass
+class MonteCarloResult:
+    percentiles: Tuple[float, ...]
+    # Bands are shaped (len(percentiles), years) and estimated by QuantileSketch; "difference" is
+    # buy minus rent net worth
+    buy_bands: np.ndarray
+    rent_bands: np.ndarray
+    difference_bands: np.ndarray
+    # Share of paths in which buying leaves more net worth than renting, per year
+    probability_buy_wins: np.ndarray
+    final_buy: np.ndarray
+    final_rent: np.ndarray
+
+    @property
+    def final_probability_buy_wins(self) -> float:
+        return float(self.probability_buy_wins[-1])
+
+
+def _chunk_size(years_of_study: int, memory_budget_bytes: int) -> int:
+    # Nine (paths, years) float64 series from the kernel plus its temporaries and the sketches'
+    # bucket indices (about 20 per path and year at peak, measured), the (paths, 12, 3) shocks and
+    # the kernel's per-path state vectors
+    bytes_per_path = 8 * (20 * years_of_study + 2 * 12 * 3 + 40)
+    return max(1, memory_budget_bytes // bytes_per_path)
+
+
+def simulate(
+    params: AnalysisParams,
+    market: Market,
+    config: InvestmentConfig = InvestmentConfig(),
+    n_paths: int = 100_000,
+    seed: Optional[int] = None,
+    percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+    memory_budget_bytes: int = DEFAULT_MEMORY_BUDGET,
+    chunk_size: Optional[int] = None,
+    mortgage: Optional[VariableRateMortgage] = None,
+    relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+) -> MonteCarloResult:
+    """Run `n_paths` stochastic versions of `params`, drawing stock, house and rent returns from `market`.
+
+    Paths are simulated in chunks sized to `memory_budget_bytes` (or `chunk_size`) and every chunk is
+    folded into per-year quantile sketches (bands within `relative_accuracy`) and win counts, so
+    beyond the budget only the final-year net worths grow with `n_paths` (16 bytes per path).
+    Every chunk gets its own child of `seed`, so the same seed and chunk size always reproduce the
+    same result. With `mortgage`, every path also draws its own variable-rate path instead of paying
+    the fixed mortgage_interest.
+    """
+    if n_paths < 1:
+        raise ValueError("n_paths must be at least 1")
+    n_years = params.years_of_study
+    if chunk_size is None:
+        chunk_size = _chunk_size(n_years, memory_budget_bytes)
+    chunks = [(start, min(start + chunk_size, n_paths)) for start in range(0, n_paths, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+
+    base_params, base_config = asdict(params), asdict(config)
+    buy, rent, difference = (QuantileSketch(n_years, relative_accuracy) for _ in range(3))
+    wins = np.zeros(n_years, dtype=np.int64)
+    final_buy, final_rent = np.empty(n_paths), np.empty(n_paths)
+    for (start, stop), chunk_seed in zip(chunks, seeds):
+        size = stop - start
+        p, c = broadcast_columns(base_params, base_config, {}, size)
+        rng = np.random.default_rng(chunk_seed)
+        loan = None
+        if mortgage is not None:
+            principal = p["house_price"] - p["house_price"] * c["down_payment_percentage"]
+            loan = mortgage.loan(principal, p["mortgage_term"], rng, size)
+        results = evolve_arrays(p, c, market=market.paths(rng, size), mortgage=loan)
+        chunk_buy, chunk_rent = results.combined_values, results.rent_stock_values
+        chunk_difference = chunk_buy - chunk_rent
+        buy.add(chunk_buy)
+        rent.add(chunk_rent)
+        difference.add(chunk_difference)
+        wins += (chunk_difference > 0).sum(axis=0)
+        final_buy[start:stop], final_rent[start:stop] = chunk_buy[:, -1], chunk_rent[:, -1]
+
+    return MonteCarloResult(
+        percentiles=tuple(percentiles),
+        buy_bands=buy.percentiles(percentiles),
+        rent_bands=rent.percentiles(percentiles),
+        difference_bands=difference.percentiles(percentiles),
+        probability_buy_wins=wins / n_paths,
+        final_buy=final_buy,
+        final_rent=final_rent,
+    )
@@ -0,0 +1,344 @@
+import html
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from house_investment import AnalysisParams, HouseInvestment, InvestmentConfig, ValueEvolution
+from sweep import Axis, SweepResult, sweep
+
+# matplotlib is only imported inside the rendering functions, so importing this module (or the model)
+# never pays for it
+
+DEFAULT_STOCK_RETURNS = [r / 100 for r in range(5, 12)]  # 5% to 11%
+DEFAULT_INTEREST_RATES = [r / 1000 for r in range(5, 35, 5)]  # 0.5% to 3% in 0.5% steps
+DEFAULT_RENT_PRICES = [500, 700, 900, 1100, 1300, 1500]
+
+
+@dataclass
+class ReportData:
+    params: AnalysisParams
+    evolution: ValueEvolution
+    # Keyed by the swept field: stock_market_return, mortgage_interest and initial_rent_price
+    sweeps: Dict[str, SweepResult]
+
+
+def build_report_data(
+    params: AnalysisParams,
+    config: InvestmentConfig = InvestmentConfig(),
+    stock_returns: Sequence[float] = DEFAULT_STOCK_RETURNS,
+    interest_rates: Sequence[float] = DEFAULT_INTEREST_RATES,
+    rent_prices: Sequence[float] = DEFAULT_RENT_PRICES,
+) -> ReportData:
+    axes = {
+        "stock_market_return": stock_returns,
+        "mortgage_interest": interest_rates,
+        "initial_rent_price": rent_prices,
+    }
+    return ReportData(
+        params,
+        HouseInvestment(params, config).calculate_value_evolution(),
+        {name: sweep(params, [Axis(name, values)], config) for name, values in axes.items()},
+    )
+
+
+def _text_box(ax, x: float, y: float, text: str):
+    ax.text(
+        x,
+        y,
+        text,
+        transform=ax.transAxes,
+        verticalalignment="top",
+        horizontalalignment="left",
+        bbox=dict(boxstyle="round", facecolor="white", alpha=0.8),
+    )
+
+
+def _plot_value_evolution(ax, data: ReportData):
+    params, evolution = data.params, data.evolution
+    details = evolution.financial_details
+    years = range(1, params.years_of_study + 1)
+
+    ax.plot(
+        years, evolution.house_values, label=f"House Value (Final: {evolution.house_values[-1]:,.0f}€)", color="gray"
+    )
+    ax.plot(
+        years,
+        evolution.house_stock_values,
+        label=f"Buy Scenario Stocks (Final: {evolution.house_stock_values[-1]:,.0f}€)",
+        color="lightblue",
+    )
+    ax.plot(
+        years,
+        evolution.combined_values,
+        label=f"Buy Total (Final: {evolution.combined_values[-1]:,.0f}€)",
+        color="blue",
+    )
+    ax.plot(
+        years,
+        evolution.rent_stock_values,
+        label=f"Rent Total (Final: {evolution.rent_stock_values[-1]:,.0f}€)",
+        color="orange",
+    )
+
+    ax.set_xlabel("Years")
+    ax.set_ylabel("Value (€)")
+    ax.set_title("Value Evolution Comparison")
+    ax.legend()
+    ax.grid(True)
+
+    _text_box(
+        ax,
+        0.05,
+        0.95,
+        f"Parameters:\n"
+        f"House price: {params.house_price:,.0f}€\n"
+        f"Mortgage interest: {params.mortgage_interest*100:.1f}%\n"
+        f"Mortgage term: {params.mortgage_term} years\n"
+        f"Stock market return: {params.stock_market_return:.1%}\n"
+        f"Initial rent: {params.initial_rent_price:,.0f}€\n"
+        f"Monthly net income: {params.monthly_net_income:,.0f}€",
+    )
+    _text_box(
+        ax,
+        0.5,
+        0.95,
+        f"Relevant numbers:\n"
+        f'Buy scenario net worth: {details["house_scenario_net_worth"]:,.0f}€\n'
+        f'Rent scenario net worth: {details["rent_scenario_net_worth"]:,.0f}€\n\n'
+        f'Final house value: {details["final_house_value"]:,.0f}€\n'
+        f'Outstanding mortgage: {details["remaining_mortgage_balance"]:,.0f}€\n'
+        f'Buy stock portfolio: {details["house_stock_portfolio"]:,.0f}€\n'
+        f'Rent stock portfolio: {details["rent_stock_portfolio"]:,.0f}€\n\n'
+        f'Initial monthly savings (Buy): {details["initial_house_savings"]:,.0f}€\n'
+        f'Initial monthly savings (Rent): {details["initial_rent_savings"]:,.0f}€\n'
+        f'Final monthly savings (Buy): {details["final_house_savings"]:,.0f}€\n'
+        f'Final monthly savings (Rent): {details["final_rent_savings"]:,.0f}€',
+    )
+
+
+def _plot_monthly_comparison(ax, data: ReportData, house: np.ndarray, rent: np.ndarray, kind: str, noun: str):
+    params = data.params
+    years = range(1, params.years_of_study + 1)
+
+    ax.plot(years, house, label=f"Buy Scenario Monthly {noun}")
+    ax.plot(years, rent, label=f"Rent Scenario Monthly {noun}")
+
+    ax.set_xlabel("Years")
+    ax.set_ylabel("Monthly Amount (€)")
+    ax.set_title(f"Monthly {noun} Comparison Over Time")
+    ax.legend()
+    ax.grid(True)
+
+    _text_box(
+        ax,
+        0.05,
+        0.95,
+        f"Initial values:\n"
+        f"Monthly net income: {params.monthly_net_income:,.0f}€\n"
+        f"Monthly life expenses: {params.initial_monthly_expenses:,.0f}€\n"
+        f"Rent: {params.initial_rent_price:,.0f}€\n"
+        f"House cost: {params.house_price:,.0f}€\n"
+        f"Mortgage interest: {params.mortgage_interest*100:.1f}%\n"
+        f"Loan duration: {params.mortgage_term} years\n"
+        f"\nMonthly {kind}:\n"
+        f"Buy initial: {house[0]:,.0f}€\n"
+        f"Buy final: {house[-1]:,.0f}€\n"
+        f"Rent initial: {rent[0]:,.0f}€\n"
+        f"Rent final: {rent[-1]:,.0f}€",
+    )
+
+
+def _plot_expenses(ax, data: ReportData):
+    evolution = data.evolution
+    _plot_monthly_comparison(ax, data, evolution.house_expenses, evolution.rent_expenses, "expenses", "Expenses")
+
+
+def _plot_investment(ax, data: ReportData):
+    evolution = data.evolution
+    _plot_monthly_comparison(ax, data, evolution.house_savings, evolution.rent_savings, "investments", "Investment")
+
+
+def _plot_final_values(
+    ax,
+    result: SweepResult,
+    field: str,
+    tick_labels: List[str],
+    xlabel: str,
+    title: str,
+    params_text: str,
+    text_x: float = 0.05,
+    ylim: Optional[float] = None,
+):
+    buy = result["house_scenario_net_worth"]
+    rent = result["rent_scenario_net_worth"]
+    x = np.arange(len(result[field]))
+    width = 0.35
+
+    ax.bar(x - width / 2, buy, width, label="Buy Scenario Total")
+    ax.bar(x + width / 2, rent, width, label="Rent Scenario Total")
+
+    # Add value labels on top of each bar
+    for i in range(len(x)):
+        ax.text(i - width / 2, buy[i], f"{buy[i]:,.0f}€", ha="center", va="bottom", rotation=90)
+        ax.text(i + width / 2, rent[i], f"{rent[i]:,.0f}€", ha="center", va="bottom", rotation=90)
+
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel("Final Value (€)")
+    ax.set_title(title)
+    ax.set_xticks(x)
+    ax.set_xticklabels(tick_labels, rotation=45, ha="right")
+    ax.legend()
+    ax.grid(True)
+    _text_box(ax, text_x, 0.95, params_text)
+    if ylim is not None:
+        ax.set_ylim(0, ylim)
+
+
+def _plot_stock_return(ax, data: ReportData):
+    params = data.params
+    result = data.sweeps["stock_market_return"]
+    _plot_final_values(
+        ax,
+        result,
+        "stock_market_return",
+        [f"{p:.0%}" for p in result["stock_market_return"]],
+        "Stock Market Return",
+        "Final Value by Stock Market Return",
+        f"Parameters:\n"
+        f"House price: {params.house_price:,.0f}€\n"
+        f"Mortgage interest: {params.mortgage_interest*100:.1f}%\n"
+        f"Mortgage term: {params.mortgage_term} years\n"
+        f"Initial rent: {params.initial_rent_price:,.0f}€\n"
+        f"Monthly net income: {params.monthly_net_income:,.0f}€\n"
+        f"Years of study: {params.years_of_study} years",
+    )
+
+
+def _plot_mortgage_interest(ax, data: ReportData):
+    params = data.params
+    result = data.sweeps["mortgage_interest"]
+    _plot_final_values(
+        ax,
+        result,
+        "mortgage_interest",
+        [f"{p:.1%}" for p in result["mortgage_interest"]],
+        "Mortgage Interest Rate",
+        "Final Value by Mortgage Interest Rate",
+        f"Parameters:\n"
+        f"House price: {params.house_price:,.0f}€\n"
+        f"Stock market return: {params.stock_market_return:.1%}\n"
+        f"Mortgage term: {params.mortgage_term} years\n"
+        f"Initial rent: {params.initial_rent_price:,.0f}€\n"
+        f"Monthly net income: {params.monthly_net_income:,.0f}€\n"
+        f"Years of study: {params.years_of_study} years",
+        ylim=10e6,  # Set y-axis from 0 to 10 million euros
+    )
+
+
+def _plot_rent_price(ax, data: ReportData):
+    params = data.params
+    result = data.sweeps["initial_rent_price"]
+    _plot_final_values(
+        ax,
+        result,
+        "initial_rent_price",
+        [f"{p:,.0f}€" for p in result["initial_rent_price"]],
+        "Initial Monthly Rent",
+        "Final Value by Initial Rent Price",
+        f"Parameters:\n"
+        f"House price: {params.house_price:,.0f}€\n"
+        f"Stock market return: {params.stock_market_return:.1%}\n"
+        f"Mortgage interest: {params.mortgage_interest*100:.1f}%\n"
+        f"Mortgage term: {params.mortgage_term} years\n"
+        f"Monthly net income: {params.monthly_net_income:,.0f}€\n"
+        f"Years of study: {params.years_of_study} years",
+        text_x=0.6,
+        ylim=10e6,
+    )
+
+
+FIGURES = {
+    "value_evolution": _plot_value_evolution,
+    "expenses": _plot_expenses,
+    "investment": _plot_investment,
+    "stock_return": _plot_stock_return,
+    "mortgage_interest": _plot_mortgage_interest,
+    "rent_price": _plot_rent_price,
+}
+
+
+def render_figure(name: str, data: ReportData, output_dir: str, formats: Sequence[str] = ("png",)) -> List[str]:
+    # Builds the figure on a bare Agg canvas: no pyplot, no GUI backend and no global figure state,
+    # so it is safe in worker processes and on servers without a display
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(12, 6))
+    FigureCanvasAgg(figure)
+    FIGURES[name](figure.add_subplot(), data)
+    figure.tight_layout()
+    paths = []
+    for extension in formats:
+        path = os.path.join(output_dir, f"{name}.{extension}")
+        figure.savefig(path)
+        paths.append(path)
+    return paths
+
+
+def _write_html(output_dir: str, data: ReportData, paths: Dict[str, List[str]]) -> str:
+    params = html.escape(repr(data.params))
+    images = "\n".join(
+        f'<h2>{html.escape(name.replace("_", " ").capitalize())}</h2>\n'
+        f'<img src="{html.escape(os.path.basename(files[0]))}" alt="{html.escape(name)}">'
+        for name, files in paths.items()
+    )
+    path = os.path.join(output_dir, "index.html")
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(
+            "<!DOCTYPE html>\n<html>\n<head><meta charset='utf-8'><title>Buy vs Rent</title></head>\n<body>\n"
+            f"<h1>Buy vs Rent</h1>\n<p><code>{params}</code></p>\n{images}\n</body>\n</html>\n"
+        )
+    return path
+
+
+def render_report(
+    data: ReportData,
+    output_dir: str,
+    formats: Sequence[str] = ("png",),
+    figures: Sequence[str] = tuple(FIGURES),
+    max_workers: Optional[int] = None,
+    html_index: bool = True,
+) -> List[str]:
+    """Render `figures` to files in `output_dir`, one worker process per figure.
+
+    `max_workers=1` renders in this process. With `html_index` an index.html linking every figure
+    (in the first of `formats`) is written alongside. Returns the written paths.
+    """
+    unknown = [name for name in figures if name not in FIGURES]
+    if unknown:
+        raise ValueError(f"Unknown figures {unknown}, expected some of {list(FIGURES)}")
+    os.makedirs(output_dir, exist_ok=True)
+    if max_workers == 1:
+        rendered = {name: render_figure(name, data, output_dir, formats) for name in figures}
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = {name: pool.submit(render_figure, name, data, output_dir, formats) for name in figures}
+            rendered = {name: future.result() for name, future in futures.items()}
+    paths = [path for files in rendered.values() for path in files]
+    if html_index:
+        paths.append(_write_html(output_dir, data, rendered))
+    return paths
+
+
+def show_report(data: ReportData, figures: Sequence[str] = tuple(FIGURES)):
+    # Interactive equivalent of render_report: one blocking window per figure
+    from matplotlib import pyplot as plt
+
+    for name in figures:
+        figure = plt.figure(figsize=(12, 6))
+        FIGURES[name](figure.gca(), data)
+        figure.tight_layout()
+        plt.show()
@@ -0,0 +1,194 @@
+import json
+import os
+from dataclasses import asdict
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+from batch import broadcast_columns, evolve
+from house_investment import MODEL_VERSION, SERIES_NAMES, AnalysisParams, InvestmentConfig
+from instrumentation import count, timed
+from sweep import Axis, axis_columns, grid_size
+
+# On-disk layout of a store directory:
+#   manifest.json          axes, base scenario, shape; written last, so its presence marks a complete store
+#   index/<field>.npy      (points,) value of every swept field at every grid point
+#   series/<series>.npy    (years, points) per-year series, year-major so one year is one contiguous row
+# All .npy files are opened memory-mapped; queries read only the rows and index columns they touch.
+
+MANIFEST = "manifest.json"
+QUERY_CHUNK = 1 << 20  # points per slice when scanning index columns and series rows
+
+Range = Tuple[Optional[float], Optional[float]]
+
+
+def _chunks(n_points: int, chunk_size: int) -> Iterator[Tuple[int, int]]:
+    for start in range(0, n_points, chunk_size):
+        yield start, min(start + chunk_size, n_points)
+
+
+@timed("store_write")
+def write_store(
+    path: str,
+    params: AnalysisParams,
+    axes: Sequence[Axis],
+    config: InvestmentConfig = InvestmentConfig(),
+    mode: str = "grid",
+    series: Sequence[str] = SERIES_NAMES,
+    chunk_size: int = 4096,
+    dtype: str = "float64",
+) -> "ResultStore":
+    """Evaluate a sweep and write the per-year `series` of every grid point to a store at `path`.
+
+    Points are evaluated `chunk_size` at a time and written straight into memory-mapped files, so
+    grids far larger than memory can be stored. Years past a point's years_of_study are NaN.
+    `dtype="float32"` halves the size on disk.
+    """
+    unknown = [name for name in series if name not in SERIES_NAMES]
+    if unknown:
+        raise ValueError(f"Unknown series {unknown}")
+    if os.path.exists(os.path.join(path, MANIFEST)):
+        raise FileExistsError(f"{path} already holds a result store")
+    n_points = grid_size(axes, mode)
+    horizon = {axis.name: axis for axis in axes}.get("years_of_study")
+    n_years = int(horizon.values.max() if horizon is not None else params.years_of_study)
+
+    os.makedirs(os.path.join(path, "index"), exist_ok=True)
+    os.makedirs(os.path.join(path, "series"), exist_ok=True)
+    index = {
+        axis.name: np.lib.format.open_memmap(
+            os.path.join(path, "index", f"{axis.name}.npy"), "w+", np.float64, (n_points,)
+        )
+        for axis in axes
+    }
+    columns = {
+        name: np.lib.format.open_memmap(os.path.join(path, "series", f"{name}.npy"), "w+", dtype, (n_years, n_points))
+        for name in series
+    }
+    base_params, base_config = asdict(params), asdict(config)
+    rows = [SERIES_NAMES.index(name) for name in series]
+    for start, stop in _chunks(n_points, chunk_size):
+        axis_values = axis_columns(axes, mode, start, stop)
+        results = evolve(*broadcast_columns(base_params, base_config, axis_values, stop - start))
+        for name, values in axis_values.items():
+            index[name][start:stop] = values
+        for name, row in zip(series, rows):
+            block = results.data[row]
+            columns[name][: block.shape[1], start:stop] = block.T
+            columns[name][block.shape[1] :, start:stop] = np.nan
+        count("store_points_written", stop - start)
+    for array in (*index.values(), *columns.values()):
+        array.flush()
+    del index, columns
+
+    manifest = {
+        "model_version": MODEL_VERSION,
+        "params": base_params,
+        "config": base_config,
+        "axes": {axis.name: axis.values.tolist() for axis in axes},
+        "mode": mode,
+        "n_points": n_points,
+        "n_years": n_years,
+        "series": list(series),
+        "dtype": dtype,
+    }
+    with open(os.path.join(path, MANIFEST), "w") as file:
+        json.dump(manifest, file, indent=2)
+    return ResultStore(path)
+
+
+class ResultStore:
+    """Read side of a store written by `write_store`; nothing is loaded until it is sliced.
+
+    E.g. every scenario with rent >= 1000 and a rate <= 2% where buying wins at year 20:
+        store.query(year=20, buy_wins=True, initial_rent_price=(1000, None), mortgage_interest=(None, 0.02))
+    """
+
+    def __init__(self, path: str):
+        manifest_path = os.path.join(path, MANIFEST)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"No complete result store at {path}")
+        with open(manifest_path) as file:
+            self.manifest = json.load(file)
+        self.path = path
+        self.n_points = self.manifest["n_points"]
+        self.n_years = self.manifest["n_years"]
+        self.index: Dict[str, np.ndarray] = {
+            name: np.load(os.path.join(path, "index", f"{name}.npy"), mmap_mode="r") for name in self.manifest["axes"]
+        }
+        self._series: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return self.n_points
+
+    @property
+    def model_version(self) -> int:
+        return self.manifest["model_version"]
+
+    def series(self, name: str) -> np.ndarray:
+        # Memory-mapped (years, points) array; row year - 1 holds that year's value for every point
+        if name not in self.manifest["series"]:
+            raise KeyError(f"Series '{name}' is not in this store, it holds {self.manifest['series']}")
+        if name not in self._series:
+            self._series[name] = np.load(os.path.join(self.path, "series", f"{name}.npy"), mmap_mode="r")
+        return self._series[name]
+
+    def field(self, name: str, points: Optional[np.ndarray] = None) -> np.ndarray:
+        """Value of any AnalysisParams/InvestmentConfig field at `points` (all points by default)."""
+        if name in self.index:
+            column = self.index[name]
+            return np.asarray(column if points is None else column[points])
+        base = {**self.manifest["params"], **self.manifest["config"]}
+        if name not in base:
+            raise KeyError(f"Unknown field '{name}'")
+        return np.full(self.n_points if points is None else len(points), base[name], dtype=np.float64)
+
+    def at_year(self, name: str, year: int, points: Optional[np.ndarray] = None) -> np.ndarray:
+        """Series `name` at (1-based) `year` for `points`; NaN where a point's horizon is shorter."""
+        if not 1 <= year <= self.n_years:
+            raise ValueError(f"year must be within 1..{self.n_years}")
+        row = self.series(name)[year - 1]
+        return np.asarray(row if points is None else row[points])
+
+    def filter(self, **ranges: Range) -> np.ndarray:
+        """Indices of the points whose fields lie in the given inclusive (low, high) ranges; None is open."""
+        mask = np.ones(self.n_points, dtype=bool)
+        for name, (low, high) in ranges.items():
+            if name not in self.index:
+                # Not swept: the base value either passes for every point or for none
+                value = self.field(name, np.zeros(1, dtype=np.int64))[0]
+                if (low is not None and value < low) or (high is not None and value > high):
+                    mask[:] = False
+                continue
+            column = self.index[name]
+            for start, stop in _chunks(self.n_points, QUERY_CHUNK):
+                values = column[start:stop]
+                if low is not None:
+                    mask[start:stop] &= values >= low
+                if high is not None:
+                    mask[start:stop] &= values <= high
+        return np.flatnonzero(mask)
+
+    def buy_wins(self, year: int, points: Optional[np.ndarray] = None) -> np.ndarray:
+        # Buying's net worth (home equity + stocks) beats renting's at `year`
+        return self.at_year("combined_values", year, points) > self.at_year("rent_stock_values", year, points)
+
+    def query(self, year: Optional[int] = None, buy_wins: Optional[bool] = None, **ranges: Range) -> np.ndarray:
+        """`filter(**ranges)`, further restricted to the points where buying wins (or loses) at `year`."""
+        points = self.filter(**ranges)
+        if buy_wins is None:
+            return points
+        if year is None:
+            raise ValueError("buy_wins needs a year")
+        keep = np.empty(len(points), dtype=bool)
+        for start, stop in _chunks(len(points), QUERY_CHUNK):
+            chunk = points[start:stop]
+            house = self.at_year("combined_values", year, chunk)
+            rent = self.at_year("rent_stock_values", year, chunk)
+            # Points whose horizon ends before `year` neither win nor lose
+            keep[start:stop] = ~np.isnan(house) & ((house > rent) == buy_wins)
+        return points[keep]
+
+    def points(self, points: np.ndarray) -> Dict[str, np.ndarray]:
+        # The swept field values of `points`, e.g. to tabulate a query result
+        return {name: np.asarray(column[points]) for name, column in self.index.items()}
@@ -0,0 +1,12 @@
+from house_investment import AnalysisParams
+
+# The base scenario of the report; tests and benchmarks derive their scenarios from it
+BASE_PARAMS = AnalysisParams(
+    house_price=300000,
+    mortgage_interest=0.02,
+    mortgage_term=30,
+    stock_market_return=0.06,
+    initial_rent_price=1100,
+    monthly_net_income=2600,
+    years_of_study=40,
+)
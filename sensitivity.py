@@ -0,0 +1,193 @@
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from batch import CONFIG_FIELDS, PARAM_FIELDS, broadcast_columns, evolve
+from house_investment import FLAG_FIELDS, AnalysisParams, InvestmentConfig
+
+# Buy minus rent net worth at the end of the horizon; any financial_details key is also accepted
+GAP_METRIC = "net_worth_gap"
+
+
+@dataclass
+class Factor:
+    # Any AnalysisParams or InvestmentConfig field, varied uniformly between low and high
+    name: str
+    low: float
+    high: float
+
+    def __post_init__(self):
+        if self.name not in PARAM_FIELDS and self.name not in CONFIG_FIELDS:
+            raise ValueError(f"Unknown factor '{self.name}'")
+        if self.name == "years_of_study":
+            raise ValueError("years_of_study sets the result length and cannot be a factor")
+        if not self.low <= self.high:
+            raise ValueError(f"Factor '{self.name}' has low > high")
+
+
+def default_factors(
+    params: AnalysisParams, config: InvestmentConfig = InvestmentConfig(), spread: float = 0.2
+) -> List[Factor]:
+    # Every numeric model input except years_of_study, varied by +/- `spread` around its current
+    # value. Switches have no neighbourhood to vary over; pass e.g. Factor(flag, 0, 1) explicitly.
+    values = {**asdict(params), **asdict(config)}
+    for name in ("years_of_study", *FLAG_FIELDS):
+        del values[name]
+    return [Factor(name, *sorted((value * (1 - spread), value * (1 + spread)))) for name, value in values.items()]
+
+
+def _check_factors(factors: Sequence[Factor]):
+    names = [factor.name for factor in factors]
+    if not names or len(set(names)) != len(names):
+        raise ValueError(f"Factors must be a non-empty list of distinct fields, got {names}")
+
+
+def evaluate_metric(
+    params: AnalysisParams,
+    columns: Dict[str, np.ndarray],
+    config: InvestmentConfig = InvestmentConfig(),
+    metric: str = GAP_METRIC,
+    chunk_size: int = 8192,
+) -> np.ndarray:
+    """Evaluate `metric` for every row of `columns` (field name -> values), in batches of `chunk_size`."""
+    n_points = len(next(iter(columns.values())))
+    base_params, base_config = asdict(params), asdict(config)
+    output = np.empty(n_points)
+    for start in range(0, n_points, chunk_size):
+        stop = min(start + chunk_size, n_points)
+        chunk = {name: values[start:stop] for name, values in columns.items()}
+        details = evolve(*broadcast_columns(base_params, base_config, chunk, stop - start)).financial_details
+        if metric == GAP_METRIC:
+            output[start:stop] = details["house_scenario_net_worth"] - details["rent_scenario_net_worth"]
+        else:
+            output[start:stop] = details[metric]
+    return output
+
+
+@dataclass
+class TornadoBar:
+    name: str
+    low: float
+    high: float
+    output_low: float
+    output_high: float
+
+    @property
+    def swing(self) -> float:
+        return abs(self.output_high - self.output_low)
+
+
+@dataclass
+class TornadoResult:
+    metric: str
+    baseline: float
+    # Sorted by decreasing swing, as drawn in a tornado chart
+    bars: List[TornadoBar]
+
+
+def tornado(
+    params: AnalysisParams,
+    factors: Optional[Sequence[Factor]] = None,
+    config: InvestmentConfig = InvestmentConfig(),
+    metric: str = GAP_METRIC,
+) -> TornadoResult:
+    """One-at-a-time sensitivity: move each factor to its low and high end with everything else at base."""
+    if factors is None:
+        factors = default_factors(params, config)
+    _check_factors(factors)
+    base = {**asdict(params), **asdict(config)}
+    # Row 0 is the baseline, then (low, high) for every factor, all in one batch
+    n_points = 1 + 2 * len(factors)
+    columns = {factor.name: np.full(n_points, float(base[factor.name])) for factor in factors}
+    for k, factor in enumerate(factors):
+        columns[factor.name][1 + 2 * k] = factor.low
+        columns[factor.name][2 + 2 * k] = factor.high
+    output = evaluate_metric(params, columns, config, metric)
+    bars = [
+        TornadoBar(factor.name, factor.low, factor.high, output[1 + 2 * k], output[2 + 2 * k])
+        for k, factor in enumerate(factors)
+    ]
+    return TornadoResult(metric, output[0], sorted(bars, key=lambda bar: bar.swing, reverse=True))
+
+
+@dataclass
+class SobolResult:
+    metric: str
+    names: List[str]
+    first_order: np.ndarray
+    total_order: np.ndarray
+    # Half-width of the 95% bootstrap confidence interval of each index
+    first_order_conf: np.ndarray
+    total_order_conf: np.ndarray
+    evaluations: int
+
+    def ranking(self) -> List[str]:
+        return [self.names[i] for i in np.argsort(-self.total_order)]
+
+
+def _sobol_estimates(f_a: np.ndarray, f_b: np.ndarray, f_ab: np.ndarray):
+    # Saltelli (2010) first-order and Jansen total-order estimators; f_ab is shaped (factors, samples)
+    variance = np.var(np.concatenate([f_a, f_b]))
+    if variance == 0:
+        return np.zeros(len(f_ab)), np.zeros(len(f_ab))
+    first_order = np.mean(f_b * (f_ab - f_a), axis=1) / variance
+    total_order = 0.5 * np.mean((f_a - f_ab) ** 2, axis=1) / variance
+    return first_order, total_order
+
+
+def sobol_indices(
+    params: AnalysisParams,
+    factors: Optional[Sequence[Factor]] = None,
+    config: InvestmentConfig = InvestmentConfig(),
+    metric: str = GAP_METRIC,
+    n_samples: int = 1024,
+    seed: Optional[int] = None,
+    n_bootstrap: int = 100,
+    chunk_size: int = 8192,
+) -> SobolResult:
+    """Variance-based global sensitivity indices with Saltelli sampling.
+
+    Needs n_samples * (len(factors) + 2) model evaluations, all run through the batch kernel.
+    """
+    if factors is None:
+        factors = default_factors(params, config)
+    _check_factors(factors)
+    rng = np.random.default_rng(seed)
+    k = len(factors)
+    low = np.array([factor.low for factor in factors])
+    high = np.array([factor.high for factor in factors])
+    a = low + (high - low) * rng.random((n_samples, k))
+    b = low + (high - low) * rng.random((n_samples, k))
+    # Design: A, B, then A with column i taken from B for every factor i
+    design = np.empty(((k + 2) * n_samples, k))
+    design[:n_samples] = a
+    design[n_samples : 2 * n_samples] = b
+    for i in range(k):
+        block = design[(2 + i) * n_samples : (3 + i) * n_samples]
+        block[:] = a
+        block[:, i] = b[:, i]
+
+    columns = {factor.name: design[:, i] for i, factor in enumerate(factors)}
+    output = evaluate_metric(params, columns, config, metric, chunk_size)
+    f_a, f_b = output[:n_samples], output[n_samples : 2 * n_samples]
+    f_ab = output[2 * n_samples :].reshape(k, n_samples)
+    first_order, total_order = _sobol_estimates(f_a, f_b, f_ab)
+
+    resampled = [
+        _sobol_estimates(f_a[index], f_b[index], f_ab[:, index])
+        for index in rng.integers(0, n_samples, size=(n_bootstrap, n_samples))
+    ]
+    z = 1.959964
+    first_order_conf = z * np.std([s1 for s1, _ in resampled], axis=0) if resampled else np.full(k, np.nan)
+    total_order_conf = z * np.std([st for _, st in resampled], axis=0) if resampled else np.full(k, np.nan)
+
+    return SobolResult(
+        metric,
+        [factor.name for factor in factors],
+        first_order,
+        total_order,
+        first_order_conf,
+        total_order_conf,
+        len(output),
+    )
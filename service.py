@@ -0,0 +1,371 @@
+import argparse
+import asyncio
+import json
+import logging
+import math
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import asdict
+from http import HTTPStatus
+from typing import Dict, List, Optional, Tuple, Union
+
+from cache import ResultCache, canonical_key
+from instrumentation import REGISTRY, collect, enable, observe
+from house_investment import FLAG_FIELDS, SERIES_NAMES, AnalysisParams, InvestmentConfig, ValueEvolution
+from sweep import DEFAULT_METRICS, Axis, grid_size
+from tasks import break_even_point, evaluate_batch, sweep_columns
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 1 * 2**20
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def process_pool(max_workers: Optional[int] = None, metrics: bool = False) -> ProcessPoolExecutor:
+    # Spawned rather than forked: a forked worker would inherit the server's open client sockets and
+    # keep "Connection: close" responses from ever reaching EOF. With `metrics` every worker collects
+    return ProcessPoolExecutor(
+        max_workers, mp_context=multiprocessing.get_context("spawn"), initializer=enable if metrics else None
+    )
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _scenario(body: dict, max_years_of_study: int) -> Tuple[AnalysisParams, InvestmentConfig]:
+    # Validated up front, so one bad scenario can never fail the batch it would have joined
+    try:
+        params, config = AnalysisParams(**body["params"]), InvestmentConfig(**body.get("config", {}))
+    except KeyError:
+        raise BadRequest("'params' is required") from None
+    except TypeError as error:
+        raise BadRequest(str(error)) from None
+    for name, value in {**asdict(params), **asdict(config)}.items():
+        if name in FLAG_FIELDS:
+            if not isinstance(value, bool):
+                raise BadRequest(f"'{name}' must be true or false")
+        elif isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise BadRequest(f"'{name}' must be a number")
+        elif not math.isfinite(value):
+            raise BadRequest(f"'{name}' must be finite")
+    for name in ("house_price", "mortgage_term"):
+        if getattr(params, name) <= 0:
+            raise BadRequest(f"'{name}' must be positive")
+    if params.years_of_study < 1 or params.years_of_study != int(params.years_of_study):
+        raise BadRequest("'years_of_study' must be a positive integer")
+    if params.years_of_study > max_years_of_study:
+        raise BadRequest(f"'years_of_study' is limited to {max_years_of_study}")
+    return params, config
+
+
+def _reject_constant(name: str):
+    # json.loads would otherwise accept NaN, Infinity and -Infinity, which are not JSON
+    raise BadRequest(f"{name} is not a valid JSON value")
+
+
+def encode_response(status: HTTPStatus, payload: Union[dict, str]) -> Tuple[HTTPStatus, bytes, str]:
+    # Returns (status, body, content type). Results the model could not compute as finite numbers
+    # are answered with an error, since NaN and Infinity cannot be written as JSON
+    if isinstance(payload, str):
+        return status, payload.encode(), PROMETHEUS_CONTENT_TYPE
+    try:
+        data = json.dumps(payload, allow_nan=False).encode()
+    except ValueError:
+        status = HTTPStatus.UNPROCESSABLE_ENTITY
+        data = json.dumps({"error": "The result is not finite for these inputs"}).encode()
+    return status, data, "application/json"
+
+
+def _evolution_payload(evolution: ValueEvolution, series: bool) -> dict:
+    payload = {"financial_details": {key: float(value) for key, value in evolution.financial_details.items()}}
+    if series:
+        payload["series"] = {name: row.tolist() for name, row in zip(SERIES_NAMES, evolution.data)}
+    return payload
+
+
+class EvaluationService:
+    """Model evaluation behind JSON request handlers, for the HTTP server or an in-process client.
+
+    Single-scenario evaluations that arrive within `batch_window` seconds of each other are grouped
+    into one vectorized batch call (at most `max_batch_size` scenarios). All model work runs on
+    `executor`, so the event loop only parses requests and routes results, and evaluated scenarios
+    are kept in `cache` (copied on the loop's default thread pool). Requests are bounded by
+    `max_sweep_points` and `max_years_of_study`.
+
+    With `metrics` the service and the workers of its own pool collect instrumentation, served at
+    /metrics (JSON) and /metrics/prometheus; workers of a passed `executor` collect if they ran
+    `instrumentation.enable`.
+    """
+
+    def __init__(
+        self,
+        executor: Optional[Executor] = None,
+        batch_window: float = 0.005,
+        max_batch_size: int = 1024,
+        cache: Optional[ResultCache] = None,
+        max_sweep_points: int = 1_000_000,
+        max_years_of_study: int = 100,
+        metrics: bool = False,
+    ):
+        if metrics:
+            enable()
+        self._own_executor = executor is None
+        self.executor = executor if executor is not None else process_pool(metrics=metrics)
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.cache = cache if cache is not None else ResultCache()
+        self.max_sweep_points = max_sweep_points
+        self.max_years_of_study = max_years_of_study
+        self.batches = 0
+        self._pending: List[Tuple[str, AnalysisParams, InvestmentConfig, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+
+    def close(self):
+        if self._own_executor:
+            self.executor.shutdown()
+
+    async def evaluate(self, params: AnalysisParams, config: InvestmentConfig = InvestmentConfig()) -> ValueEvolution:
+        key = canonical_key(params, config, closed_form=True)
+        loop = asyncio.get_running_loop()
+        # Cache entries are (un)pickled and copied, which is too slow for the event loop
+        cached = await loop.run_in_executor(None, self.cache.get, key)
+        if cached is not None:
+            return cached
+        future = loop.create_future()
+        self._pending.append((key, params, config, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.batch_window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            # The loop only keeps weak references to tasks, so hold on to running batches
+            task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, AnalysisParams, InvestmentConfig, asyncio.Future]]):
+        # Identical scenarios in one window are evaluated once
+        unique: Dict[str, Tuple[AnalysisParams, InvestmentConfig]] = {}
+        for key, params, config, _ in batch:
+            unique.setdefault(key, (params, config))
+        keys = list(unique)
+        self.batches += 1
+        observe("service_batch_size", len(keys))
+        try:
+            results = await self._offload(
+                evaluate_batch, [unique[key][0] for key in keys], [unique[key][1] for key in keys]
+            )
+        except Exception as error:
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        by_key = dict(zip(keys, results))
+        for key, _, _, future in batch:
+            if not future.done():
+                future.set_result(by_key[key])
+        await asyncio.get_running_loop().run_in_executor(None, self._cache_results, by_key)
+
+    def _cache_results(self, results: Dict[str, ValueEvolution]):
+        for key, result in results.items():
+            self.cache.put(key, result)
+
+    async def _offload(self, function, *args):
+        loop = asyncio.get_running_loop()
+        if not REGISTRY.enabled:
+            return await loop.run_in_executor(self.executor, function, *args)
+        result, snapshot = await loop.run_in_executor(self.executor, collect, function, *args)
+        REGISTRY.merge(snapshot)
+        return result
+
+    async def handle(self, method: str, path: str, body: bytes) -> Tuple[int, Union[dict, str]]:
+        # Returns (HTTP status, JSON payload or plain text); never raises for a bad request
+        routes = {
+            ("GET", "/health"): self._health,
+            ("GET", "/metrics"): self._metrics,
+            ("GET", "/metrics/prometheus"): self._prometheus_metrics,
+            ("POST", "/evaluate"): self._evaluate_route,
+            ("POST", "/sweep"): self._sweep_route,
+            ("POST", "/break-even"): self._break_even_route,
+        }
+        route = routes.get((method, path))
+        if route is None:
+            known_path = any(path == route_path for _, route_path in routes)
+            status = HTTPStatus.METHOD_NOT_ALLOWED if known_path else HTTPStatus.NOT_FOUND
+            return status, {"error": status.phrase}
+        try:
+            request = json.loads(body, parse_constant=_reject_constant) if body else {}
+            if not isinstance(request, dict):
+                raise BadRequest("Request body must be a JSON object")
+            return HTTPStatus.OK, await route(request)
+        except (BadRequest, json.JSONDecodeError) as error:
+            return HTTPStatus.BAD_REQUEST, {"error": str(error)}
+        except ValueError as error:
+            # Model-level rejections (unknown fields, empty brackets, ...)
+            return HTTPStatus.UNPROCESSABLE_ENTITY, {"error": str(error)}
+        except Exception:
+            logger.exception("Error handling %s %s", method, path)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal server error"}
+
+    async def _health(self, request: dict) -> dict:
+        return {"status": "ok", "batches": self.batches, "cache": asdict(self.cache.stats)}
+
+    async def _metrics(self, request: dict) -> dict:
+        return REGISTRY.snapshot()
+
+    async def _prometheus_metrics(self, request: dict) -> str:
+        return REGISTRY.to_prometheus()
+
+    async def _evaluate_route(self, request: dict) -> dict:
+        params, config = _scenario(request, self.max_years_of_study)
+        return _evolution_payload(await self.evaluate(params, config), bool(request.get("series", False)))
+
+    async def _sweep_route(self, request: dict) -> dict:
+        params, config = _scenario(request, self.max_years_of_study)
+        try:
+            axes = [Axis(axis["name"], axis["values"]) for axis in request["axes"]]
+        except (KeyError, TypeError):
+            raise BadRequest('\'axes\' must be a list of {"name": ..., "values": [...]} objects') from None
+        mode = request.get("mode", "grid")
+        metrics = request.get("metrics", list(DEFAULT_METRICS))
+        if grid_size(axes, mode) > self.max_sweep_points:
+            raise BadRequest(f"Sweeps are limited to {self.max_sweep_points} points")
+        for axis in axes:
+            if axis.name == "years_of_study":
+                self._check_years(axis.values)
+        return {"columns": await self._offload(sweep_columns, params, config, axes, mode, metrics)}
+
+    async def _break_even_route(self, request: dict) -> dict:
+        params, config = _scenario(request, self.max_years_of_study)
+        try:
+            field, bracket = request["field"], request["bracket"]
+        except KeyError as error:
+            raise BadRequest(f"{error} is required") from None
+        if field == "years_of_study":
+            self._check_years(bracket)
+        return await self._offload(break_even_point, params, config, field, bracket, request.get("year"))
+
+    def _check_years(self, values):
+        try:
+            too_long = max(values) > self.max_years_of_study
+        except (TypeError, ValueError):
+            return  # Left to the model to reject
+        if too_long:
+            raise BadRequest(f"'years_of_study' is limited to {self.max_years_of_study}")
+
+    # HTTP/1.1 transport
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    break
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = request_line.split(" ")
+                except ValueError:
+                    break
+                headers = {}
+                for line in header_lines:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # The body cannot be delimited, so the connection cannot be reused either
+                    status, payload = HTTPStatus.BAD_REQUEST, {"error": "Invalid Content-Length"}
+                    keep_alive = False
+                elif length > MAX_BODY_BYTES:
+                    status, payload = HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "Request body too large"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload = await self.handle(method, target.split("?", 1)[0], body)
+                    connection = headers.get("connection", "").lower()
+                    keep_alive = connection != "close" and (version == "HTTP/1.1" or connection == "keep-alive")
+                status, data, content_type = encode_response(status, payload)
+                writer.write(
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                    f"Content-Type: {content_type}\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8000) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self._serve_connection, host, port, backlog=1024)
+
+
+class InProcessClient:
+    # Calls the service's handlers directly, without sockets, e.g. for tests; responses are encoded
+    # and decoded as they would be on the wire
+    def __init__(self, service: EvaluationService):
+        self.service = service
+
+    async def get(self, path: str) -> Tuple[int, Union[dict, str]]:
+        return self._decode(*await self.service.handle("GET", path, b""))
+
+    async def post(self, path: str, payload: dict) -> Tuple[int, dict]:
+        return self._decode(*await self.service.handle("POST", path, json.dumps(payload).encode()))
+
+    @staticmethod
+    def _decode(status: HTTPStatus, payload: Union[dict, str]) -> Tuple[int, Union[dict, str]]:
+        status, data, content_type = encode_response(status, payload)
+        return int(status), data.decode() if content_type == PROMETHEUS_CONTENT_TYPE else json.loads(data)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve buy vs rent evaluations over HTTP/JSON")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--batch-window", type=float, default=0.005, help="Seconds to wait for a batch to fill")
+    parser.add_argument("--max-batch-size", type=int, default=1024)
+    parser.add_argument("--max-years", type=int, default=100, help="Largest years_of_study a request may ask for")
+    parser.add_argument("--metrics", action="store_true", help="Collect metrics in the server and its workers")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
+    async def run():
+        service = EvaluationService(
+            process_pool(args.workers, args.metrics),
+            args.batch_window,
+            args.max_batch_size,
+            max_years_of_study=args.max_years,
+            metrics=args.metrics,
+        )
+        server = await service.serve(args.host, args.port)
+        logger.info("Serving on %s", ", ".join(str(sock.getsockname()) for sock in server.sockets))
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            service.executor.shutdown()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+import json
+from bisect import bisect_left, bisect_right
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from batch import CONFIG_FIELDS, PARAM_FIELDS, broadcast_columns, evolve
+from breakeven import break_even
+from house_investment import AnalysisParams, HouseInvestment, InvestmentConfig
+from sweep import Axis, sweep
+
+DEFAULT_SURROGATE_METRICS = ("house_scenario_net_worth", "rent_scenario_net_worth")
+# Fields the model only takes at whole values (or where it jumps between them, like the year the
+# mortgage ends): they are never interpolated, only looked up at their grid values
+DISCRETE_FIELDS = ("years_of_study", "mortgage_term", "prepayment_reduces_payment")
+
+
+@dataclass
+class SurrogateAnswer:
+    values: Dict[str, float]
+    # True when the query fell outside the grid and was evaluated by the model instead
+    exact: bool
+    # Largest interpolation error seen while validating the grid, per metric; 0 for exact answers
+    error_bounds: Dict[str, float]
+
+
+@dataclass
+class SurrogateBreakEven:
+    field: str
+    value: float
+    exact: bool
+    # Interpolation error bound of the gap divided by its slope at the root, in units of `field`
+    error_bound: float
+
+
+@dataclass
+class Surrogate:
+    """Model outputs precomputed over a grid of axes and answered by multilinear interpolation.
+
+    Fields that are not axes are fixed at `params`/`config`. A query that changes one of them, or
+    leaves the grid, is evaluated exactly instead. `errors` holds the interpolation errors measured
+    against the exact model at random points inside the grid when it was built (`max_abs`, `p99_abs`
+    and `max_rel` per metric); they are empirical bounds, not guarantees.
+    """
+
+    params: AnalysisParams
+    config: InvestmentConfig
+    axes: List[Axis]
+    tables: Dict[str, np.ndarray]
+    errors: Dict[str, Dict[str, float]] = field(default_factory=dict)
+
+    def __post_init__(self):
+        shape = tuple(len(axis.values) for axis in self.axes)
+        # Flat-index offset of every cell corner; bit k of the corner number steps along axis k
+        strides = np.array([int(np.prod(shape[k + 1 :], dtype=np.int64)) for k in range(len(shape))], dtype=np.int64)
+        corners = np.arange(2 ** len(self.axes))
+        self._bits = (corners[:, None] >> np.arange(len(self.axes))) & 1
+        self._offsets = self._bits @ strides
+        self._strides = strides
+        self._base = {**asdict(self.params), **asdict(self.config)}
+        self._nodes = [axis.values.tolist() for axis in self.axes]
+        self._fixed = [name for name in self._base if name not in {axis.name for axis in self.axes}]
+        self._flat_tables = {metric: table.ravel() for metric, table in self.tables.items()}
+
+    @property
+    def metrics(self) -> Tuple[str, ...]:
+        return tuple(self.tables)
+
+    def _columns(self, points: Dict[str, np.ndarray]) -> Tuple[Dict[str, np.ndarray], int]:
+        unknown = [name for name in points if name not in PARAM_FIELDS and name not in CONFIG_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields {unknown}")
+        columns = {name: np.atleast_1d(np.asarray(values, dtype=np.float64)) for name, values in points.items()}
+        n_points = max((len(values) for values in columns.values()), default=1)
+        return {name: np.broadcast_to(values, (n_points,)) for name, values in columns.items()}, n_points
+
+    def _locate(self, fields: dict) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        # Scalar version of _interpolate's lookup for a single query: the table indices and weights of
+        # the cell corners, or None when the point is not on the surrogate
+        if any(fields[name] != self._base[name] for name in self._fixed):
+            return None
+        flat = 0
+        weights = np.ones(1)
+        for k, (axis, nodes) in enumerate(zip(self.axes, self._nodes)):
+            value = fields[axis.name]
+            if axis.name in DISCRETE_FIELDS or len(nodes) == 1:
+                cell = bisect_left(nodes, value)
+                if cell == len(nodes) or nodes[cell] != value:
+                    return None
+                t = 0.0
+            else:
+                if not nodes[0] <= value <= nodes[-1]:
+                    return None
+                cell = min(bisect_right(nodes, value) - 1, len(nodes) - 2)
+                t = (value - nodes[cell]) / (nodes[cell + 1] - nodes[cell])
+            flat += cell * int(self._strides[k])
+            weights = np.concatenate((weights * (1 - t), weights * t))
+        return np.minimum(flat + self._offsets, len(next(iter(self._flat_tables.values()))) - 1), weights
+
+    def _interpolate(self, columns: Dict[str, np.ndarray], n_points: int) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        # Interpolated metrics at every point, and whether each point lies on the surrogate at all
+        inside = np.ones(n_points, dtype=bool)
+        for name, values in columns.items():
+            if name not in {axis.name for axis in self.axes}:
+                inside &= values == self._base[name]
+        flat = np.zeros(n_points, dtype=np.int64)
+        weights = np.ones((n_points, len(self._offsets)))
+        for k, axis in enumerate(self.axes):
+            nodes = axis.values
+            value = columns.get(axis.name, np.full(n_points, self._base[axis.name]))
+            if axis.name in DISCRETE_FIELDS or len(nodes) == 1:
+                cell = np.clip(np.searchsorted(nodes, value), 0, len(nodes) - 1)
+                inside &= nodes[cell] == value
+                t = np.zeros(n_points)
+            else:
+                cell = np.clip(np.searchsorted(nodes, value, side="right") - 1, 0, len(nodes) - 2)
+                inside &= (value >= nodes[0]) & (value <= nodes[-1])
+                t = np.clip((value - nodes[cell]) / (nodes[cell + 1] - nodes[cell]), 0, 1)
+            flat += cell * self._strides[k]
+            weights *= np.where(self._bits[:, k], t[:, None], 1 - t[:, None])
+        # Corners past the last node of a discrete axis carry zero weight; clipping keeps them addressable
+        index = np.minimum(flat[:, None] + self._offsets, next(iter(self.tables.values())).size - 1)
+        values = {metric: (table.ravel()[index] * weights).sum(axis=1) for metric, table in self.tables.items()}
+        return values, inside
+
+    def _exact(self, columns: Dict[str, np.ndarray], n_points: int) -> Dict[str, np.ndarray]:
+        details = evolve(
+            *broadcast_columns(asdict(self.params), asdict(self.config), dict(columns), n_points)
+        ).financial_details
+        return {metric: details[metric] for metric in self.tables}
+
+    def evaluate_many(self, points: Dict[str, np.ndarray]) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        """Metrics for many points given as field columns (missing fields take the base values).
+
+        Returns the metric columns and a mask of the points that were evaluated exactly.
+        """
+        columns, n_points = self._columns(points)
+        values, inside = self._interpolate(columns, n_points)
+        if not inside.all():
+            outside = np.flatnonzero(~inside)
+            exact = self._exact({name: column[outside] for name, column in columns.items()}, len(outside))
+            for metric in values:
+                values[metric][outside] = exact[metric]
+        return values, ~inside
+
+    def evaluate(self, params: AnalysisParams, config: Optional[InvestmentConfig] = None) -> SurrogateAnswer:
+        """Metrics of one scenario, e.g. for a UI that re-queries on every slider move."""
+        config = config if config is not None else self.config
+        located = self._locate({**vars(params), **vars(config)})
+        if located is None:
+            details = HouseInvestment(params, config).calculate_value_evolution().financial_details
+            return SurrogateAnswer(
+                {metric: float(details[metric]) for metric in self.tables}, True, dict.fromkeys(self.tables, 0.0)
+            )
+        index, weights = located
+        return SurrogateAnswer(
+            {metric: float(table[index] @ weights) for metric, table in self._flat_tables.items()},
+            False,
+            {metric: self.errors.get(metric, {}).get("max_abs", np.nan) for metric in self.tables},
+        )
+
+    def break_even(
+        self, params: AnalysisParams, field: str, config: Optional[InvestmentConfig] = None
+    ) -> SurrogateBreakEven:
+        """Value of axis `field` at which buying and renting end with the same net worth.
+
+        Along one axis the interpolant is piecewise linear, so its first root is found exactly from
+        the grid nodes. Falls back to breakeven.break_even over the axis range when the scenario is off
+        the grid or the interpolated gap does not change sign.
+        """
+        if not set(DEFAULT_SURROGATE_METRICS) <= set(self.tables):
+            raise ValueError(f"Break-even needs the {DEFAULT_SURROGATE_METRICS} metrics")
+        axis = next((axis for axis in self.axes if axis.name == field), None)
+        if axis is None or field in DISCRETE_FIELDS or len(axis.values) < 2:
+            raise ValueError(f"'{field}' is not a continuous axis of this surrogate")
+        config = config if config is not None else self.config
+        points = {**asdict(params), **asdict(config)}
+        points[field] = axis.values
+        columns, n_points = self._columns(points)
+        values, inside = self._interpolate(columns, n_points)
+        gap = values["house_scenario_net_worth"] - values["rent_scenario_net_worth"]
+        crossings = np.flatnonzero(np.sign(gap[:-1]) != np.sign(gap[1:]))
+        if inside.all() and len(crossings):
+            k = crossings[0]
+            step = axis.values[k + 1] - axis.values[k]
+            slope = (gap[k + 1] - gap[k]) / step
+            value = axis.values[k] if gap[k] == 0 else axis.values[k] - gap[k] / slope
+            gap_error = sum(self.errors.get(metric, {}).get("max_abs", np.nan) for metric in DEFAULT_SURROGATE_METRICS)
+            return SurrogateBreakEven(field, float(value), False, float(min(gap_error / abs(slope), step)))
+        exact = break_even(params, field, (axis.values[0], axis.values[-1]), config)
+        return SurrogateBreakEven(field, exact.value, True, 0.0)
+
+    def save(self, path: str):
+        meta = {
+            "params": asdict(self.params),
+            "config": asdict(self.config),
+            "axes": [axis.name for axis in self.axes],
+            "metrics": list(self.tables),
+            "errors": self.errors,
+        }
+        arrays = {f"axis_{k}": axis.values for k, axis in enumerate(self.axes)}
+        arrays.update({f"table_{k}": table for k, table in enumerate(self.tables.values())})
+        np.savez_compressed(path, meta=np.array(json.dumps(meta)), **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "Surrogate":
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            axes = [Axis(name, data[f"axis_{k}"]) for k, name in enumerate(meta["axes"])]
+            tables = {metric: data[f"table_{k}"] for k, metric in enumerate(meta["metrics"])}
+        params = AnalysisParams(**meta["params"])
+        return cls(params, InvestmentConfig(**meta["config"]), axes, tables, meta["errors"])
+
+
+def build_surrogate(
+    params: AnalysisParams,
+    axes: Sequence[Axis],
+    config: InvestmentConfig = InvestmentConfig(),
+    metrics: Sequence[str] = DEFAULT_SURROGATE_METRICS,
+    dtype: str = "float64",
+    n_validation: int = 2000,
+    seed: Optional[int] = 0,
+    chunk_size: int = 4096,
+) -> Surrogate:
+    """Evaluate `metrics` at every point of the grid spanned by `axes` and measure the interpolation error.
+
+    Axis values are sorted. `dtype="float32"` halves the tables at a relative rounding error of about
+    1e-7, which is included in the measured errors.
+    """
+    axes = [Axis(axis.name, np.unique(axis.values)) for axis in axes]
+    shape = tuple(len(axis.values) for axis in axes)
+    grid = sweep(params, axes, config, "grid", metrics, chunk_size)
+    tables = {metric: grid.columns[metric].astype(dtype).reshape(shape) for metric in metrics}
+    surrogate = Surrogate(params, config, axes, tables)
+
+    if n_validation:
+        rng = np.random.default_rng(seed)
+        points = {}
+        for axis in axes:
+            if axis.name in DISCRETE_FIELDS:
+                points[axis.name] = rng.choice(axis.values, n_validation)
+            else:
+                points[axis.name] = rng.uniform(axis.values[0], axis.values[-1], n_validation)
+        columns, n_points = surrogate._columns(points)
+        approximate, _ = surrogate._interpolate(columns, n_points)
+        exact = surrogate._exact(columns, n_points)
+        for metric in metrics:
+            error = np.abs(approximate[metric] - exact[metric])
+            surrogate.errors[metric] = {
+                "max_abs": float(error.max()),
+                "p99_abs": float(np.percentile(error, 99)),
+                "max_rel": float((error / np.maximum(np.abs(exact[metric]), 1.0)).max()),
+            }
+    return surrogate
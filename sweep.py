@@ -0,0 +1,172 @@
+import os
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from batch import CONFIG_FIELDS, PARAM_FIELDS, broadcast_columns, evolve
+from house_investment import AnalysisParams, InvestmentConfig
+from instrumentation import REGISTRY, collect, count, enable, timed
+
+DEFAULT_METRICS = (
+    "house_scenario_net_worth",
+    "rent_scenario_net_worth",
+    "final_house_value",
+    "remaining_mortgage_balance",
+    "home_equity",
+    "house_stock_portfolio",
+    "rent_stock_portfolio",
+    "initial_house_savings",
+    "initial_rent_savings",
+    "final_house_savings",
+    "final_rent_savings",
+)
+
+
+@dataclass
+class Axis:
+    # Any AnalysisParams or InvestmentConfig field name
+    name: str
+    values: Sequence[float]
+
+    def __post_init__(self):
+        if self.name not in PARAM_FIELDS and self.name not in CONFIG_FIELDS:
+            raise ValueError(f"Unknown sweep axis '{self.name}'")
+        self.values = np.asarray(self.values, dtype=np.float64)
+        if self.values.ndim != 1 or len(self.values) == 0:
+            raise ValueError(f"Axis '{self.name}' needs a non-empty 1-D list of values")
+
+
+@dataclass
+class SweepResult:
+    # One row per grid point: the axis values followed by the requested metrics
+    columns: Dict[str, np.ndarray]
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values())))
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def rows(self) -> Iterator[dict]:
+        names = list(self.columns)
+        for values in zip(*(self.columns[name].tolist() for name in names)):
+            yield dict(zip(names, values))
+
+    def to_records(self) -> np.ndarray:
+        records = np.empty(len(self), dtype=[(name, np.float64) for name in self.columns])
+        for name, values in self.columns.items():
+            records[name] = values
+        return records
+
+    @classmethod
+    def concatenate(cls, parts: List["SweepResult"]) -> "SweepResult":
+        return cls({name: np.concatenate([part.columns[name] for part in parts]) for name in parts[0].columns})
+
+
+def grid_size(axes: Sequence[Axis], mode: str) -> int:
+    lengths = [len(axis.values) for axis in axes]
+    if mode == "grid":
+        return int(np.prod(lengths, dtype=np.int64))
+    if mode == "zip":
+        if len(set(lengths)) != 1:
+            raise ValueError(f"Zipped axes must have the same length, got {lengths}")
+        return lengths[0]
+    raise ValueError(f"Unknown sweep mode '{mode}', expected 'grid' or 'zip'")
+
+
+def axis_columns(axes: Sequence[Axis], mode: str, start: int, stop: int) -> Dict[str, np.ndarray]:
+    # Points are generated from their flat index, so a chunk never needs the rest of the grid.
+    # Grid order matches itertools.product: the first axis varies slowest.
+    index = np.arange(start, stop)
+    if mode == "zip":
+        return {axis.name: axis.values[index] for axis in axes}
+    positions = np.unravel_index(index, tuple(len(axis.values) for axis in axes))
+    return {axis.name: axis.values[position] for axis, position in zip(axes, positions)}
+
+
+@timed("sweep_chunk")
+def _evaluate_chunk(
+    base_params: dict, base_config: dict, axes: Sequence[Axis], mode: str, start: int, stop: int, metrics: Sequence[str]
+) -> SweepResult:
+    n_points = stop - start
+    count("sweep_points", n_points)
+    axis_values = axis_columns(axes, mode, start, stop)
+    p, c = broadcast_columns(base_params, base_config, axis_values, n_points)
+    details = evolve(p, c).financial_details
+    return SweepResult({**axis_values, **{metric: details[metric] for metric in metrics}})
+
+
+def iter_sweep(
+    params: AnalysisParams,
+    axes: Sequence[Axis],
+    config: InvestmentConfig = InvestmentConfig(),
+    mode: str = "grid",
+    metrics: Sequence[str] = DEFAULT_METRICS,
+    chunk_size: int = 4096,
+    executor: str = "batch",
+    max_workers: Optional[int] = None,
+) -> Iterator[SweepResult]:
+    """Evaluate the sweep chunk by chunk, in grid order.
+
+    Every chunk goes through the vectorized batch engine, either in this process (`executor="batch"`)
+    or on a pool of `max_workers` processes (`executor="process"`). Working memory is bounded by
+    `chunk_size` times the number of chunks in flight, so grids with millions of points can be
+    streamed without ever holding them all.
+    """
+    if not axes:
+        raise ValueError("A sweep needs at least one axis")
+    names = [axis.name for axis in axes]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate sweep axes in {names}")
+    unknown = [metric for metric in metrics if metric not in DEFAULT_METRICS]
+    if unknown:
+        raise ValueError(f"Unknown sweep metrics {unknown}")
+    n_points = grid_size(axes, mode)
+    chunks = [(start, min(start + chunk_size, n_points)) for start in range(0, n_points, chunk_size)]
+    task = (asdict(params), asdict(config), list(axes), mode)
+
+    if executor == "batch":
+        for start, stop in chunks:
+            yield _evaluate_chunk(*task, start, stop, metrics)
+        return
+    if executor != "process":
+        raise ValueError(f"Unknown sweep executor '{executor}', expected 'batch' or 'process'")
+
+    # Imported here: concurrent.futures.process pulls in multiprocessing, which in-process sweeps and
+    # the service's worker processes never need
+    from concurrent.futures import ProcessPoolExecutor
+
+    def merged(future) -> SweepResult:
+        result, snapshot = future.result()
+        REGISTRY.merge(snapshot)
+        return result
+
+    max_in_flight = 2 * (max_workers or os.cpu_count() or 1)
+    initializer = enable if REGISTRY.enabled else None
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=initializer) as pool:
+        pending = deque()
+        for start, stop in chunks:
+            pending.append(pool.submit(collect, _evaluate_chunk, *task, start, stop, metrics))
+            # Keep a bounded window of chunks in flight and hand them back in grid order
+            if len(pending) >= max_in_flight:
+                yield merged(pending.popleft())
+        while pending:
+            yield merged(pending.popleft())
+
+
+def sweep(
+    params: AnalysisParams,
+    axes: Sequence[Axis],
+    config: InvestmentConfig = InvestmentConfig(),
+    mode: str = "grid",
+    metrics: Sequence[str] = DEFAULT_METRICS,
+    chunk_size: int = 4096,
+    executor: str = "batch",
+    max_workers: Optional[int] = None,
+) -> SweepResult:
+    """Evaluate `params` over a cartesian ("grid") or zipped ("zip") set of axes and return one table."""
+    return SweepResult.concatenate(
+        list(iter_sweep(params, axes, config, mode, metrics, chunk_size, executor, max_workers))
+    )
@@ -0,0 +1,28 @@
+from dataclasses import asdict
+from typing import List, Optional
+
+from batch import calculate_value_evolution_batch
+from breakeven import break_even
+from house_investment import AnalysisParams, InvestmentConfig, ValueEvolution
+from sweep import Axis, sweep
+
+# Executor tasks of the evaluation service. They live apart from service.py so that spawned worker
+# processes only import the model, not asyncio and the HTTP layer.
+
+
+def evaluate_batch(params: List[AnalysisParams], configs: List[InvestmentConfig]) -> List[ValueEvolution]:
+    results = calculate_value_evolution_batch(params, configs)
+    return [results.scenario(i) for i in range(len(params))]
+
+
+def sweep_columns(
+    params: AnalysisParams, config: InvestmentConfig, axes: List[Axis], mode: str, metrics: List[str]
+) -> dict:
+    result = sweep(params, axes, config, mode, metrics)
+    return {name: values.tolist() for name, values in result.columns.items()}
+
+
+def break_even_point(
+    params: AnalysisParams, config: InvestmentConfig, field: str, bracket, year: Optional[int]
+) -> dict:
+    return asdict(break_even(params, field, tuple(bracket), config, year))
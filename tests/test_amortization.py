@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+
+from amortization import MEMO_PAIR_LIMIT, amortization_schedule, prepayment_schedule, unit_schedule, year_end_balances
+
+LOANS = [(240_000, 0.02, 30), (150_000, 0.055, 20), (80_000, 0.0, 15), (300_000, 0.031, 12.5)]
+
+
+def monthly_loop(principal, annual_rate, term_years, prepayments=None, reduce_payment=False):
+    # The schedule written out one month at a time, the way a bank statement reads
+    rate, months = annual_rate / 12, int(np.ceil(term_years * 12))
+    balance = principal
+    payment = principal * rate / (1 - (1 + rate) ** -months) if rate else principal / months
+    balances, payments = [], []
+    for month in range(1, months + 1):
+        interest = balance * rate
+        principal_paid = balance if month == months else min(payment - interest, balance)
+        balance -= principal_paid
+        extra = min((prepayments or {}).get(month, 0), balance)
+        balance -= extra
+        if extra and reduce_payment and month < months:
+            remaining = months - month
+            payment = balance * rate / (1 - (1 + rate) ** -remaining) if rate else balance / remaining
+        balances.append(balance)
+        payments.append(interest + principal_paid)
+    return np.array(balances), np.array(payments)
+
+
+@pytest.mark.parametrize("principal, annual_rate, term_years", LOANS)
+def test_balances_match_a_monthly_loop(principal, annual_rate, term_years):
+    balances, payments = monthly_loop(principal, annual_rate, term_years)
+    schedule = amortization_schedule(principal, annual_rate, term_years)
+    np.testing.assert_allclose(schedule.balance[0], balances, rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(schedule.payment[0], payments, rtol=1e-9, atol=1e-6)
+
+    n_years = 40
+    expected = np.zeros(n_years)
+    year_ends = np.arange(12, len(balances) + 1, 12)
+    expected[: len(year_ends)] = balances[year_ends - 1]
+    for loan in ((principal, annual_rate, term_years), ([principal], [annual_rate], [term_years])):
+        np.testing.assert_allclose(year_end_balances(*loan, n_years)[0], expected, rtol=1e-9, atol=1e-6)
+
+
+def test_scalar_and_array_balances_are_identical():
+    for principal, annual_rate, term_years in LOANS:
+        scalar = year_end_balances(principal, annual_rate, term_years, 40)
+        batch = year_end_balances(np.array([principal, 1.0]), annual_rate, term_years, 40)
+        np.testing.assert_array_equal(scalar[0], batch[0])
+
+
+def test_loans_sharing_rate_and_term_share_one_unit_schedule():
+    unit_schedule.cache_clear()
+    principals = np.array([100_000, 200_000, 250_000])
+    schedule = amortization_schedule(principals, 0.03, 25)
+    assert unit_schedule.cache_info().misses == 1
+    unit = unit_schedule(0.03 / 12, 25.0)
+    assert unit_schedule.cache_info().hits == 1
+    np.testing.assert_array_equal(schedule.balance, principals[:, None] * unit.balance)
+    assert not unit.balance.flags.writeable
+
+
+@pytest.mark.parametrize("reduce_payment", [False, True])
+def test_prepayment_modes(reduce_payment):
+    prepayments = {12 * year: 10_000 for year in range(1, 31)}
+    schedule = amortization_schedule(240_000, 0.02, 30, prepayments, reduce_payment)
+    balances, payments = monthly_loop(240_000, 0.02, 30, prepayments, reduce_payment)
+    np.testing.assert_allclose(schedule.balance[0], balances, rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(schedule.payment[0], payments, rtol=1e-9, atol=1e-6)
+
+    regular = amortization_schedule(240_000, 0.02, 30).payment[0, 0]
+    paid_off = np.argmax(schedule.balance[0] == 0)
+    if reduce_payment:
+        # Lower payments every year; the prepayments still clear the last few years' balance
+        assert schedule.payment[0, 12] < schedule.payment[0, 11] == pytest.approx(regular)
+    else:
+        # Same payment, paid off years early
+        assert schedule.payment[0, 12] == pytest.approx(regular)
+        assert paid_off < 12 * 20
+    assert schedule.total_interest[0] < amortization_schedule(240_000, 0.02, 30).total_interest[0]
+
+    # The year-by-year loan the model steps takes exactly the same steps
+    stepped = prepayment_schedule(240_000, 0.02, 30, 10_000, reduce_payment, 30)
+    for name in ("balance", "payment", "prepayment", "interest"):
+        np.testing.assert_array_equal(getattr(stepped, name), getattr(schedule, name), err_msg=name)
+
+
+def test_per_loan_prepayments_and_modes():
+    principals, rates, terms = (np.array(column, dtype=float) for column in zip(*LOANS))
+    extra = np.zeros((len(LOANS), 360))
+    extra[0, 23], extra[1, 5], extra[1, 100], extra[3, 149] = 20_000, 5_000, 5_000, 1e9
+    reduce_payment = np.array([True, False, True, True])
+    schedule = amortization_schedule(principals, rates, terms, extra, reduce_payment)
+    for loan, (principal, annual_rate, term_years) in enumerate(LOANS):
+        prepayments = {month + 1: extra[loan, month] for month in np.flatnonzero(extra[loan])}
+        balances, payments = monthly_loop(principal, annual_rate, term_years, prepayments, reduce_payment[loan])
+        months = len(balances)
+        np.testing.assert_allclose(schedule.balance[loan, :months], balances, rtol=1e-9, atol=1e-6)
+        np.testing.assert_allclose(schedule.payment[loan, :months], payments, rtol=1e-9, atol=1e-6)
+        assert (schedule.balance[loan, months:] == 0).all()
+
+
+def test_many_distinct_loans_bypass_the_memo():
+    # Over MEMO_PAIR_LIMIT pairs the year ends are computed directly; they match the memoized tables
+    rng = np.random.default_rng(0)
+    n_loans = 2 * MEMO_PAIR_LIMIT
+    principals = rng.uniform(50_000, 500_000, n_loans)
+    rates = np.round(rng.uniform(0, 0.06, n_loans), 5)
+    rates[:3] = 0
+    terms = rng.choice([10, 12.5, 25, 30], n_loans)
+    balances = year_end_balances(principals, rates, terms, 40)
+    for loan in range(n_loans):
+        expected = year_end_balances(principals[loan], rates[loan], terms[loan], 40)[0]
+        np.testing.assert_allclose(balances[loan], expected, rtol=1e-9, atol=1e-6)
+        assert (balances[loan, int(terms[loan]) :] == 0).all()
@@ -0,0 +1,94 @@
+"""Cross-backend equivalence: every compute backend must reproduce the python reference."""
+
+import numpy as np
+import pytest
+
+from backends import loop_kernel, numba_available
+import batch
+from batch import (
+    NUMBA_MIN_BATCH,
+    PYTHON_MAX_BATCH,
+    batch_results,
+    config_to_arrays,
+    evolve,
+    params_to_arrays,
+    select_backend,
+)
+from house_investment import SERIES_NAMES, AnalysisParams, InvestmentConfig
+
+# The numpy kernel performs the scalar operations in the same order, so it must match exactly; the
+# compiled loop uses closed forms of its own for the loan and the mortgage balance
+TOLERANCES = {"numpy": 0.0, "numba": 1e-10, "loop": 1e-10}
+
+
+def _scenarios(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    params = [
+        AnalysisParams(
+            house_price=float(rng.uniform(100_000, 800_000)),
+            mortgage_interest=float(rng.choice([0.0, rng.uniform(0.005, 0.07)])),
+            mortgage_term=int(rng.choice([10, 15, 25, 30, 40])),
+            stock_market_return=float(rng.choice([0.0, rng.uniform(-0.02, 0.1)])),
+            initial_rent_price=float(rng.uniform(500, 2500)),
+            monthly_net_income=float(rng.uniform(1500, 8000)),
+            years_of_study=int(rng.integers(1, 80)),
+        )
+        for _ in range(n)
+    ]
+    configs = [
+        InvestmentConfig(
+            down_payment_percentage=float(rng.uniform(0.05, 0.5)),
+            annual_house_appreciation=float(rng.uniform(-0.02, 0.06)),
+            annual_rent_increase=float(rng.uniform(0.0, 0.05)),
+        )
+        for _ in range(n)
+    ]
+    p = params_to_arrays(params)
+    return p, config_to_arrays(configs, n)
+
+
+def _run(backend, p, c, closed_form):
+    if backend == "loop":
+        return batch_results(loop_kernel(p, c, closed_form), p["years_of_study"].astype(np.int64))
+    return evolve(p, c, closed_form, backend)
+
+
+@pytest.mark.parametrize("closed_form", [True, False])
+@pytest.mark.parametrize("backend", ["numpy", "loop", "numba"])
+def test_backend_matches_python_reference(backend, closed_form):
+    if backend == "numba" and not numba_available():
+        pytest.skip("numba is not installed")
+    p, c = _scenarios()
+    reference = evolve(p, c, closed_form, "python")
+    result = _run(backend, p, c, closed_form)
+    for index, name in enumerate(SERIES_NAMES):
+        np.testing.assert_allclose(result.data[index], reference.data[index], rtol=TOLERANCES[backend], err_msg=name)
+    for key, expected in reference.financial_details.items():
+        np.testing.assert_allclose(result.financial_details[key], expected, rtol=TOLERANCES[backend], err_msg=key)
+
+
+def test_auto_selection_by_batch_size():
+    assert select_backend(1) == "python"
+    assert select_backend(PYTHON_MAX_BATCH) == "python"
+    assert select_backend(PYTHON_MAX_BATCH + 1) == ("numba" if batch.numba_compiled() else "numpy")
+    assert select_backend(10, "numpy") == "numpy"
+    with pytest.raises(ValueError):
+        select_backend(10, "fortran")
+
+
+def test_auto_only_compiles_numba_for_large_batches(monkeypatch):
+    monkeypatch.setattr(batch, "numba_available", lambda: True)
+    monkeypatch.setattr(batch, "numba_compiled", lambda: False)
+    assert select_backend(PYTHON_MAX_BATCH + 1) == "numpy"
+    assert select_backend(NUMBA_MIN_BATCH - 1) == "numpy"
+    assert select_backend(NUMBA_MIN_BATCH) == "numba"
+    # Once compiled, every batch past the python threshold reuses it
+    monkeypatch.setattr(batch, "numba_compiled", lambda: True)
+    assert select_backend(PYTHON_MAX_BATCH + 1) == "numba"
+
+
+def test_numba_backend_requires_numba():
+    if numba_available():
+        pytest.skip("numba is installed")
+    with pytest.raises(ValueError, match="numba"):
+        select_backend(10, "numba")
@@ -0,0 +1,108 @@
+import io
+from dataclasses import asdict, replace
+
+import numpy as np
+import pytest
+
+from backtest import HistoricalMarket, MonthlySeries, backtest, main, read_series
+from batch import broadcast_columns, evolve_arrays
+from house_investment import HouseInvestment, InvestmentConfig
+from scenarios import BASE_PARAMS
+
+PARAMS = replace(BASE_PARAMS, mortgage_term=25, years_of_study=20)
+N_MONTHS = 12 * 50
+
+
+def random_market(seed: int = 0) -> HistoricalMarket:
+    rng = np.random.default_rng(seed)
+    dates = np.datetime64("1950-01", "M") + np.arange(N_MONTHS + 1)
+
+    def levels(mean, sd):
+        return 100 * np.concatenate(([1.0], np.cumprod(1 + rng.normal(mean, sd, N_MONTHS))))
+
+    return HistoricalMarket(
+        MonthlySeries(dates, levels(0.007, 0.045)),
+        MonthlySeries(dates, levels(0.003, 0.01)),
+        MonthlySeries(dates, levels(0.0025, 0.003)),
+    )
+
+
+@pytest.mark.parametrize("prepayment", [0, 15_000])
+def test_matches_monthly_simulation_of_every_window(prepayment):
+    params = replace(PARAMS, annual_prepayment=prepayment)
+    market = random_market()
+    result = backtest(params, market)
+    n_windows = N_MONTHS - 12 * params.years_of_study + 1
+    assert len(result.start_dates) == n_windows
+    assert result.start_dates[-1] == market.dates[-1] - 12 * params.years_of_study
+
+    columns = broadcast_columns(asdict(params), asdict(InvestmentConfig()), {}, n_windows)
+    expected = evolve_arrays(*columns, market=market.window_path(params.years_of_study))
+    np.testing.assert_allclose(result.results.data, expected.data, rtol=1e-9, atol=1e-6)
+
+
+def test_constant_history_reproduces_the_deterministic_model():
+    config = InvestmentConfig()
+    months = np.arange(N_MONTHS + 1)
+    dates = np.datetime64("2000-01", "M") + months
+    market = HistoricalMarket(
+        MonthlySeries(dates, (1 + PARAMS.stock_market_return / 12) ** months),
+        MonthlySeries(dates, (1 + config.annual_house_appreciation) ** (months // 12)),
+        MonthlySeries(dates, (1 + config.annual_rent_increase) ** (months // 12)),
+    )
+    result = backtest(PARAMS, market, config)
+    expected = HouseInvestment(PARAMS, config).calculate_value_evolution(closed_form=False).data
+    for window in (0, len(result.start_dates) // 2, len(result.start_dates) - 1):
+        np.testing.assert_allclose(result.results.data[:, window], expected, rtol=1e-9, atol=1e-6)
+
+
+def test_distribution_by_start_date():
+    result = backtest(PARAMS, random_market())
+    records = result.by_start_date()
+    np.testing.assert_array_equal(records["start"], result.start_dates)
+    np.testing.assert_allclose(records["difference"], result.difference[:, -1])
+    bands = result.percentiles((5, 50, 95))
+    assert bands.shape == (3, PARAMS.years_of_study)
+    assert (np.diff(bands, axis=0) >= 0).all()
+    assert result.probability_buy_wins[-1] == np.mean(records["difference"] > 0)
+
+
+def test_read_series_levels_and_returns():
+    levels = read_series(io.StringIO("date,close\n2000-03-31,121\n2000-01-31,100\n2000-02-29,110\n"))
+    np.testing.assert_array_equal(levels.dates, np.array(["2000-01", "2000-02", "2000-03"], dtype="datetime64[M]"))
+    np.testing.assert_array_equal(levels.levels, [100, 110, 121])
+
+    returns = read_series(io.StringIO("date,ret\n2000-02,0.1\n2000-03,0.1\n"), kind="return")
+    np.testing.assert_array_equal(returns.dates, levels.dates)
+    np.testing.assert_allclose(returns.levels, [1, 1.1, 1.21])
+
+    with pytest.raises(ValueError, match="consecutive"):
+        read_series(io.StringIO("date,value\n2000-01,1\n2000-03,1\n"))
+    with pytest.raises(ValueError, match="line 3"):
+        read_series(io.StringIO("date,value\n2000-01,1\n2000-02,n/a\n"))
+
+
+def test_market_keeps_common_months_and_needs_a_full_window():
+    market = random_market()
+    shifted = HistoricalMarket(market.stock.between("1960-01", "1999-12"), market.house, market.rent)
+    assert shifted.dates[0] == np.datetime64("1960-01") and shifted.dates[-1] == np.datetime64("1999-12")
+    assert len(shifted.house.levels) == len(shifted.rent.levels) == len(shifted.dates)
+    with pytest.raises(ValueError, match="cannot hold"):
+        backtest(replace(PARAMS, years_of_study=50), shifted)
+
+
+def test_command_line(tmp_path, capsys):
+    market = random_market()
+    paths = []
+    for name, series in (("stock", market.stock), ("house", market.house), ("rent", market.rent)):
+        path = tmp_path / f"{name}.csv"
+        rows = [f"{date},{float(level)!r}" for date, level in zip(series.dates, series.levels)]
+        path.write_text("\n".join(["date,value", *rows]) + "\n")
+        paths.append(str(path))
+    main([*paths, "--years", "20", "--mortgage-term", "25", "--mortgage-interest", "0.02"])
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == "start,buy,rent,difference"
+    records = backtest(PARAMS, market).by_start_date()
+    assert len(lines) == len(records) + 1
+    start, buy, *_ = lines[1].split(",")
+    assert start == "1950-01" and float(buy) == pytest.approx(records["buy"][0], rel=1e-12)
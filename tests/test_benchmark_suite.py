@@ -0,0 +1,27 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import suite  # noqa: E402
+
+
+def test_compare_flags_only_regressions_past_threshold():
+    baseline = {"fast": 1.0, "slow": 1.0, "new_elsewhere": 2.0}
+    regressions = suite.compare(
+        {"fast": 0.5, "slow": 1.3, "within": 1.0, "edge": 1.25}, {**baseline, "edge": 1.0}, 0.25
+    )
+    assert len(regressions) == 1 and regressions[0].startswith("slow: +30%")
+
+
+def test_latest_baseline_prefers_the_same_machine():
+    runs = [{"machine": "a", "results": {"x": 1}}, {"machine": "b", "results": {"x": 2}}]
+    assert suite.latest_baseline({"runs": runs}, "a")["results"] == {"x": 1}
+    assert suite.latest_baseline({"runs": runs}, "c")["results"] == {"x": 2}
+    assert suite.latest_baseline({"runs": []}, "a") is None
+
+
+def test_stored_baselines_cover_every_benchmark():
+    baselines = suite.load_baselines()
+    assert baselines["runs"], "benchmarks/baselines.json has no recorded run"
+    assert set(baselines["runs"][-1]["results"]) == {benchmark.name for benchmark in suite.BENCHMARKS}
@@ -0,0 +1,84 @@
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from breakeven import break_even, break_even_frontier
+from house_investment import HouseInvestment
+from scenarios import BASE_PARAMS
+from sweep import Axis, sweep
+
+PARAMS = replace(BASE_PARAMS, years_of_study=25)
+
+
+def gap(params, year=None) -> float:
+    evolution = HouseInvestment(params).calculate_value_evolution()
+    if year is None:
+        details = evolution.financial_details
+        return details["house_scenario_net_worth"] - details["rent_scenario_net_worth"]
+    return evolution.combined_values[year - 1] - evolution.rent_stock_values[year - 1]
+
+
+@pytest.mark.parametrize(
+    "field, bracket",
+    [("house_price", (100_000, 1_000_000)), ("stock_market_return", (0.0, 0.15)), ("mortgage_interest", (0.0, 0.1))],
+)
+def test_root_matches_a_brute_force_sign_change(field, bracket):
+    values = np.linspace(*bracket, 501)
+    table = sweep(PARAMS, [Axis(field, values)], metrics=["house_scenario_net_worth", "rent_scenario_net_worth"])
+    differences = table.columns["house_scenario_net_worth"] - table.columns["rent_scenario_net_worth"]
+    (change,) = np.flatnonzero(np.sign(differences[:-1]) != np.sign(differences[1:]))
+
+    result = break_even(PARAMS, field, bracket)
+    assert result.field == field
+    assert values[change] <= result.value <= values[change + 1]
+    assert abs(result.gap) <= 1e-6
+    assert abs(gap(replace(PARAMS, **{field: result.value}))) <= 1e-5
+
+
+def test_year_moves_the_break_even():
+    final = break_even(PARAMS, "stock_market_return", (0.0, 0.15))
+    early = break_even(PARAMS, "stock_market_return", (0.0, 0.15), year=5)
+    assert early.value != pytest.approx(final.value, rel=1e-3)
+    assert abs(gap(replace(PARAMS, stock_market_return=early.value), year=5)) <= 1e-5
+    # The last year is the end of the horizon
+    last = break_even(PARAMS, "stock_market_return", (0.0, 0.15), year=PARAMS.years_of_study)
+    assert last.value == pytest.approx(final.value, rel=1e-9)
+
+
+def test_invalid_searches():
+    with pytest.raises(ValueError, match="No break-even"):
+        break_even(PARAMS, "stock_market_return", (0.0, 0.01))
+    with pytest.raises(ValueError, match="did not converge"):
+        break_even(PARAMS, "stock_market_return", (0.0, 0.15), ftol=0, xtol=0, max_iterations=2)
+    with pytest.raises(ValueError, match="Unknown field"):
+        break_even(PARAMS, "colour", (0, 1))
+    with pytest.raises(ValueError, match="cannot be solved for"):
+        break_even(PARAMS, "years_of_study", (1, 30))
+    with pytest.raises(ValueError, match="Invalid bracket"):
+        break_even(PARAMS, "house_price", (1e6, 1e5))
+    with pytest.raises(ValueError, match="year must be between"):
+        break_even(PARAMS, "house_price", (1e5, 1e6), year=PARAMS.years_of_study + 1)
+
+
+def test_frontier_marks_points_without_a_root():
+    # At a 30% stock return renting wins for every mortgage rate in the bracket
+    axes = [Axis("stock_market_return", [0.04, 0.06, 0.3]), Axis("house_price", [250_000, 400_000])]
+    frontier = break_even_frontier(PARAMS, "mortgage_interest", (0.0, 0.1), axes)
+    columns = frontier.columns
+    assert len(columns["converged"]) == 6
+    for stock_return, price, rate, converged in zip(
+        columns["stock_market_return"], columns["house_price"], columns["mortgage_interest"], columns["converged"]
+    ):
+        params = replace(PARAMS, stock_market_return=stock_return, house_price=price)
+        try:
+            expected = break_even(params, "mortgage_interest", (0.0, 0.1)).value
+        except ValueError:
+            assert np.isnan(rate) and converged == 0
+        else:
+            assert rate == pytest.approx(expected, rel=1e-9) and converged == 1
+    assert np.isnan(columns["mortgage_interest"][columns["stock_market_return"] == 0.3]).all()
+    assert columns["converged"].tolist() == [1, 1, 1, 0, 0, 0]
+
+    with pytest.raises(ValueError, match="both the solved field and a frontier axis"):
+        break_even_frontier(PARAMS, "house_price", (1e5, 1e6), axes)
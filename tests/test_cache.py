@@ -0,0 +1,96 @@
+import os
+import pickle
+from dataclasses import replace
+
+import numpy as np
+
+import cache
+from cache import ResultCache, canonical_key
+from house_investment import HouseInvestment
+from scenarios import BASE_PARAMS
+
+
+def blob_size(value) -> int:
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def test_keys_normalize_numbers():
+    assert canonical_key(BASE_PARAMS) == canonical_key(replace(BASE_PARAMS, mortgage_term=30.0))
+    assert canonical_key(BASE_PARAMS) != canonical_key(BASE_PARAMS, closed_form=False)
+    assert canonical_key(BASE_PARAMS) != canonical_key(replace(BASE_PARAMS, house_price=300_001))
+
+
+def test_memory_tier_evicts_least_recently_used_entries():
+    results = ResultCache(max_entries=2)
+    results.put("a", 1)
+    results.put("b", 2)
+    assert results.get("a") == 1
+    results.put("c", 3)
+    assert results.get("b") is None
+    assert (results.get("a"), results.get("c")) == (1, 3)
+    assert (results.stats.evictions, results.stats.entries) == (1, 2)
+
+
+def test_memory_tier_evicts_by_size():
+    value = np.zeros(1_000)
+    results = ResultCache(max_bytes=2 * blob_size(value) + 100)
+    for key in "abc":
+        results.put(key, value)
+    assert results.get("a") is None and results.get("c") is not None
+    assert results.stats.bytes == 2 * blob_size(value)
+
+    # Larger than the whole tier: never kept
+    results.put("big", np.zeros(10_000))
+    assert results.get("big") is None and results.stats.entries == 2
+
+
+def test_entries_are_copies():
+    value = {"data": np.arange(3.0)}
+    results = ResultCache()
+    results.put("key", value)
+    value["data"][0] = -1
+    hit = results.get("key")
+    hit["data"][1] = -1
+    np.testing.assert_array_equal(results.get("key")["data"], [0, 1, 2])
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    params = replace(BASE_PARAMS, years_of_study=10)
+    first = ResultCache(directory=str(tmp_path))
+    expected = first.calculate_value_evolution(params)
+    assert first.stats.misses == 1
+
+    restarted = ResultCache(directory=str(tmp_path))
+    result = restarted.calculate_value_evolution(params)
+    np.testing.assert_array_equal(result.data, expected.data)
+    np.testing.assert_array_equal(result.data, HouseInvestment(params).calculate_value_evolution().data)
+    assert (restarted.stats.hits, restarted.stats.disk_hits, restarted.stats.misses) == (1, 1, 0)
+    # Now from memory
+    restarted.calculate_value_evolution(params)
+    assert (restarted.stats.hits, restarted.stats.disk_hits) == (2, 1)
+
+
+def test_new_model_version_drops_old_entries(tmp_path, monkeypatch):
+    old = ResultCache(directory=str(tmp_path))
+    old.put(canonical_key(BASE_PARAMS), "old result")
+    (tmp_path / "unversioned.pkl").write_bytes(b"")
+    (tmp_path / "notes.txt").write_text("kept")
+
+    monkeypatch.setattr(cache, "MODEL_VERSION", cache.MODEL_VERSION + 1)
+    new = ResultCache(directory=str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == ["notes.txt"]
+    assert new.get(canonical_key(BASE_PARAMS)) is None
+
+
+def test_disk_tier_evicts_least_recently_used_files(tmp_path):
+    value = np.zeros(1_000)
+    size = blob_size(value)
+    results = ResultCache(max_entries=1, directory=str(tmp_path), max_disk_bytes=4 * size)
+    for age, key in enumerate("abcd"):
+        results.put(key, value)
+        os.utime(results._path(key), (age, age))
+    assert results.get("a") is not None  # From disk, which makes it the most recently used file
+    results.put("e", value)
+    # Over the cap: evicted down to three quarters of it, oldest first
+    assert sorted(name[-5] for name in os.listdir(tmp_path)) == ["a", "d", "e"]
+    assert results.stats.disk_evictions == 2
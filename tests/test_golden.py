@@ -0,0 +1,122 @@
+"""Golden financial_details: every evaluation path must reproduce the stored outputs.
+
+Regenerate after an intended model change (and a MODEL_VERSION bump) with:  PYTHONPATH=. python tests/test_golden.py
+"""
+
+import json
+import os
+from dataclasses import asdict
+
+import numpy as np
+import pytest
+
+from batch import CONFIG_FIELDS, PARAM_FIELDS, calculate_value_evolution_batch
+from house_investment import MODEL_VERSION, AnalysisParams, HouseInvestment, InvestmentConfig
+from scenarios import BASE_PARAMS
+from stream import evaluate_chunk
+from sweep import DEFAULT_METRICS, Axis, sweep
+
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden", "financial_details.json")
+RTOL = 1e-9
+ATOL = 1e-6
+
+BASE = asdict(BASE_PARAMS)
+SCENARIOS = {
+    "base": (BASE, {}),
+    "short_horizon": ({**BASE, "years_of_study": 10}, {}),
+    "long_horizon": ({**BASE, "years_of_study": 60}, {}),
+    "zero_mortgage_interest": ({**BASE, "mortgage_interest": 0.0}, {}),
+    "zero_stock_return": ({**BASE, "stock_market_return": 0.0}, {}),
+    "expensive_loan": ({**BASE, "house_price": 180000, "mortgage_interest": 0.055, "mortgage_term": 20}, {}),
+    "short_term_mortgage": ({**BASE, "mortgage_term": 15, "years_of_study": 20}, {}),
+    "custom_config": (
+        {**BASE, "initial_rent_price": 1500, "monthly_net_income": 4000},
+        {"down_payment_percentage": 0.3, "annual_house_appreciation": 0.04, "annual_rent_increase": 0.03},
+    ),
+}
+
+
+def _scenario(name):
+    params, config = SCENARIOS[name]
+    return AnalysisParams(**params), InvestmentConfig(**config)
+
+
+def _load():
+    with open(GOLDEN) as file:
+        return json.load(file)
+
+
+def _assert_matches(details, expected):
+    assert set(details) == set(expected)
+    for key, value in expected.items():
+        np.testing.assert_allclose(float(details[key]), value, rtol=RTOL, atol=ATOL, err_msg=key)
+
+
+@pytest.fixture(scope="module")
+def golden():
+    data = _load()
+    assert data["model_version"] == MODEL_VERSION, "The model changed, regenerate the golden file"
+    return data["scenarios"]
+
+
+@pytest.mark.parametrize("name", SCENARIOS)
+@pytest.mark.parametrize("closed_form", [True, False])
+def test_scalar(golden, name, closed_form):
+    params, config = _scenario(name)
+    evolution = HouseInvestment(params, config).calculate_value_evolution(closed_form=closed_form)
+    _assert_matches(evolution.financial_details, golden[name])
+
+
+@pytest.mark.parametrize("name", SCENARIOS)
+def test_reevaluate(golden, name):
+    params, config = _scenario(name)
+    analysis = HouseInvestment(params, config)
+    evaluation = analysis.evaluate()
+    _assert_matches(evaluation.results.financial_details, golden[name])
+    changed = AnalysisParams(**{**asdict(params), "stock_market_return": params.stock_market_return + 0.01})
+    back = analysis.reevaluate(analysis.reevaluate(evaluation, changed, from_year=1), params, from_year=1)
+    _assert_matches(back.results.financial_details, golden[name])
+
+
+def test_batch(golden):
+    scenarios = [_scenario(name) for name in SCENARIOS]
+    results = calculate_value_evolution_batch([params for params, _ in scenarios], [config for _, config in scenarios])
+    for index, name in enumerate(SCENARIOS):
+        _assert_matches(results.scenario(index).financial_details, golden[name])
+
+
+def test_stream_chunk(golden):
+    scenarios = [_scenario(name) for name in SCENARIOS]
+    columns = {
+        **{name: np.array([getattr(p, name) for p, _ in scenarios], dtype=np.float64) for name in PARAM_FIELDS},
+        **{name: np.array([getattr(c, name) for _, c in scenarios], dtype=np.float64) for name in CONFIG_FIELDS},
+    }
+    output = evaluate_chunk(columns, {"name": list(SCENARIOS)})
+    for index, name in enumerate(output["name"]):
+        expected = {metric: golden[name][metric] for metric in DEFAULT_METRICS}
+        _assert_matches({metric: output[metric][index] for metric in DEFAULT_METRICS}, expected)
+
+
+def test_sweep(golden):
+    # Zipped axes over every parameter field reproduce each default-config scenario
+    names = [name for name, (_, config) in SCENARIOS.items() if not config]
+    axes = [Axis(field, [getattr(_scenario(name)[0], field) for name in names]) for field in PARAM_FIELDS]
+    result = sweep(_scenario("base")[0], axes, mode="zip", chunk_size=3)
+    for index, name in enumerate(names):
+        expected = {metric: golden[name][metric] for metric in DEFAULT_METRICS}
+        _assert_matches({metric: result.columns[metric][index] for metric in DEFAULT_METRICS}, expected)
+
+
+def regenerate():
+    scenarios = {}
+    for name in SCENARIOS:
+        params, config = _scenario(name)
+        details = HouseInvestment(params, config).calculate_value_evolution().financial_details
+        scenarios[name] = {key: float(value) for key, value in details.items()}
+    with open(GOLDEN, "w") as file:
+        json.dump({"model_version": MODEL_VERSION, "scenarios": scenarios}, file, indent=2, sort_keys=True)
+        file.write("\n")
+
+
+if __name__ == "__main__":
+    regenerate()
@@ -0,0 +1,121 @@
+import csv
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from amortization import prepayment_schedule
+from batch import calculate_value_evolution_batch
+from house_investment import SERIES_NAMES, HouseInvestment
+from instrumentation import instrumented
+from scenarios import BASE_PARAMS
+
+
+def test_params_override_the_instance_loan():
+    # Every field, the mortgage rate included, comes from the params being evaluated
+    changed = replace(BASE_PARAMS, mortgage_interest=0.05)
+    expected = HouseInvestment(changed).calculate_value_evolution()
+    analysis = HouseInvestment(BASE_PARAMS)
+
+    for results in (
+        analysis.calculate_value_evolution(params=changed),
+        analysis.evaluate(changed).results,
+        analysis.reevaluate(analysis.evaluate(), changed).results,
+    ):
+        np.testing.assert_array_equal(results.data, expected.data)
+        assert results.financial_details == expected.financial_details
+
+
+def test_prepayments_reach_the_results():
+    scenarios = [
+        replace(BASE_PARAMS, annual_prepayment=amount, prepayment_reduces_payment=reduce)
+        for amount in (5_000, 20_000)
+        for reduce in (False, True)
+    ]
+    base = HouseInvestment(BASE_PARAMS).calculate_value_evolution()
+    # Scenarios without prepayments stay on the closed form, so mixing them in changes nothing
+    batch = calculate_value_evolution_batch([BASE_PARAMS, *scenarios, BASE_PARAMS], backend="numpy")
+    for index, params in enumerate(scenarios, 1):
+        results = HouseInvestment(params).calculate_value_evolution()
+        schedule = prepayment_schedule(
+            240_000, 0.02, 30, params.annual_prepayment, params.prepayment_reduces_payment, 40
+        )
+        np.testing.assert_array_equal(results.mortgage_balances, schedule.balance[0, 11::12])
+        # Repaying a 2% loan early out of a portfolio earning 6% leaves the buyer worse off
+        assert (
+            results.financial_details["house_scenario_net_worth"] < base.financial_details["house_scenario_net_worth"]
+        )
+        np.testing.assert_allclose(batch.scenario(index).data, results.data, rtol=1e-12, atol=1e-6)
+    np.testing.assert_array_equal(batch.scenario(0).data, base.data)
+    np.testing.assert_array_equal(batch.scenario(len(scenarios) + 1).data, base.data)
+
+    with pytest.raises(ValueError, match="prepayments"):
+        calculate_value_evolution_batch(scenarios, backend="numba")
+
+
+def test_value_evolution_behaves_like_the_legacy_tuple():
+    results = HouseInvestment(BASE_PARAMS).calculate_value_evolution()
+    assert len(results) == 9
+    (
+        house_values,
+        house_stock_values,
+        combined_values,
+        rent_stock_values,
+        house_savings,
+        rent_savings,
+        house_expenses,
+        rent_expenses,
+        financial_details,
+    ) = results
+    np.testing.assert_array_equal(house_values, results.house_values)
+    np.testing.assert_array_equal(rent_expenses, results.rent_expenses)
+    assert financial_details is results.financial_details
+    assert results[2][-1] == results.combined_values[-1] == combined_values[-1]
+    assert results[-1] is results.financial_details
+
+    legacy = results.as_tuple()
+    assert len(legacy) == 9
+    assert all(type(series) is list and len(series) == BASE_PARAMS.years_of_study for series in legacy[:8])
+    assert all(type(value) is float for series in legacy[:8] for value in series)
+    assert type(legacy[8]) is dict and legacy[8] == results.financial_details
+    # A copy: changing it leaves the results alone
+    legacy[0][0] = -1.0
+    legacy[8].clear()
+    assert results.house_values[0] != -1.0 and results.financial_details
+
+
+def test_value_evolution_exports(tmp_path):
+    results = HouseInvestment(BASE_PARAMS).calculate_value_evolution()
+    records = results.to_records()
+    assert records.dtype.names == ("year", *SERIES_NAMES)
+    np.testing.assert_array_equal(records["year"], np.arange(1, BASE_PARAMS.years_of_study + 1))
+    for name in SERIES_NAMES:
+        np.testing.assert_array_equal(records[name], getattr(results, name))
+
+    results.to_csv(tmp_path / "evolution.csv")
+    with open(tmp_path / "evolution.csv", newline="") as file:
+        rows = list(csv.DictReader(file))
+    assert list(rows[0]) == ["year", *SERIES_NAMES]
+    assert [int(row["year"]) for row in rows] == records["year"].tolist()
+    for name in SERIES_NAMES:
+        # %.17g round-trips every float exactly
+        assert [float(row[name]) for row in rows] == records[name].tolist()
+
+
+@pytest.mark.parametrize("years_of_study", [55, 25])
+def test_reevaluate_a_new_horizon(years_of_study):
+    # Only years_of_study changes, so from_year is inferred and just the extra years are simulated
+    analysis = HouseInvestment(BASE_PARAMS)
+    previous = analysis.evaluate()
+    changed = replace(BASE_PARAMS, years_of_study=years_of_study)
+    with instrumented() as metrics:
+        evaluation = analysis.reevaluate(previous, changed)
+    expected = HouseInvestment(changed).evaluate()
+
+    np.testing.assert_array_equal(evaluation.results.data, expected.results.data)
+    assert evaluation.results.financial_details == expected.results.financial_details
+    assert evaluation.params == changed
+    assert len(evaluation.states) == years_of_study + 1
+    assert evaluation.states == expected.states
+    simulated = 12 * max(years_of_study - BASE_PARAMS.years_of_study, 0)
+    assert metrics.snapshot()["counters"].get("months_simulated", 0) == simulated
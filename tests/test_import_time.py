@@ -0,0 +1,43 @@
+"""Import-time budget: modules import quickly and leave their heavy optional dependencies unloaded."""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Only loaded by the functions that need them (plotting, Parquet output, the numba backend)
+OPTIONAL = ("matplotlib", "numpy_financial", "numba", "pyarrow", "scipy")
+# Nor do the model and the service's worker tasks need the event loop or a process pool
+SERVER_ONLY = ("asyncio", "multiprocessing")
+# Cumulative import time on top of numpy, in milliseconds; about three times a typical measurement
+BUDGETS_MS = {"house_investment": 100, "batch": 130, "tasks": 150}
+
+
+def _import(module: str):
+    # Fresh interpreter with numpy already loaded: (cumulative import time of `module` in ms, modules loaded)
+    code = f"import sys, numpy; import {module}; print(' '.join(sys.modules))"
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    for line in process.stderr.splitlines():
+        if line.endswith(f"| {module}"):
+            return int(line.split("|")[1]) / 1000, set(process.stdout.split())
+    raise AssertionError(f"No import time reported for {module}")
+
+
+@pytest.mark.parametrize(
+    "module", ["house_investment", "batch", "sweep", "tasks", "stream", "report", "main", "service"]
+)
+def test_optional_dependencies_are_lazy(module):
+    _, loaded = _import(module)
+    assert not loaded & set(OPTIONAL)
+    if module in ("house_investment", "batch", "sweep", "tasks"):
+        assert not loaded & set(SERVER_ONLY)
+
+
+@pytest.mark.parametrize("module", BUDGETS_MS)
+def test_import_time_budget(module):
+    best = min(_import(module)[0] for _ in range(3))
+    assert best <= BUDGETS_MS[module], f"import {module} took {best:.1f} ms, budget {BUDGETS_MS[module]} ms"
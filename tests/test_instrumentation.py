@@ -0,0 +1,179 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, replace
+
+import pytest
+
+import instrumentation
+from house_investment import HouseInvestment
+from instrumentation import REGISTRY, Registry, collect, count, instrumented, observe, timed
+from scenarios import BASE_PARAMS
+from service import EvaluationService, InProcessClient, process_pool
+from sweep import Axis, sweep
+
+
+@timed()
+def _traced():
+    return 42
+
+
+@timed("named")
+def _named(value):
+    return value
+
+
+def test_hooks_do_nothing_while_disabled():
+    with instrumented():
+        pass
+    assert not REGISTRY.enabled
+    count("calls")
+    observe("size", 3)
+    assert _traced() == 42
+    with instrumented(reset=False) as metrics:
+        assert metrics.snapshot() == {"counters": {}, "summaries": {}, "timers": {}}
+
+
+def test_counters_summaries_and_timers():
+    with instrumented() as metrics:
+        count("calls")
+        count("calls", 2)
+        for size in (4, 1, 7):
+            observe("size", size)
+        assert _traced() == 42
+        assert _named("x") == "x"
+        assert _named("y") == "y"
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"] == {"calls": 3}
+    assert snapshot["summaries"]["size"] == {"count": 3, "total": 12, "min": 1, "max": 7}
+    assert snapshot["timers"]["_traced"]["count"] == 1
+    assert snapshot["timers"]["named"]["count"] == 2
+    assert 0 <= snapshot["timers"]["named"]["min"] <= snapshot["timers"]["named"]["max"]
+
+    # A fresh block starts from zero, and enabling is undone on exit
+    with instrumented() as metrics:
+        count("other")
+    assert metrics.snapshot()["counters"] == {"other": 1}
+    assert not REGISTRY.enabled
+
+
+def test_model_phases_and_counts():
+    params = replace(BASE_PARAMS, years_of_study=10)
+    with instrumented() as metrics:
+        HouseInvestment(params).calculate_value_evolution(closed_form=False)
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"] == {"scenarios_evaluated": 1, "months_simulated": 120}
+    assert {"simulate", "finish"} <= set(snapshot["timers"])
+
+
+def test_exports():
+    with instrumented() as metrics:
+        count("calls", 3)
+        observe("size", 2.5)
+        metrics.record_time("phase", 0.25)
+    assert json.loads(metrics.to_json()) == metrics.snapshot()
+    assert metrics.to_prometheus().splitlines() == [
+        "# TYPE buy_vs_rent_calls_total counter",
+        "buy_vs_rent_calls_total 3",
+        "# TYPE buy_vs_rent_size summary",
+        "buy_vs_rent_size_count 1",
+        "buy_vs_rent_size_sum 2.5",
+        "# TYPE buy_vs_rent_size_max gauge",
+        "buy_vs_rent_size_max 2.5",
+        "# TYPE buy_vs_rent_phase_seconds summary",
+        "buy_vs_rent_phase_seconds_count 1",
+        "buy_vs_rent_phase_seconds_sum 0.25",
+        "# TYPE buy_vs_rent_phase_seconds_max gauge",
+        "buy_vs_rent_phase_seconds_max 0.25",
+    ]
+
+
+def test_merge_adds_worker_snapshots():
+    worker = Registry()
+    worker.count("calls", 2)
+    worker.observe("size", 10)
+    with instrumented() as metrics:
+        count("calls")
+        observe("size", 1)
+        metrics.merge(worker.drain())
+    assert worker.snapshot() == {"counters": {}, "summaries": {}, "timers": {}}
+    assert metrics.snapshot()["counters"] == {"calls": 3}
+    assert metrics.snapshot()["summaries"]["size"] == {"count": 2, "total": 11, "min": 1, "max": 10}
+
+    # Collected in this process, the drained metrics go straight back
+    with instrumented() as metrics:
+        count("calls")
+        result, snapshot = collect(_named, "x")
+        metrics.merge(snapshot)
+    assert result == "x"
+    assert metrics.snapshot()["counters"] == {"calls": 1}
+    assert metrics.snapshot()["timers"]["named"]["count"] == 1
+
+
+def test_process_sweeps_collect_worker_metrics():
+    axes = [Axis("house_price", [200_000, 300_000, 400_000])]
+    with instrumented() as metrics:
+        sweep(replace(BASE_PARAMS, years_of_study=5), axes, chunk_size=2, executor="process", max_workers=1)
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"]["sweep_points"] == 3
+    assert snapshot["timers"]["sweep_chunk"]["count"] == 2
+
+
+def _service_metrics(executor):
+    async def run():
+        service = EvaluationService(executor, batch_window=0.001)
+        client = InProcessClient(service)
+        body = {"params": asdict(BASE_PARAMS)}
+        assert (await client.post("/evaluate", body))[0] == 200
+        assert (await client.post("/break-even", {**body, "field": "house_price", "bracket": [1e5, 2e6]}))[0] == 200
+        _, snapshot = await client.get("/metrics")
+        status, text = await client.get("/metrics/prometheus")
+        assert status == 200 and text == REGISTRY.to_prometheus()
+        return snapshot
+
+    with instrumented():
+        return asyncio.run(run())
+
+
+@pytest.mark.parametrize("pool", ["thread", "process"])
+def test_service_serves_worker_metrics(pool):
+    if pool == "thread":
+        executor = ThreadPoolExecutor(1)
+    else:
+        executor = process_pool(1, metrics=True)
+    with executor:
+        snapshot = _service_metrics(executor)
+    assert snapshot["summaries"]["service_batch_size"]["count"] == 1
+    # Counted in the worker: the evaluation, and the break-even search's scenarios
+    assert snapshot["counters"]["scenarios_evaluated"] > 1
+    assert snapshot["timers"]["simulate"]["count"] == snapshot["counters"]["scenarios_evaluated"]
+
+
+def test_service_metrics_switch():
+    try:
+        service = EvaluationService(ThreadPoolExecutor(1), metrics=True)
+        assert REGISTRY.enabled
+        service.executor.shutdown()
+    finally:
+        instrumentation.disable()
+        REGISTRY.reset()
+
+
+def test_prometheus_metrics_are_served_as_text():
+    async def fetch():
+        service = EvaluationService(ThreadPoolExecutor(1))
+        server = await service.serve(port=0)
+        async with server:
+            reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+            writer.write(b"GET /metrics/prometheus HTTP/1.1\r\nConnection: close\r\n\r\n")
+            response = await reader.read()
+            writer.close()
+        service.executor.shutdown()
+        return response.decode()
+
+    with instrumented():
+        count("calls")
+        response = asyncio.run(fetch())
+    head, body = response.split("\r\n\r\n", 1)
+    assert "Content-Type: text/plain; version=0.0.4; charset=utf-8" in head.split("\r\n")
+    assert body == "# TYPE buy_vs_rent_calls_total counter\nbuy_vs_rent_calls_total 1\n"
@@ -0,0 +1,61 @@
+from dataclasses import replace
+
+import numpy as np
+
+from house_investment import HouseInvestment, InvestmentConfig
+from monte_carlo import BootstrapMarket, ParametricMarket, QuantileSketch, simulate
+from scenarios import BASE_PARAMS
+
+PARAMS = replace(BASE_PARAMS, years_of_study=15)
+PERCENTILES = (0, 5, 25, 50, 75, 95, 100)
+
+
+def test_same_seed_reproduces_the_result():
+    market = ParametricMarket.from_params(PARAMS, correlation=[[1, 0.3, 0.2], [0.3, 1, 0.5], [0.2, 0.5, 1]])
+    first, second = (simulate(PARAMS, market, n_paths=3_000, seed=7, chunk_size=700) for _ in range(2))
+    for name, value in vars(first).items():
+        np.testing.assert_array_equal(value, getattr(second, name), err_msg=name)
+    other = simulate(PARAMS, market, n_paths=3_000, seed=8, chunk_size=700)
+    assert not np.array_equal(first.final_buy, other.final_buy)
+
+
+def test_zero_volatility_reproduces_the_deterministic_model():
+    # Normal returns, whose zero-volatility monthly return is the model's mean / 12
+    config = InvestmentConfig()
+    market = ParametricMarket.from_params(PARAMS, config, 0, 0, 0)
+    result = simulate(PARAMS, market, config, n_paths=500, seed=1, chunk_size=200)
+    expected = HouseInvestment(PARAMS, config).calculate_value_evolution(closed_form=False)
+    difference = expected.combined_values - expected.rent_stock_values
+    for bands, series in (
+        (result.buy_bands, expected.combined_values),
+        (result.rent_bands, expected.rent_stock_values),
+        (result.difference_bands, difference),
+    ):
+        assert bands.shape == (len(result.percentiles), PARAMS.years_of_study)
+        np.testing.assert_allclose(bands, np.broadcast_to(series, bands.shape), rtol=1e-9)
+    np.testing.assert_array_equal(result.probability_buy_wins, difference > 0)
+    np.testing.assert_allclose(result.final_buy, expected.combined_values[-1], rtol=1e-9)
+
+
+def test_bootstrap_market():
+    rng = np.random.default_rng(3)
+    history = np.column_stack([rng.normal(0.006, 0.04, 240), rng.normal(0.003, 0.01, 240), np.full(240, 0.002)])
+    result = simulate(PARAMS, BootstrapMarket(history), n_paths=2_000, seed=0)
+    assert (np.diff(result.buy_bands, axis=0) >= 0).all()
+    assert 0 < result.final_probability_buy_wins < 1
+
+
+def test_sketch_percentiles_are_within_the_relative_accuracy():
+    rng = np.random.default_rng(5)
+    values = np.column_stack(
+        [rng.normal(1e5, 3e5, 20_000), rng.lognormal(12, 1, 20_000), np.full(20_000, 42.0), rng.normal(0, 5, 20_000)]
+    )
+    sketch = QuantileSketch(values.shape[1], relative_accuracy=0.01)
+    for block in np.array_split(values, 7):
+        sketch.add(block)
+    assert sketch.counts.sum() == values.size
+    exact = np.percentile(values, PERCENTILES, axis=0, method="lower")
+    estimates = sketch.percentiles(PERCENTILES)
+    assert (np.abs(estimates - exact) <= 0.01 * np.abs(exact) + 1).all()
+    np.testing.assert_array_equal(estimates[[0, -1]], [values.min(axis=0), values.max(axis=0)])
+    np.testing.assert_array_equal(estimates[:, 2], 42.0)
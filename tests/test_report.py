@@ -0,0 +1,56 @@
+import os
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("matplotlib")
+
+from house_investment import HouseInvestment  # noqa: E402
+from main import main  # noqa: E402
+from report import FIGURES, build_report_data, render_report  # noqa: E402
+from scenarios import BASE_PARAMS  # noqa: E402
+
+PARAMS = replace(BASE_PARAMS, years_of_study=10)
+
+
+@pytest.fixture(scope="module")
+def data():
+    return build_report_data(PARAMS, stock_returns=[0.04, 0.08], interest_rates=[0.01, 0.03], rent_prices=[800])
+
+
+def test_report_data(data):
+    np.testing.assert_array_equal(data.evolution.data, HouseInvestment(PARAMS).calculate_value_evolution().data)
+    assert set(data.sweeps) == {"stock_market_return", "mortgage_interest", "initial_rent_price"}
+    assert data.sweeps["mortgage_interest"]["mortgage_interest"].tolist() == [0.01, 0.03]
+
+
+def test_render_report_in_process(tmp_path, data):
+    paths = render_report(data, str(tmp_path / "report"), formats=["png", "svg"], max_workers=1)
+    expected = [str(tmp_path / "report" / f"{name}.{extension}") for name in FIGURES for extension in ("png", "svg")]
+    assert paths == expected + [str(tmp_path / "report" / "index.html")]
+    for path in expected:
+        assert os.path.getsize(path) > 0
+    assert (tmp_path / "report" / "value_evolution.png").read_bytes().startswith(b"\x89PNG")
+
+    index = (tmp_path / "report" / "index.html").read_text(encoding="utf-8")
+    for name in FIGURES:
+        # Each figure is linked in the first of the formats
+        assert f'<img src="{name}.png" alt="{name}">' in index
+    assert "house_price=300000" in index
+
+    with pytest.raises(ValueError, match="Unknown figures"):
+        render_report(data, str(tmp_path), figures=["colour"])
+
+
+def test_render_report_without_index(tmp_path, data):
+    paths = render_report(data, str(tmp_path), figures=["expenses"], max_workers=1, html_index=False)
+    assert paths == [str(tmp_path / "expenses.png")]
+    assert not (tmp_path / "index.html").exists()
+
+
+def test_cli_writes_the_report(tmp_path, capsys):
+    main(["--output-dir", str(tmp_path), "--workers", "1", "--figure", "rent_price", "--format", "svg"])
+    printed = capsys.readouterr().out.split()
+    assert printed == [str(tmp_path / "rent_price.svg"), str(tmp_path / "index.html")]
+    assert (tmp_path / "rent_price.svg").read_text().lstrip().startswith("<?xml")
@@ -0,0 +1,63 @@
+from dataclasses import asdict
+
+import numpy as np
+import pytest
+
+from batch import broadcast_columns, evolve
+from house_investment import SERIES_NAMES, InvestmentConfig
+from result_store import ResultStore, write_store
+from scenarios import BASE_PARAMS as PARAMS
+from sweep import Axis, axis_columns
+
+AXES = [
+    Axis("house_price", [200_000, 300_000, 400_000]),
+    Axis("initial_rent_price", [800, 1000, 1200]),
+    Axis("mortgage_interest", [0.01, 0.02, 0.03]),
+    Axis("years_of_study", [10, 25]),
+]
+N_POINTS = 54
+
+
+@pytest.fixture(scope="module")
+def store(tmp_path_factory):
+    # A chunk size that does not divide the grid, so the last chunk is partial
+    return write_store(str(tmp_path_factory.mktemp("store")), PARAMS, AXES, chunk_size=7)
+
+
+@pytest.fixture(scope="module")
+def expected():
+    columns = axis_columns(AXES, "grid", 0, N_POINTS)
+    return columns, evolve(*broadcast_columns(asdict(PARAMS), asdict(InvestmentConfig()), columns, N_POINTS))
+
+
+def test_series_match_the_batch_engine(store, expected):
+    _, results = expected
+    reopened = ResultStore(store.path)
+    for row, name in enumerate(SERIES_NAMES):
+        np.testing.assert_array_equal(reopened.series(name), results.data[row].T, err_msg=name)
+
+
+def test_query_matches_brute_force(store, expected):
+    columns, results = expected
+    buy_wins = results.combined_values[:, 19] > results.rent_stock_values[:, 19]
+    wanted = (columns["initial_rent_price"] >= 1000) & (columns["mortgage_interest"] <= 0.02) & buy_wins
+    points = store.query(year=20, buy_wins=True, initial_rent_price=(1000, None), mortgage_interest=(None, 0.02))
+    np.testing.assert_array_equal(points, np.flatnonzero(wanted))
+    assert store.points(points)["initial_rent_price"].min() >= 1000
+
+
+def test_short_horizons_neither_win_nor_lose(store):
+    short = store.filter(years_of_study=(None, 10))
+    assert len(short) == N_POINTS // 2
+    assert not np.isin(store.query(year=20, buy_wins=False), short).any()
+    assert np.isnan(store.at_year("combined_values", 20, short)).all()
+
+
+def test_unswept_fields_filter_on_the_base_value(store):
+    assert len(store.filter(stock_market_return=(0.05, 0.07))) == N_POINTS
+    assert len(store.filter(stock_market_return=(0.07, None))) == 0
+
+
+def test_store_is_written_once(store):
+    with pytest.raises(FileExistsError):
+        write_store(store.path, PARAMS, AXES)
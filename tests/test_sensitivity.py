@@ -0,0 +1,84 @@
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from house_investment import HouseInvestment
+from scenarios import BASE_PARAMS
+from sensitivity import Factor, default_factors, sobol_indices, tornado
+
+PARAMS = replace(BASE_PARAMS, years_of_study=20)
+
+
+def gap(params) -> float:
+    details = HouseInvestment(params).calculate_value_evolution().financial_details
+    return details["house_scenario_net_worth"] - details["rent_scenario_net_worth"]
+
+
+def test_tornado_bars_are_sorted_by_swing():
+    result = tornado(PARAMS)
+    swings = [bar.swing for bar in result.bars]
+    assert swings == sorted(swings, reverse=True)
+    assert {bar.name for bar in result.bars} == {factor.name for factor in default_factors(PARAMS)}
+    assert "prepayment_reduces_payment" not in {bar.name for bar in result.bars}
+    assert result.baseline == pytest.approx(gap(PARAMS), rel=1e-12)
+
+    for bar in result.bars[:3]:
+        assert bar.output_low == pytest.approx(gap(replace(PARAMS, **{bar.name: bar.low})), rel=1e-9)
+        assert bar.output_high == pytest.approx(gap(replace(PARAMS, **{bar.name: bar.high})), rel=1e-9)
+    # Income is saved in both scenarios alike, so it never moves the gap
+    (income,) = [bar for bar in result.bars if bar.name == "monthly_net_income"]
+    assert income.swing <= 1e-6 * abs(result.baseline)
+
+
+def test_tornado_of_a_financial_detail():
+    factors = [Factor("house_price", 200_000, 400_000), Factor("stock_market_return", 0.03, 0.08)]
+    result = tornado(PARAMS, factors, metric="final_house_value")
+    # The house value only depends on the price
+    assert [bar.name for bar in result.bars] == ["house_price", "stock_market_return"]
+    assert result.bars[1].swing == 0
+    assert result.bars[0].output_high == pytest.approx(2 * result.bars[0].output_low, rel=1e-12)
+
+
+def test_tornado_of_a_flag():
+    params = replace(PARAMS, annual_prepayment=10_000)
+    (bar,) = tornado(params, [Factor("prepayment_reduces_payment", 0, 1)]).bars
+    assert bar.output_low == pytest.approx(gap(params), rel=1e-9)
+    assert bar.output_high == pytest.approx(gap(replace(params, prepayment_reduces_payment=True)), rel=1e-9)
+    assert bar.swing > 0
+
+
+def test_sobol_indices_of_dominant_and_inert_factors():
+    factors = [
+        Factor("stock_market_return", 0.02, 0.10),
+        Factor("monthly_net_income", 3_000, 6_000),
+        Factor("annual_garbage_tax", 50, 150),
+    ]
+    result = sobol_indices(PARAMS, factors, n_samples=2048, seed=3)
+    assert result.evaluations == 2048 * (len(factors) + 2)
+    assert result.ranking() == ["stock_market_return", "annual_garbage_tax", "monthly_net_income"]
+
+    stock, income, garbage = range(3)
+    # The stock return drives nearly all of the variance, and almost entirely on its own
+    assert result.first_order[stock] == pytest.approx(1, abs=0.05)
+    assert result.total_order[stock] == pytest.approx(1, abs=0.05)
+    assert result.first_order_conf[stock] < 0.1
+    assert abs(result.first_order[income]) < 1e-9 and abs(result.total_order[income]) < 1e-9
+    assert 0 < result.total_order[garbage] < 0.01
+
+    again = sobol_indices(PARAMS, factors, n_samples=2048, seed=3)
+    np.testing.assert_array_equal(again.first_order, result.first_order)
+    np.testing.assert_array_equal(again.total_order_conf, result.total_order_conf)
+
+
+def test_factor_validation():
+    with pytest.raises(ValueError, match="Unknown factor"):
+        Factor("colour", 0, 1)
+    with pytest.raises(ValueError, match="cannot be a factor"):
+        Factor("years_of_study", 10, 20)
+    with pytest.raises(ValueError, match="low > high"):
+        Factor("house_price", 2, 1)
+    with pytest.raises(ValueError, match="distinct"):
+        tornado(PARAMS, [Factor("house_price", 1, 2), Factor("house_price", 3, 4)])
+    with pytest.raises(ValueError, match="distinct"):
+        sobol_indices(PARAMS, [])
@@ -0,0 +1,173 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, replace
+
+import pytest
+
+from breakeven import break_even
+from house_investment import HouseInvestment
+from scenarios import BASE_PARAMS
+from service import EvaluationService, InProcessClient
+from sweep import Axis, sweep
+
+
+def run(requests, **options):
+    # Runs `requests(client)` against a service evaluating on a worker thread
+    async def main():
+        with ThreadPoolExecutor(1) as executor:
+            service = EvaluationService(executor, **options)
+            return await requests(InProcessClient(service))
+
+    return asyncio.run(main())
+
+
+def test_prepayment_switch_is_a_flag():
+    params = replace(BASE_PARAMS, annual_prepayment=10_000, prepayment_reduces_payment=True)
+
+    async def requests(client):
+        body = {"params": asdict(params)}
+        bad = {"params": {**body["params"], "prepayment_reduces_payment": 1}}
+        return await client.post("/evaluate", body), await client.post("/evaluate", bad)
+
+    (status, payload), (bad_status, bad_payload) = run(requests)
+    assert status == 200
+    expected = HouseInvestment(params).calculate_value_evolution().financial_details
+    assert payload["financial_details"] == pytest.approx(expected, rel=1e-12)
+    assert bad_status == 400 and "true or false" in bad_payload["error"]
+
+
+def test_concurrent_evaluations_share_one_batch():
+    scenarios = [replace(BASE_PARAMS, house_price=200_000 + 10_000 * i) for i in range(8)]
+
+    async def requests(client):
+        posts = [client.post("/evaluate", {"params": asdict(params)}) for params in scenarios + scenarios[:2]]
+        responses = await asyncio.gather(*posts)
+        return responses, client.service.batches
+
+    responses, batches = run(requests, batch_window=0.05)
+    assert batches == 1
+    for params, (status, payload) in zip(scenarios + scenarios[:2], responses):
+        expected = HouseInvestment(params).calculate_value_evolution().financial_details
+        assert status == 200 and payload["financial_details"] == pytest.approx(expected, rel=1e-12)
+
+
+def test_repeated_scenarios_come_from_the_cache():
+    body = {"params": asdict(BASE_PARAMS), "series": True}
+
+    async def requests(client):
+        first = await client.post("/evaluate", body)
+        second = await client.post("/evaluate", {**body, "params": {**body["params"], "mortgage_term": 30.0}})
+        _, health = await client.get("/health")
+        return first, second, health
+
+    first, second, health = run(requests)
+    assert first == second
+    assert len(first[1]["series"]["combined_values"]) == BASE_PARAMS.years_of_study
+    assert health["batches"] == 1
+    assert health["cache"]["hits"] == 1 and health["cache"]["misses"] == 1
+
+
+@pytest.mark.parametrize(
+    "path, body, status, error",
+    [
+        ("/evaluate", b"{not json", 400, "Expecting property name"),
+        ("/evaluate", b"[1]", 400, "JSON object"),
+        ("/evaluate", b"{}", 400, "'params' is required"),
+        ("/evaluate", {"params": {"house_price": 1}}, 400, "missing"),
+        ("/evaluate", {"params": {**asdict(BASE_PARAMS), "house_price": "a lot"}}, 400, "'house_price'"),
+        ("/evaluate", {"params": {**asdict(BASE_PARAMS), "years_of_study": 2.5}}, 400, "positive integer"),
+        ("/evaluate", {"params": {**asdict(BASE_PARAMS), "years_of_study": 101}}, 400, "limited to 100"),
+        ("/evaluate", b'{"params": {"house_price": NaN}}', 400, "NaN is not a valid JSON value"),
+        # 1e999 is valid JSON but overflows to infinity
+        (
+            "/evaluate",
+            json.dumps({"params": {**asdict(BASE_PARAMS), "house_price": 123}}).replace("123", "1e999").encode(),
+            400,
+            "'house_price' must be finite",
+        ),
+        ("/evaluate", {"params": {**asdict(BASE_PARAMS), "house_price": 0}}, 400, "'house_price' must be positive"),
+        (
+            "/evaluate",
+            {"params": {**asdict(BASE_PARAMS), "mortgage_term": -5}},
+            400,
+            "'mortgage_term' must be positive",
+        ),
+        ("/sweep", {"params": asdict(BASE_PARAMS), "axes": 3}, 400, "'axes'"),
+        ("/sweep", {"params": asdict(BASE_PARAMS), "axes": [{"name": "house_price", "values": [1] * 11}]}, 400, "10"),
+        ("/sweep", {"params": asdict(BASE_PARAMS), "axes": [{"name": "years_of_study", "values": [200]}]}, 400, "100"),
+        ("/sweep", {"params": asdict(BASE_PARAMS), "axes": [{"name": "colour", "values": [1]}]}, 422, "colour"),
+        ("/break-even", {"params": asdict(BASE_PARAMS), "field": "house_price"}, 400, "'bracket' is required"),
+        (
+            "/break-even",
+            {"params": asdict(BASE_PARAMS), "field": "house_price", "bracket": [1, 2]},
+            422,
+            "No break-even",
+        ),
+    ],
+)
+def test_bad_requests(path, body, status, error):
+    async def requests(client):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        return await client.service.handle("POST", path, data)
+
+    got_status, payload = run(requests, max_sweep_points=10)
+    assert got_status == status
+    assert error in payload["error"]
+
+
+@pytest.mark.filterwarnings("ignore:overflow:RuntimeWarning")
+def test_non_finite_results_are_an_error():
+    # A 1e10 stock return overflows the portfolios; the response must still be valid JSON
+    params = replace(BASE_PARAMS, stock_market_return=1e10)
+
+    async def requests(client):
+        return await client.post("/evaluate", {"params": asdict(params)})
+
+    status, payload = run(requests)
+    assert status == 422 and "not finite" in payload["error"]
+
+
+def test_unknown_routes():
+    async def requests(client):
+        return await client.get("/nowhere"), await client.get("/evaluate")
+
+    (missing, _), (wrong_method, _) = run(requests)
+    assert (missing, wrong_method) == (404, 405)
+
+
+def test_sweep_and_break_even_match_the_library():
+    params = replace(BASE_PARAMS, years_of_study=20)
+    axes = [
+        {"name": "house_price", "values": [200_000, 300_000]},
+        {"name": "mortgage_interest", "values": [0.02, 0.04]},
+    ]
+
+    async def requests(client):
+        body = {"params": asdict(params)}
+        swept = await client.post("/sweep", {**body, "axes": axes, "metrics": ["home_equity"]})
+        solved = await client.post("/break-even", {**body, "field": "house_price", "bracket": [1e5, 2e6], "year": 10})
+        return swept, solved
+
+    (sweep_status, swept), (solve_status, solved) = run(requests)
+    assert sweep_status == solve_status == 200
+    expected = sweep(params, [Axis(**axis) for axis in axes], metrics=["home_equity"]).columns
+    assert swept["columns"] == {name: values.tolist() for name, values in expected.items()}
+    assert solved == asdict(break_even(params, "house_price", (1e5, 2e6), year=10))
+
+
+@pytest.mark.parametrize("length", [b"abc", b"-5"])
+def test_invalid_content_length(length):
+    async def fetch():
+        with ThreadPoolExecutor(1) as executor:
+            server = await EvaluationService(executor).serve(port=0)
+            async with server:
+                reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+                writer.write(b"POST /evaluate HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n{}")
+                response = await reader.read()
+                writer.close()
+        return response
+
+    response = asyncio.run(fetch())
+    assert response.startswith(b"HTTP/1.1 400 Bad Request\r\n")
+    assert b"Connection: close" in response and response.endswith(b'{"error": "Invalid Content-Length"}')
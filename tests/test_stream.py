@@ -0,0 +1,177 @@
+import csv
+import io
+import json
+import logging
+from dataclasses import replace
+
+import pytest
+
+from batch import PARAM_FIELDS
+from house_investment import HouseInvestment, InvestmentConfig
+from scenarios import BASE_PARAMS
+from stream import main, stream_scenarios
+
+PRICES = [180_000, 220_000, 260_000, 300_000, 340_000, 380_000, 420_000]
+
+
+def records():
+    # Only the required fields and one config field; everything else takes its default
+    return [
+        {
+            "client": f"c{i}",
+            "house_price": price,
+            "mortgage_interest": 0.025,
+            "mortgage_term": 25,
+            "stock_market_return": 0.06,
+            "initial_rent_price": 1000,
+            "monthly_net_income": 4000,
+            "years_of_study": 10 + i,
+            "annual_house_appreciation": 0.03,
+        }
+        for i, price in enumerate(PRICES)
+    ]
+
+
+def expected(record) -> dict:
+    params = replace(BASE_PARAMS, **{name: value for name, value in record.items() if name in PARAM_FIELDS})
+    config = InvestmentConfig(annual_house_appreciation=record["annual_house_appreciation"])
+    return HouseInvestment(params, config).calculate_value_evolution().financial_details
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def check(rows, metrics=("house_scenario_net_worth", "rent_scenario_net_worth")):
+    assert [row["client"] for row in rows] == [f"c{i}" for i in range(len(PRICES))]
+    for row, record in zip(rows, records()):
+        details = expected(record)
+        for metric in metrics:
+            assert float(row[metric]) == pytest.approx(details[metric], rel=1e-12)
+
+
+@pytest.mark.parametrize("chunk_size", [3, 7, 100])
+def test_csv_to_csv(tmp_path, chunk_size):
+    write_csv(tmp_path / "in.csv", records())
+    main([str(tmp_path / "in.csv"), "-o", str(tmp_path / "out.csv"), "--chunk-size", str(chunk_size)])
+    with open(tmp_path / "out.csv", newline="") as file:
+        rows = list(csv.DictReader(file))
+    assert list(rows[0])[0] == "client"
+    check(rows)
+
+
+def test_jsonl_to_jsonl_with_inputs(tmp_path):
+    (tmp_path / "in.jsonl").write_text("".join(json.dumps(record) + "\n\n" for record in records()))
+    output = tmp_path / "out.jsonl"
+    main([str(tmp_path / "in.jsonl"), "-o", str(output), "--chunk-size", "4", "--include-inputs"])
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    check(rows)
+    assert rows[0]["house_price"] == PRICES[0] and rows[0]["annual_rent_increase"] == 0.02
+
+
+def test_stdin_to_stdout_with_metrics_and_float_format(monkeypatch, capsys):
+    source = io.StringIO()
+    writer = csv.DictWriter(source, fieldnames=list(records()[0]))
+    writer.writeheader()
+    writer.writerows(records())
+    monkeypatch.setattr("sys.stdin", io.StringIO(source.getvalue()))
+    main(["--metric", "home_equity", "--metric", "final_house_value", "--float-format", "%.2f"])
+    rows = list(csv.DictReader(io.StringIO(capsys.readouterr().out)))
+    assert list(rows[0]) == ["client", "home_equity", "final_house_value"]
+    assert all(len(row["home_equity"].split(".")[1]) == 2 for row in rows)
+    for row, record in zip(rows, records()):
+        assert float(row["final_house_value"]) == pytest.approx(expected(record)["final_house_value"], abs=0.005)
+
+
+def test_csv_flags(tmp_path):
+    rows = records()
+    for row, flag in zip(rows, ["true", "False", "1", "", "0", " TRUE ", "false"]):
+        row.update(annual_prepayment=10_000, prepayment_reduces_payment=flag)
+    write_csv(tmp_path / "in.csv", rows)
+    main([str(tmp_path / "in.csv"), "-o", str(tmp_path / "out.csv"), "--chunk-size", "4"])
+    with open(tmp_path / "out.csv", newline="") as file:
+        written = list(csv.DictReader(file))
+    for row, record, reduce in zip(written, rows, [True, False, True, False, False, True, False]):
+        params = replace(
+            BASE_PARAMS,
+            **{name: record[name] for name in PARAM_FIELDS if name in record and name != "prepayment_reduces_payment"},
+            prepayment_reduces_payment=reduce,
+        )
+        config = InvestmentConfig(annual_house_appreciation=record["annual_house_appreciation"])
+        details = HouseInvestment(params, config).calculate_value_evolution().financial_details
+        assert float(row["house_scenario_net_worth"]) == pytest.approx(details["house_scenario_net_worth"], rel=1e-9)
+
+    rows[3]["prepayment_reduces_payment"] = "yes"
+    write_csv(tmp_path / "in.csv", rows)
+    with pytest.raises(ValueError, match="record 4: field 'prepayment_reduces_payment' is not true or false: 'yes'"):
+        main([str(tmp_path / "in.csv"), "-o", str(tmp_path / "out.csv")])
+
+
+def test_invalid_records(tmp_path, caplog):
+    rows = records()
+    rows[2]["house_price"] = "n/a"
+    rows[5]["years_of_study"] = 0
+    write_csv(tmp_path / "in.csv", rows)
+    with pytest.raises(ValueError, match="record 3: field 'house_price' is not a number"):
+        main([str(tmp_path / "in.csv"), "-o", str(tmp_path / "out.csv"), "--chunk-size", "4"])
+
+    with caplog.at_level(logging.WARNING, logger="stream"):
+        main([str(tmp_path / "in.csv"), "-o", str(tmp_path / "out.csv"), "--chunk-size", "4", "--skip-invalid"])
+    assert [record.getMessage() for record in caplog.records] == [
+        "Skipping record 3: field 'house_price' is not a number: 'n/a'",
+        "Skipping record 6: years_of_study must be a positive integer",
+    ]
+    with open(tmp_path / "out.csv", newline="") as file:
+        kept = list(csv.DictReader(file))
+    assert [row["client"] for row in kept] == ["c0", "c1", "c3", "c4", "c6"]
+    for row, record in zip(kept, [records()[i] for i in (0, 1, 3, 4, 6)]):
+        assert float(row["house_scenario_net_worth"]) == pytest.approx(
+            expected(record)["house_scenario_net_worth"], rel=1e-12
+        )
+
+
+def test_unreadable_json_lines(tmp_path, caplog):
+    lines = [json.dumps(record) for record in records()]
+    lines[1] = '{"client": "c1", "house_price": '
+    lines[4] = "[1, 2]"
+    (tmp_path / "in.jsonl").write_text("\n".join(lines) + "\n")
+    output = tmp_path / "out.jsonl"
+    with pytest.raises(ValueError, match=r"record 2 \(line 2\): invalid JSON"):
+        main([str(tmp_path / "in.jsonl"), "-o", str(output), "--chunk-size", "4"])
+
+    with caplog.at_level(logging.WARNING, logger="stream"):
+        main([str(tmp_path / "in.jsonl"), "-o", str(output), "--chunk-size", "4", "--skip-invalid"])
+    messages = [record.getMessage() for record in caplog.records]
+    assert len(messages) == 2
+    assert messages[0].startswith("Skipping record 2 (line 2): invalid JSON")
+    assert messages[1] == "Skipping record 5 (line 5): not a JSON object"
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [row["client"] for row in rows] == ["c0", "c2", "c3", "c5", "c6"]
+    for row, record in zip(rows, [records()[i] for i in (0, 2, 3, 5, 6)]):
+        assert row["house_scenario_net_worth"] == pytest.approx(expected(record)["house_scenario_net_worth"], rel=1e-12)
+
+
+def test_missing_required_field_and_bad_arguments():
+    rows = records()
+    del rows[1]["house_price"]
+    with pytest.raises(ValueError, match="record 2: missing required field 'house_price'"):
+        stream_scenarios(rows, io.StringIO())
+    assert stream_scenarios(rows, io.StringIO(), skip_invalid=True) == len(PRICES) - 1
+    with pytest.raises(ValueError, match="record 1: expected a mapping of fields, got list"):
+        stream_scenarios([[1, 2]] + records(), io.StringIO())
+    with pytest.raises(ValueError, match="Unknown metrics"):
+        stream_scenarios(records(), io.StringIO(), metrics=["colour"])
+    with pytest.raises(ValueError, match="chunk_size"):
+        stream_scenarios(records(), io.StringIO(), chunk_size=0)
+    with pytest.raises(SystemExit, match="Cannot infer the format"):
+        main(["scenarios.txt"])
+
+
+def test_parquet_output(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    write_csv(tmp_path / "in.csv", records())
+    main([str(tmp_path / "in.csv"), "-o", str(tmp_path / "out.parquet"), "--chunk-size", "3"])
+    check(pq.read_table(tmp_path / "out.parquet").to_pylist())
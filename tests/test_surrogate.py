@@ -0,0 +1,90 @@
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from breakeven import break_even
+from house_investment import HouseInvestment
+from scenarios import BASE_PARAMS as PARAMS
+from surrogate import Surrogate, build_surrogate
+from sweep import Axis
+
+AXES = [
+    Axis("house_price", np.linspace(150_000, 600_000, 10)),
+    Axis("initial_rent_price", np.linspace(600, 2000, 8)),
+    Axis("stock_market_return", np.linspace(0.03, 0.08, 26)),
+    Axis("years_of_study", [20, 30, 40]),
+]
+
+
+@pytest.fixture(scope="module")
+def surrogate():
+    return build_surrogate(PARAMS, AXES, n_validation=500)
+
+
+def _exact(params, config=None):
+    details = HouseInvestment(params, *([config] if config else [])).calculate_value_evolution().financial_details
+    return {metric: details[metric] for metric in ("house_scenario_net_worth", "rent_scenario_net_worth")}
+
+
+def test_grid_nodes_are_exact(surrogate):
+    params = replace(PARAMS, house_price=float(AXES[0].values[3]), stock_market_return=float(AXES[2].values[7]))
+    answer = surrogate.evaluate(params)
+    assert not answer.exact
+    for metric, value in _exact(params).items():
+        assert answer.values[metric] == pytest.approx(value, rel=1e-12)
+
+
+def test_interpolation_stays_within_the_measured_error(surrogate):
+    rng = np.random.default_rng(1)
+    for _ in range(50):
+        params = replace(
+            PARAMS,
+            house_price=float(rng.uniform(150_000, 600_000)),
+            initial_rent_price=float(rng.uniform(600, 2000)),
+            stock_market_return=float(rng.uniform(0.03, 0.08)),
+            years_of_study=int(rng.choice([20, 30, 40])),
+        )
+        answer = surrogate.evaluate(params)
+        for metric, value in _exact(params).items():
+            # The bound is the worst error over the validation sample, so allow some slack for new points
+            assert abs(answer.values[metric] - value) <= 1.5 * answer.error_bounds[metric]
+
+
+def test_points_off_the_grid_are_evaluated_exactly(surrogate):
+    for params, config in [
+        (replace(PARAMS, house_price=700_000), None),
+        (replace(PARAMS, years_of_study=25), None),
+        (replace(PARAMS, monthly_net_income=3000), None),
+        (PARAMS, replace(surrogate.config, ibi_percentage=0.01)),
+    ]:
+        answer = surrogate.evaluate(params, config)
+        assert answer.exact and answer.values == _exact(params, config)
+
+
+def test_batch_queries_match_single_ones(surrogate):
+    prices = np.array([200_000.0, 333_333.0, 700_000.0])
+    values, exact = surrogate.evaluate_many({"house_price": prices, "stock_market_return": 0.055})
+    assert exact.tolist() == [False, False, True]
+    for k, price in enumerate(prices):
+        answer = surrogate.evaluate(replace(PARAMS, house_price=float(price), stock_market_return=0.055))
+        for metric, column in values.items():
+            assert column[k] == pytest.approx(answer.values[metric], rel=1e-12)
+
+
+def test_break_even_matches_the_solver_within_its_bound(surrogate):
+    result = surrogate.break_even(PARAMS, "initial_rent_price")
+    exact = break_even(PARAMS, "initial_rent_price", (600, 2000))
+    assert not result.exact
+    assert abs(result.value - exact.value) <= result.error_bound
+    fallback = surrogate.break_even(replace(PARAMS, years_of_study=25), "initial_rent_price")
+    assert fallback.exact
+
+
+def test_save_and_load(surrogate, tmp_path):
+    path = str(tmp_path / "surrogate.npz")
+    surrogate.save(path)
+    loaded = Surrogate.load(path)
+    params = replace(PARAMS, house_price=412_345.0)
+    assert loaded.evaluate(params) == surrogate.evaluate(params)
+    assert loaded.errors == surrogate.errors
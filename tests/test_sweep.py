@@ -0,0 +1,84 @@
+import itertools
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from house_investment import HouseInvestment, InvestmentConfig
+from scenarios import BASE_PARAMS
+from sweep import Axis, axis_columns, grid_size, iter_sweep, sweep
+
+PARAMS = replace(BASE_PARAMS, years_of_study=15)
+AXES = [
+    Axis("house_price", [200_000, 250_000, 300_000]),
+    Axis("mortgage_interest", [0.015, 0.03]),
+    Axis("annual_house_appreciation", [0.01, 0.02, 0.04]),
+]
+METRICS = ["house_scenario_net_worth", "rent_scenario_net_worth"]
+
+
+def expected(point: dict) -> dict:
+    config = InvestmentConfig(annual_house_appreciation=point.pop("annual_house_appreciation"))
+    details = HouseInvestment(replace(PARAMS, **point), config).calculate_value_evolution().financial_details
+    return {metric: details[metric] for metric in METRICS}
+
+
+def test_grid_order_matches_itertools_product():
+    columns = axis_columns(AXES, "grid", 0, grid_size(AXES, "grid"))
+    points = list(itertools.product(*(axis.values for axis in AXES)))
+    assert list(zip(*(columns[axis.name] for axis in AXES))) == points
+
+    result = sweep(PARAMS, AXES, metrics=METRICS)
+    assert len(result) == 18
+    for row, point in zip(result.rows(), points):
+        for metric, value in expected(dict(zip([axis.name for axis in AXES], point))).items():
+            assert row[metric] == pytest.approx(value, rel=1e-12)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 17, 18, 1000])
+def test_chunk_boundaries(chunk_size):
+    whole = sweep(PARAMS, AXES, metrics=METRICS, chunk_size=18)
+    chunks = list(iter_sweep(PARAMS, AXES, metrics=METRICS, chunk_size=chunk_size))
+    assert [len(chunk) for chunk in chunks] == [min(chunk_size, 18 - start) for start in range(0, 18, chunk_size)]
+    # Every point lands in exactly one chunk, in grid order
+    for start, chunk in zip(range(0, 18, chunk_size), chunks):
+        for name, values in axis_columns(AXES, "grid", start, start + len(chunk)).items():
+            np.testing.assert_array_equal(chunk[name], values)
+    for name, values in whole.columns.items():
+        np.testing.assert_array_equal(np.concatenate([chunk[name] for chunk in chunks]), values)
+
+
+def test_zip_mode():
+    axes = [Axis("house_price", [200_000, 300_000]), Axis("stock_market_return", [0.04, 0.07])]
+    result = sweep(PARAMS, axes, mode="zip", metrics=["home_equity"], chunk_size=1)
+    assert result["house_price"].tolist() == [200_000, 300_000]
+    assert result["stock_market_return"].tolist() == [0.04, 0.07]
+    with pytest.raises(ValueError, match="same length"):
+        sweep(PARAMS, [axes[0], Axis("stock_market_return", [0.04])], mode="zip")
+
+
+def test_process_executor_matches_the_batch_executor():
+    batch = list(iter_sweep(PARAMS, AXES, metrics=METRICS, chunk_size=4))
+    processes = list(iter_sweep(PARAMS, AXES, metrics=METRICS, chunk_size=4, executor="process", max_workers=2))
+    assert len(processes) == len(batch) == 5
+    for expected_chunk, chunk in zip(batch, processes):
+        assert list(chunk.columns) == list(expected_chunk.columns)
+        for name, values in expected_chunk.columns.items():
+            np.testing.assert_array_equal(chunk[name], values)
+
+
+def test_invalid_sweeps():
+    with pytest.raises(ValueError, match="Unknown sweep axis"):
+        Axis("colour", [1])
+    with pytest.raises(ValueError, match="non-empty"):
+        Axis("house_price", [])
+    with pytest.raises(ValueError, match="at least one axis"):
+        sweep(PARAMS, [])
+    with pytest.raises(ValueError, match="Duplicate"):
+        sweep(PARAMS, [AXES[0], AXES[0]])
+    with pytest.raises(ValueError, match="Unknown sweep metrics"):
+        sweep(PARAMS, AXES, metrics=["colour"])
+    with pytest.raises(ValueError, match="Unknown sweep executor"):
+        sweep(PARAMS, AXES, executor="threads")
+    with pytest.raises(ValueError, match="Unknown sweep mode"):
+        sweep(PARAMS, AXES, mode="random")
@@ -0,0 +1,97 @@
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from amortization import ResettingLoan, year_end_balances
+from house_investment import HouseInvestment
+from scenarios import BASE_PARAMS
+from variable_rate import IndexHistory, MeanRevertingIndex, VariableRateMortgage, evaluate_rate_paths
+
+PARAMS = replace(BASE_PARAMS, mortgage_interest=0.02, years_of_study=35)
+PRINCIPAL = 240_000
+
+
+def reference_balances(principal, annual_rates, term_years, reset_months):
+    # Month by month: at every reset the payment is recalculated on the balance over the remaining term
+    months = int(np.ceil(term_years * 12))
+    balance, balances = principal, []
+    for month in range(months):
+        if month % reset_months == 0:
+            rate = annual_rates[min(month // reset_months, len(annual_rates) - 1)] / 12
+            remaining = months - month
+            payment = balance * rate / (1 - (1 + rate) ** -remaining) if rate else balance / remaining
+        interest = balance * rate
+        balance -= balance if month == months - 1 else min(payment - interest, balance)
+        balances.append(balance)
+    return np.array(balances)
+
+
+@pytest.mark.parametrize("reset_months", [12, 6, 1])
+def test_constant_index_reproduces_the_fixed_rate_model(reset_months):
+    mortgage = VariableRateMortgage(IndexHistory([0.015]), spread=0.005, reset_months=reset_months)
+    results = evaluate_rate_paths(PARAMS, mortgage, n_paths=3, seed=0)
+    expected = HouseInvestment(PARAMS).calculate_value_evolution()
+    for path in range(3):
+        np.testing.assert_allclose(results.scenario(path).data, expected.data, rtol=1e-9, atol=1e-6)
+
+
+def test_half_yearly_resets_follow_the_index():
+    index = [0.01, 0.03, 0.02, 0.045, 0.005]
+    mortgage = VariableRateMortgage(IndexHistory(index), spread=0.01, reset_months=6)
+    rates = mortgage.rates(np.random.default_rng(0), 2, 30)
+    assert rates.shape == (2, 60)
+    np.testing.assert_allclose(rates[0], [0.02, 0.04, 0.03, 0.055] + [0.015] * 56)
+
+    loan = mortgage.loan(PRINCIPAL, 30, np.random.default_rng(0), 2)
+    balances = loan.advance(360).balance
+    expected = reference_balances(PRINCIPAL, rates[0], 30, 6)
+    np.testing.assert_allclose(balances, np.broadcast_to(expected, balances.shape), rtol=1e-9, atol=1e-6)
+    assert balances[0, -1] == 0
+
+
+def test_mixed_mortgage_is_fixed_for_its_first_years():
+    mortgage = VariableRateMortgage(
+        MeanRevertingIndex(0.03, 0.03, volatility=0.01), spread=0.01, fixed_years=10, fixed_rate=0.02
+    )
+    rng = np.random.default_rng(1)
+    rates = mortgage.rates(rng, 500, 30)
+    assert (rates[:, :10] == 0.02).all()
+    assert rates[:, 10:].std() > 0
+
+    results = evaluate_rate_paths(PARAMS, mortgage, n_paths=500, seed=1)
+    fixed = year_end_balances(PRINCIPAL, 0.02, 30, 10)[0]
+    np.testing.assert_allclose(results.mortgage_balances[:, :10], np.broadcast_to(fixed, (500, 10)), rtol=1e-9)
+    # The index starts from the same level on every path and then each path amortizes at its own
+    # rates, still paid off at the end of the term
+    assert np.ptp(results.mortgage_balances[:, 10]) == 0 < np.ptp(results.mortgage_balances[:, 11])
+    assert (results.mortgage_balances[:, 29:] == 0).all()
+
+    with pytest.raises(ValueError, match="whole number of reset periods"):
+        VariableRateMortgage(IndexHistory([0.02]), 0.01, reset_months=12, fixed_years=2.5)
+    with pytest.raises(ValueError, match="divide 12"):
+        VariableRateMortgage(IndexHistory([0.02]), 0.01, reset_months=5)
+
+
+def test_floor_bounds_the_rate():
+    index = IndexHistory([0.01, -0.01, -0.03, 0.0])
+    floored = VariableRateMortgage(index, spread=0.01).rates(np.random.default_rng(0), 1, 5)[0]
+    np.testing.assert_allclose(floored, [0.02, 0.0, 0.0, 0.01, 0.01])
+    unfloored = VariableRateMortgage(index, spread=0.01, floor=None).rates(np.random.default_rng(0), 1, 5)[0]
+    np.testing.assert_allclose(unfloored, [0.02, 0.0, -0.02, 0.01, 0.01])
+
+    # At a zero rate the balance falls linearly over the remaining term
+    balances = ResettingLoan(120_000, floored, 5).advance(60).balance[0]
+    expected = reference_balances(120_000, floored, 5, 12)
+    np.testing.assert_allclose(balances, expected, rtol=1e-9, atol=1e-6)
+
+
+def test_index_paths():
+    per_path = IndexHistory([[0.01, 0.02], [0.03, 0.04]])
+    np.testing.assert_array_equal(per_path.paths(None, 2, 3, 12), [[0.01, 0.02, 0.02], [0.03, 0.04, 0.04]])
+    with pytest.raises(ValueError, match="index paths"):
+        per_path.paths(None, 3, 3, 12)
+
+    # Without volatility the mean-reverting index decays to its long-run level
+    index = MeanRevertingIndex(0.05, 0.02, volatility=0, reversion=0.5).paths(np.random.default_rng(0), 2, 4, 6)
+    np.testing.assert_allclose(index, np.broadcast_to(0.02 + 0.03 * np.exp(-0.25 * np.arange(4)), (2, 4)))
@@ -0,0 +1,115 @@
+from dataclasses import asdict, dataclass
+from typing import Optional, Union
+
+import numpy as np
+
+from amortization import ResettingLoan
+from batch import BatchResults, broadcast_columns, evolve_arrays
+from house_investment import AnalysisParams, InvestmentConfig
+
+
+@dataclass
+class IndexHistory:
+    # A supplied index path (e.g. 12-month Euribor), one annual rate per reset period, shaped
+    # (periods,) for every path or (paths, periods). The last value is held beyond its end.
+    values: np.ndarray
+
+    def __post_init__(self):
+        self.values = np.atleast_1d(np.asarray(self.values, dtype=np.float64))
+        if self.values.ndim > 2 or self.values.shape[-1] == 0:
+            raise ValueError("values must be shaped (periods,) or (paths, periods)")
+
+    def paths(self, rng: np.random.Generator, n_paths: int, n_periods: int, reset_months: int) -> np.ndarray:
+        values = self.values if self.values.ndim == 2 else self.values[None, :]
+        if len(values) not in (1, n_paths):
+            raise ValueError(f"Got {len(values)} index paths for {n_paths} loans")
+        index = np.empty((len(values), n_periods))
+        given = min(n_periods, values.shape[1])
+        index[:, :given] = values[:, :given]
+        index[:, given:] = values[:, given - 1 : given]
+        return np.broadcast_to(index, (n_paths, n_periods))
+
+
+@dataclass
+class MeanRevertingIndex:
+    # Vasicek model of the index: reverts to `long_run` at `reversion` per year with annual
+    # `volatility`, sampled exactly at every reset so the reset frequency does not bias the paths
+    initial: float
+    long_run: float
+    volatility: float = 0.01
+    reversion: float = 0.2
+
+    def __post_init__(self):
+        if self.volatility < 0 or self.reversion < 0:
+            raise ValueError("volatility and reversion must be non-negative")
+
+    def paths(self, rng: np.random.Generator, n_paths: int, n_periods: int, reset_months: int) -> np.ndarray:
+        dt = reset_months / 12
+        decay = np.exp(-self.reversion * dt)
+        if self.reversion == 0:
+            step_volatility = self.volatility * np.sqrt(dt)
+        else:
+            step_volatility = self.volatility * np.sqrt(-np.expm1(-2 * self.reversion * dt) / (2 * self.reversion))
+        index = np.empty((n_periods, n_paths))
+        index[0] = self.initial
+        shocks = rng.standard_normal((n_periods - 1, n_paths))
+        for k in range(1, n_periods):
+            index[k] = self.long_run + (index[k - 1] - self.long_run) * decay + step_volatility * shocks[k - 1]
+        return index.T
+
+
+Index = Union[IndexHistory, MeanRevertingIndex]
+
+
+@dataclass
+class VariableRateMortgage:
+    # Rate = index + spread, reset every `reset_months` (12 yearly, 6 half-yearly). A mixed mortgage
+    # pays `fixed_rate` for its first `fixed_years`. `floor` is the minimum rate charged (None: no floor).
+    index: Index
+    spread: float
+    reset_months: int = 12
+    fixed_years: float = 0
+    fixed_rate: float = 0.0
+    floor: Optional[float] = 0.0
+
+    def __post_init__(self):
+        if self.reset_months < 1 or 12 % self.reset_months:
+            raise ValueError("reset_months must divide 12")
+        if (self.fixed_years * 12) % self.reset_months:
+            raise ValueError("fixed_years must span a whole number of reset periods")
+
+    def rates(self, rng: np.random.Generator, n_paths: int, term_years: float) -> np.ndarray:
+        # Annual rate charged in every reset period of every path, shaped (paths, periods)
+        n_periods = int(np.ceil(term_years * 12 / self.reset_months))
+        n_fixed = min(int(self.fixed_years * 12) // self.reset_months, n_periods)
+        rates = np.full((n_paths, n_periods), self.fixed_rate, dtype=np.float64)
+        if n_fixed < n_periods:
+            variable = self.index.paths(rng, n_paths, n_periods - n_fixed, self.reset_months) + self.spread
+            rates[:, n_fixed:] = variable if self.floor is None else np.maximum(variable, self.floor)
+        return rates
+
+    def loan(
+        self,
+        principal: Union[float, np.ndarray],
+        term_years: Union[float, np.ndarray],
+        rng: np.random.Generator,
+        n_paths: int,
+    ) -> ResettingLoan:
+        return ResettingLoan(
+            principal, self.rates(rng, n_paths, float(np.max(term_years))), term_years, self.reset_months
+        )
+
+
+def evaluate_rate_paths(
+    params: AnalysisParams,
+    mortgage: VariableRateMortgage,
+    config: InvestmentConfig = InvestmentConfig(),
+    n_paths: int = 10_000,
+    seed: Optional[int] = None,
+) -> BatchResults:
+    """Evaluate `params` once per rate path of `mortgage`, all paths in one batch."""
+    base_params, base_config = asdict(params), asdict(config)
+    p, c = broadcast_columns(base_params, base_config, {}, n_paths)
+    principal = p["house_price"] - p["house_price"] * c["down_payment_percentage"]
+    loan = mortgage.loan(principal, p["mortgage_term"], np.random.default_rng(seed), n_paths)
+    return evolve_arrays(p, c, mortgage=loan)